@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import joblib
 import googlemaps
 from datetime import datetime
 import folium
@@ -9,6 +8,17 @@ import polyline
 import numpy as np
 import os
 
+from model_store import load_delay_model, describe_load
+from columnar import read_training_data
+
+# Local GTFS journey planner and stop geocoder (fall back to Google if unavailable)
+try:
+    from schedule import ScheduleEngine
+    from raptor import JourneyPlanner
+    from geocoder import StopGeocoder
+except ImportError:
+    JourneyPlanner = None
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="TransitAI: Smart Delay Prediction",
@@ -59,7 +69,13 @@ def load_resources():
     # Since this file is in backend/, we look for files in the same directory
     model_path = os.path.join(os.path.dirname(__file__), 'delay_model.pkl')
     try:
-        model = joblib.load(model_path)
+        # Memory-mapped compiled forest when present: every session and
+        # replica on the host shares one copy of the node arrays. At most 24
+        # rows are scored at a time, so the sklearn pipeline is not needed
+        model, model_info = load_delay_model(
+            model_path, os.path.join(os.path.dirname(__file__), 'delay_model_compiled'), batch_engine=False
+        )
+        print(describe_load(model_info))
     except FileNotFoundError:
         st.error(f"Model file not found at {model_path}. Please check that delay_model.pkl is in the backend directory.")
         model = None
@@ -67,15 +83,26 @@ def load_resources():
     # Load Routes
     data_path = os.path.join(os.path.dirname(__file__), 'transport_data.csv')
     try:
-        df = pd.read_csv(data_path)
+        # Only the Route_ID column of the typed columnar copy
+        df = read_training_data(data_path, columns=['Route_ID'])
         routes = sorted(df['Route_ID'].unique().tolist())
     except FileNotFoundError:
         routes = []
         st.warning(f"Data file not found at {data_path}. Route list empty.")
 
-    return gmaps, model, routes
+    # Load GTFS Journey Planner & Stop Geocoder
+    planner = geocoder = None
+    if JourneyPlanner is not None:
+        try:
+            schedule = ScheduleEngine.from_feeds()
+            planner = JourneyPlanner(schedule)
+            geocoder = StopGeocoder.from_schedule(schedule)
+        except FileNotFoundError:
+            st.warning("GTFS feeds not found. Using Google Directions only.")
+
+    return gmaps, model, routes, planner, geocoder
 
-gmaps, model, available_routes = load_resources()
+gmaps, model, available_routes, planner, geocoder = load_resources()
 
 # --- Inputs (Sidebar) ---
 with st.sidebar:
@@ -122,27 +149,44 @@ if calculate_btn:
     else:
         try:
             with st.spinner("Fetching Route & Predicting Delays..."):
-                # 1. Google Maps Data
-                # Get Directions logic to display map path
-                now = datetime.now()
-                # For map display
-                directions_result = gmaps.directions(origin, destination, mode="transit", departure_time=now)
+                # 1. Base Time: local GTFS journey plan, else Google Maps
+                # Resolve typed places to GTFS stops offline (handles typos)
+                origin_stop = geocoder.resolve(origin) if geocoder else None
+                destination_stop = geocoder.resolve(destination) if geocoder else None
+                journey = None
+                if planner and origin_stop and destination_stop:
+                    journey = planner.plan(origin_stop["stop_id"], destination_stop["stop_id"], hour * 3600)
+                    st.caption(f"Resolved stops: {origin_stop['name']} ➡ {destination_stop['name']}")
+                base_time_label = "GTFS Schedule Base Time" if journey else "Google Maps Base Time"
+
+                if journey:
+                    google_time_min = (journey[-1].arrival - journey[0].departure) / 60
+                    path_points = [
+                        (planner.schedule.stop_lat[s], planner.schedule.stop_lon[s])
+                        for leg in journey for s in leg.stops
+                    ]
+                else:
+                    # Google Maps Data
+                    # Get Directions logic to display map path
+                    now = datetime.now()
+                    # For map display
+                    directions_result = gmaps.directions(origin, destination, mode="transit", departure_time=now)
                 
-                # For base time calculation (using distance matrix as in backend/main.py or directions result)
-                # directions_result[0]['legs'][0]['duration']['value'] is seconds.
+                    # For base time calculation (using distance matrix as in backend/main.py or directions result)
+                    # directions_result[0]['legs'][0]['duration']['value'] is seconds.
                 
-                if not directions_result:
-                    st.error("No directions found for this route.")
-                    google_time_min = 0
-                    path_points = []
-                else:
-                    leg = directions_result[0]['legs'][0]
-                    google_time_sec = leg['duration']['value']
-                    google_time_min = google_time_sec / 60
+                    if not directions_result:
+                        st.error("No directions found for this route.")
+                        google_time_min = 0
+                        path_points = []
+                    else:
+                        leg = directions_result[0]['legs'][0]
+                        google_time_sec = leg['duration']['value']
+                        google_time_min = google_time_sec / 60
                     
-                    # Decode path
-                    overview_polyline = directions_result[0]['overview_polyline']['points']
-                    path_points = polyline.decode(overview_polyline)
+                        # Decode path
+                        overview_polyline = directions_result[0]['overview_polyline']['points']
+                        path_points = polyline.decode(overview_polyline)
 
                 # 2. ML Prediction
                 if model:
@@ -168,7 +212,7 @@ if calculate_btn:
             # Metrics Row
             m1, m2, m3 = st.columns(3)
             with m1:
-                st.metric("Google Maps Base Time", f"{google_time_min:.1f} min")
+                st.metric(base_time_label, f"{google_time_min:.1f} min")
             with m2:
                 st.metric("AI Predicted Delay", f"+{predicted_delay:.1f} min", delta_color="inverse")
             with m3:
@@ -202,12 +246,13 @@ if calculate_btn:
             st.subheader("Hourly Delay Forecast")
             
             if model:
-                trend_data = []
-                for h in range(24):
-                    f = features.copy()
-                    f['Hour'] = h
-                    d = model.predict(f)[0]
-                    trend_data.append({"Hour": h, "Predicted Delay (min)": max(0, d)}) # ensure non-negative for chart niceness
+                # All 24 hours in one predict call
+                hours = pd.concat([features] * 24, ignore_index=True)
+                hours['Hour'] = range(24)
+                trend_data = [
+                    {"Hour": h, "Predicted Delay (min)": max(0, d)} # ensure non-negative for chart niceness
+                    for h, d in enumerate(model.predict(hours))
+                ]
                 
                 trend_df = pd.DataFrame(trend_data)
                 st.area_chart(trend_df.set_index("Hour"), color="#2563eb")
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import deque
+import numpy as np
+
+
+class MicroBatcher:
+    """Merges concurrent single-row predictions into one batched call.
+
+    Callers `await submit(row)`. Rows queue on the event loop until
+    `max_batch` have arrived or `max_wait` seconds have passed since the
+    first one, then one `predict(rows)` call runs on `executor` and each
+    caller gets its own value back. A larger window trades a little latency
+    for fewer, larger forest calls under load; max_batch=1 turns batching off.
+
+    Everything except `predict` runs on the event loop thread, so the queue
+    needs no locking. `observe(stage, seconds)`, when given, receives each
+    row's queue wait.
+    """
+
+    def __init__(self, predict, executor, max_batch=64, max_wait=0.002, window=2048, observe=None):
+        self.predict = predict
+        self.observe = observe
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = []
+        self._timer = None
+
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_seen = 0
+        self.errors = 0
+        # Recent samples for percentiles
+        self._batch_sizes = deque(maxlen=window)
+        self._waits = deque(maxlen=window)
+        self._predict_seconds = deque(maxlen=window)
+
+    async def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((row, future, time.perf_counter()))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            if self.max_wait > 0:
+                self._timer = loop.call_later(self.max_wait, self._flush)
+            else:
+                self._timer = loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    def _timed_predict(self, rows):
+        start = time.perf_counter()
+        delays = self.predict(rows)
+        return start, time.perf_counter() - start, delays
+
+    async def _run(self, batch):
+        rows = [row for row, _, _ in batch]
+        try:
+            start, seconds, delays = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._timed_predict, rows
+            )
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self._batch_sizes.append(len(batch))
+        self._predict_seconds.append(seconds)
+        for (_, future, enqueued), delay in zip(batch, delays):
+            # Queue wait: enqueue until the batched predict started
+            self._waits.append(start - enqueued)
+            if self.observe is not None:
+                self.observe("queue_wait", start - enqueued)
+            if not future.done():
+                future.set_result(float(delay))
+
+    def stats(self):
+        def ms(samples, q):
+            return round(float(np.percentile(samples, q)) * 1000, 3) if samples else None
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "queued": len(self._queue),
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else None,
+            "max_batch_size": self.max_batch_seen,
+            "recent_batch_size_p50": float(np.percentile(self._batch_sizes, 50)) if self._batch_sizes else None,
+            "queue_wait_ms_p50": ms(self._waits, 50),
+            "queue_wait_ms_p95": ms(self._waits, 95),
+            "predict_ms_p50": ms(self._predict_seconds, 50),
+            "predict_ms_p95": ms(self._predict_seconds, 95),
+        }
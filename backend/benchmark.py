@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+# Micro-benchmarks and an HTTP load generator. Results are written as JSON
+# (one file per run) so two runs, e.g. before and after a commit, can be
+# compared with --compare. The load test always uses the fake maps client.
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+RESULTS_DIR = 'benchmarks'
+
+SAMPLE_PLACES = ['Secunderabad', 'Lingampalli', 'Begumpet', 'Hitech City', 'Falaknuma', 'Nampally', 'Malkajgiri', 'Kacheguda']
+
+
+def measure(fn, repeat=5, number=1):
+    # Median and best time per call over `repeat` runs of `number` calls
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {"median_ms": round(float(np.median(times)) * 1000, 4), "min_ms": round(min(times) * 1000, 4), "repeat": repeat}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    import sklearn
+    import pandas
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def sample_rows(n, seed=0):
+    from data_generator import generate_chunk, load_routes
+    frame = generate_chunk(load_routes(), n, np.random.SeedSequence([seed]))
+    return frame.drop(columns='Delay_Minutes').to_dict('records')
+
+
+def micro_benchmarks(quick=False):
+    import joblib
+    from columnar import read_training_data
+    from data_generator import generate_chunk, load_routes
+    from delay_table import DelayLookupTable, LOOKUP_TABLE_PATH
+    from forest_engine import CompiledForest, COMPILED_MODEL_PATH
+    from inference import build_features
+    from model_store import MODEL_PATH
+    from train_model import build_pipeline
+
+    repeat = 3 if quick else 7
+    sizes = BATCH_SIZES[:-1] if quick else BATCH_SIZES
+    rows = sample_rows(max(sizes))
+    results = []
+
+    def record(name, n, fn, repeat=repeat):
+        timing = measure(fn, repeat=repeat)
+        timing["rows_per_second"] = round(n / (timing["median_ms"] / 1000)) if n else None
+        results.append({"name": name, "rows": n, **timing})
+        print(f"  {name:<28}{n:>7} rows {timing['median_ms']:>10.3f} ms")
+
+    print("Feature building")
+    for n in sizes:
+        record("build_features", n, lambda: build_features(rows[:n]))
+
+    print("Model predict")
+    if os.path.exists(MODEL_PATH):
+        pipeline = joblib.load(MODEL_PATH)
+        for n in sizes:
+            frame = build_features(rows[:n])
+            record("sklearn_pipeline.predict", n, lambda: pipeline.predict(frame))
+    if os.path.exists(os.path.join(COMPILED_MODEL_PATH, 'meta.json')):
+        compiled = CompiledForest.load()
+        for n in sizes:
+            record("compiled_forest.predict", n, lambda: compiled.predict(rows[:n]))
+    if os.path.exists(os.path.join(LOOKUP_TABLE_PATH, 'meta.json')):
+        table = DelayLookupTable.load()
+        for n in sizes[:3]:
+            record("lookup_table.lookup", n, lambda: [table.lookup(row) for row in rows[:n]])
+
+    print("Data generation")
+    routes = load_routes()
+    n = 20_000 if quick else 200_000
+    record("generate_chunk", n, lambda: generate_chunk(routes, n, 0), repeat=3)
+    chunk = generate_chunk(routes, n, 0)
+    record("chunk_to_csv", n, lambda: chunk.to_csv(index=False, header=False), repeat=3)
+
+    print("Training")
+    df = read_training_data()
+    X, y = df.drop(columns='Delay_Minutes'), df['Delay_Minutes']
+    n_estimators = 20 if quick else 100
+    record(f"fit_random_forest_{n_estimators}", len(df), lambda: build_pipeline(n_estimators=n_estimators).fit(X, y), repeat=1)
+    return results
+
+
+def trip_payload(rng, endpoint):
+    # Repeated place pairs, so the base-time cache sees a realistic hit rate
+    origin, destination = rng.choice(SAMPLE_PLACES, 2, replace=False)
+    body = {
+        "Route_ID": str(rng.choice(['47100', '47105', '47120', '47201'])),
+        "Weather_Condition": str(rng.choice(['Sunny', 'Rainy', 'Cloudy'])),
+        "Event_Type": str(rng.choice(['None', 'Sports', 'Concert'])),
+        "Hour": int(rng.integers(5, 24)),
+        "Day_OfWeek": int(rng.integers(0, 7)),
+        "Temperature": round(float(rng.normal(30, 5)), 1),
+        "Precipitation": 0.0,
+        "Event_Attendance": 0,
+        "origin": str(origin),
+        "destination": str(destination),
+    }
+    if endpoint == "/predict-trip" and rng.random() < 0.3:
+        body["base_time_source"] = "auto"
+    return body
+
+
+async def run_load(client, endpoint, requests, concurrency, seed=0):
+    rng = np.random.default_rng(seed)
+    method = "GET" if endpoint in ("/routes", "/network-heatmap") else "POST"
+    payloads = [trip_payload(rng, endpoint) if method == "POST" else None for _ in range(requests)]
+    latencies, statuses = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(payload):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, endpoint, json=payload)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in payloads))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "endpoint": endpoint,
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+        "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+async def load_benchmarks(endpoints, requests, concurrency, url=None, latency=0.0):
+    import httpx
+    results = []
+
+    async def drive(client):
+        for endpoint in endpoints:
+            await run_load(client, endpoint, min(requests, 20), concurrency)  # warm-up
+            result = await run_load(client, endpoint, requests, concurrency)
+            result["target"] = url or "in-process"
+            result["fake_maps_latency"] = latency
+            results.append(result)
+            print(f"  {endpoint:<20}{result['requests_per_second']:>9} req/s  p50 {result['p50_ms']} ms  "
+                  f"p99 {result['p99_ms']} ms  {result['status_counts']}")
+
+    if url:
+        # Server must run with TRANSIT_FAKE_MAPS=1 (and TRANSIT_FAKE_MAPS_LATENCY)
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            await drive(client)
+    else:
+        os.environ["TRANSIT_FAKE_MAPS"] = "1"
+        os.environ["TRANSIT_FAKE_MAPS_LATENCY"] = str(latency)
+        import main
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+                await drive(client)
+    return results
+
+
+def compare(old_path, new_path):
+    # Median time (micro) and throughput (load) ratios between two result files
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['environment']['commit'] or old_path} -> {new['environment']['commit'] or new_path}")
+    old_micro = {(r["name"], r["rows"]): r for r in old.get("micro", [])}
+    for r in new.get("micro", []):
+        before = old_micro.get((r["name"], r["rows"]))
+        if before:
+            ratio = r["median_ms"] / before["median_ms"] if before["median_ms"] else float('nan')
+            print(f"  {r['name']:<28}{r['rows']:>7} rows {before['median_ms']:>10.3f} -> {r['median_ms']:>10.3f} ms  x{ratio:.2f}")
+    old_load = {(r["endpoint"], r["concurrency"]): r for r in old.get("load", [])}
+    for r in new.get("load", []):
+        before = old_load.get((r["endpoint"], r["concurrency"]))
+        if before:
+            print(f"  {r['endpoint']:<20}{before['requests_per_second']:>9} -> {r['requests_per_second']:>9} req/s  "
+                  f"p99 {before['p99_ms']} -> {r['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks and load test for the delay API")
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and fewer repeats")
+    parser.add_argument('--url', help="load-test a running server instead of the in-process app")
+    parser.add_argument('--endpoints', default="/predict-trip,/predict-trend,/routes")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--maps-latency', type=float, default=0.05, help="fake Google Maps round trip (seconds)")
+    parser.add_argument('--output', help=f"result file (default {RESULTS_DIR}/<timestamp>-<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    results = {"environment": environment()}
+    if not args.skip_micro:
+        print("Micro-benchmarks")
+        results["micro"] = micro_benchmarks(args.quick)
+    if not args.skip_load:
+        print("Load test")
+        results["load"] = asyncio.run(load_benchmarks(
+            args.endpoints.split(','), args.requests, args.concurrency, args.url, args.maps_latency
+        ))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['environment']['commit'] or 'local'}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
@@ -0,0 +1,153 @@
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+TRAINING_CSV = 'transport_data.csv'
+
+# Typed layout of transport_data.csv: categories are dictionary-encoded
+# (pandas Categorical on read), hours/days int8, measures float32
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+TRAINING_SCHEMA = pa.schema([
+    ('Route_ID', CATEGORY),
+    ('Weather_Condition', CATEGORY),
+    ('Event_Type', CATEGORY),
+    ('Hour', pa.int8()),
+    ('Day_OfWeek', pa.int8()),
+    ('Temperature', pa.float32()),
+    ('Precipitation', pa.float32()),
+    ('Event_Attendance', pa.int32()),
+    ('Delay_Minutes', pa.float32()),
+])
+
+# Bytes of CSV parsed per record batch while converting
+CONVERT_BLOCK_BYTES = 1 << 24
+
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def is_fresh(target, source):
+    # target was derived from source and source has not changed since
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source)
+
+
+def convert_csv(csv_path, target=None, schema=TRAINING_SCHEMA):
+    """Stream a CSV into a typed Parquet file, one record batch at a time.
+
+    Every value is kept as written ("None" is an Event_Type, not a null),
+    and the file is renamed into place only once complete.
+    """
+    target = target or parquet_path(csv_path)
+    convert_options = pacsv.ConvertOptions(
+        column_types={field.name: field.type for field in schema},
+        include_columns=schema.names,
+        null_values=[], strings_can_be_null=False, quoted_strings_can_be_null=False,
+    )
+    reader = pacsv.open_csv(
+        csv_path, read_options=pacsv.ReadOptions(block_size=CONVERT_BLOCK_BYTES),
+        convert_options=convert_options,
+    )
+    tmp_path = target + '.tmp'
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    os.replace(tmp_path, target)
+    return target
+
+
+def ensure_parquet(csv_path, schema=TRAINING_SCHEMA):
+    # Convert once; later reads use the Parquet file until the CSV changes
+    target = parquet_path(csv_path)
+    if not is_fresh(target, csv_path):
+        convert_csv(csv_path, target, schema)
+    return target
+
+
+def read_training_data(csv_path=TRAINING_CSV, columns=None, filters=None):
+    """Typed training data as a DataFrame, read from its Parquet copy.
+
+    `columns` projects to a subset of columns and `filters` takes
+    pyarrow/pandas DNF predicates such as [('Hour', '>=', 7)], which skip
+    whole row groups by their statistics before rows are filtered.
+    """
+    table = pq.read_table(ensure_parquet(csv_path), columns=columns, filters=filters)
+    frame = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    # Hand freed Arrow buffers back to the OS rather than keeping them pooled
+    pa.default_memory_pool().release_unused()
+    return frame
+
+
+def _benchmark_case(name, csv_path, loader):
+    from model_store import rss_mb
+    before = rss_mb()
+    start = time.perf_counter()
+    frame = loader(csv_path)
+    seconds = time.perf_counter() - start
+    return {
+        "case": name,
+        "rows": len(frame),
+        "seconds": round(seconds, 4),
+        "rss_delta_mb": round(rss_mb() - before, 1),
+        "frame_mb": round(frame.memory_usage(deep=True).sum() / 2**20, 1),
+    }
+
+
+def _csv_full(path):
+    return pd.read_csv(path, dtype={'Route_ID': str}, keep_default_na=False)
+
+
+def _csv_projected(path):
+    return pd.read_csv(path, usecols=['Hour', 'Delay_Minutes'], keep_default_na=False)
+
+
+def _csv_filtered(path):
+    frame = _csv_full(path)
+    return frame[frame['Weather_Condition'] == 'Rainy']
+
+
+def _parquet_full(path):
+    return read_training_data(path)
+
+
+def _parquet_projected(path):
+    return read_training_data(path, columns=['Hour', 'Delay_Minutes'])
+
+
+def _parquet_filtered(path):
+    return read_training_data(path, filters=[('Weather_Condition', '==', 'Rainy')])
+
+
+def benchmark(csv_path=TRAINING_CSV):
+    # Each case runs in a freshly spawned process so its RSS growth is its own.
+    # Unpickling the case imports this module, so pandas and pyarrow are
+    # loaded before the baseline is taken and neither reader pays for imports
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    ensure_parquet(csv_path)
+    cases = [
+        ("csv", _csv_full), ("csv_projected", _csv_projected), ("csv_filtered", _csv_filtered),
+        ("parquet", _parquet_full), ("parquet_projected", _parquet_projected),
+        ("parquet_filtered", _parquet_filtered),
+    ]
+    results = []
+    for name, loader in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results.append(pool.submit(_benchmark_case, name, csv_path, loader).result())
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else TRAINING_CSV
+    start = time.perf_counter()
+    convert_csv(path)
+    print(f"Converted {path} -> {parquet_path(path)} in {time.perf_counter() - start:.2f}s "
+          f"({os.path.getsize(path) / 2**20:.1f} MB -> {os.path.getsize(parquet_path(path)) / 2**20:.1f} MB)")
+    print(f"{'case':<20}{'rows':>10}{'seconds':>10}{'rss +MB':>10}{'frame MB':>10}")
+    for r in benchmark(path):
+        print(f"{r['case']:<20}{r['rows']:>10}{r['seconds']:>10}{r['rss_delta_mb']:>10}{r['frame_mb']:>10}")
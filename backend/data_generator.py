@@ -1,120 +1,149 @@
-import pandas as pd
-import numpy as np
-import random
+import argparse
 import os
-from datetime import datetime, timedelta
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from gtfs import read_table
+
+# Rows generated (and held in memory) per chunk
+CHUNK_ROWS = 250_000
+
+FALLBACK_ROUTES = ['R-101', 'R-102', 'R-103', 'R-201', 'R-202']
+WEATHER_CONDITIONS = np.array(['Sunny', 'Rainy', 'Cloudy', 'Snowy'])
+EVENT_TYPES = np.array(['None', 'Sports', 'Concert', 'Festival', 'Protest'])
+
+# Attendance range per event type, same order as EVENT_TYPES
+ATTENDANCE_LOW = np.array([0, 20000, 10000, 50000, 5000])
+ATTENDANCE_HIGH = np.array([0, 60000, 40000, 100000, 20000])
+
+COLUMNS = [
+    'Route_ID', 'Weather_Condition', 'Event_Type', 'Hour', 'Day_OfWeek',
+    'Temperature', 'Precipitation', 'Event_Attendance', 'Delay_Minutes'
+]
 
-def generate_data(num_samples=5000):
-    np.random.seed(42)
-    
+
+def load_routes():
     # Load Real Route IDs from GTFS
-    print("Loading GTFS routes...")
     try:
-        routes_df = pd.read_csv('../data/hyderabad_GTFS/routes.txt')
-        routes = routes_df['route_id'].astype(str).tolist()
+        routes = read_table('hyderabad', 'routes', ['route_id'])['route_id'].tolist()
         print(f"Found {len(routes)} real routes.")
     except Exception as e:
         print(f"Error loading GTFS routes: {e}. Falling back to dummy routes.")
-        routes = ['R-101', 'R-102', 'R-103', 'R-201', 'R-202']
-    
-    # Base ranges
-    dates = [datetime(2025, 1, 1) + timedelta(days=i) for i in range(num_samples)]
-    weather_conditions = ['Sunny', 'Rainy', 'Cloudy', 'Snowy']
-    event_types = ['None', 'Sports', 'Concert', 'Festival', 'Protest']
-    
-    data = []
-    
-    for _ in range(num_samples):
-        date = random.choice(dates)
-        route = random.choice(routes)
-        weather = random.choice(weather_conditions)
-        event = random.choice(event_types)
-        
-        # Features
-        hour = random.randint(5, 23)  # Operating hours
-        day_of_week = date.weekday()  # 0=Monday, 6=Sunday
-        
-        # New Granular Features
-        temperature = round(np.random.normal(30, 5), 1) # Avg 30C in Hyderabad
-        precipitation = 0.0
-        event_attendance = 0
-        
-        # Correlate features with categories for realism
-        if weather == 'Rainy':
-            precipitation = round(random.uniform(5.0, 50.0), 1)
-            temperature -= 3 # Rain cools it down
-        elif weather == 'Snowy':
-            temperature = round(random.uniform(-5.0, 2.0), 1)
-        elif weather == 'Sunny':
-            temperature += 2
-            
-        if event != 'None':
-            # Attendance in thousands
-            if event == 'Sports': event_attendance = random.randint(20000, 60000)
-            elif event == 'Concert': event_attendance = random.randint(10000, 40000)
-            elif event == 'Festival': event_attendance = random.randint(50000, 100000)
-            elif event == 'Protest': event_attendance = random.randint(5000, 20000)
-        
-        # Base delay logic (minutes)
-        base_delay = 0
-        
-        # 1. Random Route Factor
-        route_hash = hash(route) % 10
-        if route_hash > 7: 
-            base_delay += 5
-            
-        # 2. Time Factor (Rush Hours)
-        if 7 <= hour <= 9 or 17 <= hour <= 19:
-            base_delay += 15
-        elif 10 <= hour <= 16:
-            base_delay += 5
-            
-        # 3. Weather Factor (Granular)
-        # 0.5 min delay per mm of rain
-        base_delay += (precipitation * 0.5) 
-        
-        # Extreme heat delay (>40C slows things down slighty due to overheating/fatigue)
-        if temperature > 40:
-            base_delay += 5
-        # Freezing delay
-        if temperature < 0:
-            base_delay += 10
-            
-        # 4. Event Factor (Granular)
-        # 1 min delay per 5000 people
-        base_delay += (event_attendance / 5000)
-        
-        # Extra penalty for specific chaotic events
-        if event == 'Protest':
-            base_delay += 10
-            
-        # 5. Day Factor
-        if day_of_week == 4: # Friday
-            base_delay += 5
-        if day_of_week >= 5: # Weekend
-            base_delay -= 5
-            
-        # Add random noise
-        noise = np.random.normal(0, 5)
-        final_delay = max(0, base_delay + noise)
-        
-        data.append({
-            'Route_ID': route,
-            'Weather_Condition': weather,
-            'Event_Type': event,
-            'Hour': hour,
-            'Day_OfWeek': day_of_week,
-            'Temperature': temperature,
-            'Precipitation': precipitation,
-            'Event_Attendance': event_attendance,
-            'Delay_Minutes': round(final_delay, 2)
-        })
-        
-    df = pd.DataFrame(data)
-    
-    # Save to CSV
-    df.to_csv('transport_data.csv', index=False)
-    print(f"Generated {num_samples} records in transport_data.csv using real Route IDs.")
-    
+        routes = FALLBACK_ROUTES
+    return routes
+
+
+def route_penalties(routes):
+    # Stable per-route factor; crc32 rather than hash() so it does not change
+    # between processes under hash randomization
+    return np.array([5.0 if zlib.crc32(r.encode()) % 10 > 7 else 0.0 for r in routes])
+
+
+def generate_chunk(routes, size, seed):
+    """One chunk of synthetic trips as a DataFrame, drawn from its own seed."""
+    rng = np.random.default_rng(seed)
+    routes = np.asarray(routes)
+
+    route = rng.integers(0, len(routes), size)
+    weather = rng.integers(0, len(WEATHER_CONDITIONS), size)
+    event = rng.integers(0, len(EVENT_TYPES), size)
+    hour = rng.integers(5, 24, size)  # Operating hours
+    day_of_week = rng.integers(0, 7, size)  # 0=Monday, 6=Sunday
+
+    # Correlate features with categories for realism
+    rainy, snowy, sunny = weather == 1, weather == 3, weather == 0
+    temperature = np.round(rng.normal(30, 5, size), 1)  # Avg 30C in Hyderabad
+    temperature[rainy] -= 3  # Rain cools it down
+    temperature[sunny] += 2
+    temperature[snowy] = np.round(rng.uniform(-5.0, 2.0, size), 1)[snowy]
+    temperature = np.round(temperature, 1)
+    precipitation = np.where(rainy, np.round(rng.uniform(5.0, 50.0, size), 1), 0.0)
+    event_attendance = np.where(
+        event > 0, rng.integers(ATTENDANCE_LOW[event], ATTENDANCE_HIGH[event] + 1), 0
+    )
+
+    # Base delay logic (minutes)
+    # 1. Route factor
+    delay = route_penalties(routes)[route]
+    # 2. Time Factor (Rush Hours)
+    rush = ((hour >= 7) & (hour <= 9)) | ((hour >= 17) & (hour <= 19))
+    delay += np.where(rush, 15, np.where((hour >= 10) & (hour <= 16), 5, 0))
+    # 3. Weather Factor: 0.5 min per mm of rain, heat and freezing penalties
+    delay += precipitation * 0.5
+    delay += np.where(temperature > 40, 5, 0) + np.where(temperature < 0, 10, 0)
+    # 4. Event Factor: 1 min per 5000 people, extra for protests
+    delay += event_attendance / 5000
+    delay += np.where(event == 4, 10, 0)
+    # 5. Day Factor: Friday slower, weekend faster
+    delay += np.where(day_of_week == 4, 5, 0) - np.where(day_of_week >= 5, 5, 0)
+
+    # Add random noise
+    delay = np.round(np.maximum(0, delay + rng.normal(0, 5, size)), 2)
+
+    return pd.DataFrame({
+        'Route_ID': routes[route],
+        'Weather_Condition': WEATHER_CONDITIONS[weather],
+        'Event_Type': EVENT_TYPES[event],
+        'Hour': hour,
+        'Day_OfWeek': day_of_week,
+        'Temperature': temperature,
+        'Precipitation': precipitation,
+        'Event_Attendance': event_attendance,
+        'Delay_Minutes': delay,
+    }, columns=COLUMNS)
+
+
+def chunk_csv(args):
+    # Worker task: generate and format one chunk, so CSV encoding runs in parallel too
+    routes, size, seed = args
+    return generate_chunk(routes, size, seed).to_csv(index=False, header=False)
+
+
+def chunk_tasks(routes, num_samples, seed, chunk_rows):
+    # Chunk i always draws from SeedSequence([seed, i]): output depends only
+    # on (seed, num_samples, chunk_rows), not on the number of workers
+    for i, start in enumerate(range(0, num_samples, chunk_rows)):
+        yield routes, min(chunk_rows, num_samples - start), np.random.SeedSequence([seed, i])
+
+
+def generate_data(num_samples=5000, path='transport_data.csv', seed=42, chunk_rows=CHUNK_ROWS, workers=1):
+    """Write `num_samples` synthetic trips to `path` in fixed-size chunks.
+
+    Memory stays bounded by a few chunks whatever the row count. With
+    workers > 1 chunks are generated in separate processes and written in
+    order, so the file is byte-identical to a single-process run.
+    """
+    print("Loading GTFS routes...")
+    routes = load_routes()
+    tasks = chunk_tasks(routes, num_samples, seed, chunk_rows)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        f.write(','.join(COLUMNS) + '\n')
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Keep at most 2 chunks per worker in flight
+                pending = []
+                for task in tasks:
+                    pending.append(pool.submit(chunk_csv, task))
+                    if len(pending) >= 2 * workers:
+                        f.write(pending.pop(0).result())
+                for future in pending:
+                    f.write(future.result())
+        else:
+            for task in tasks:
+                f.write(chunk_csv(task))
+    os.replace(tmp_path, path)
+    print(f"Generated {num_samples} records in {path} using real Route IDs.")
+
+
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Generate synthetic transit delay data")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--output', default='transport_data.csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    generate_data(args.rows, args.output, args.seed, args.chunk_rows, args.workers)
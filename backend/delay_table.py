@@ -0,0 +1,220 @@
+import bisect
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from inference import predict_delays, predict_grid
+from model_store import DelayModel
+
+LOOKUP_TABLE_PATH = 'delay_lookup'
+
+# Table axes in storage order: discrete levels, then continuous knots
+DISCRETE_AXES = ['Route_ID', 'Day_OfWeek', 'Weather_Condition', 'Event_Type', 'Hour']
+# Knots sit where the forest's response moves most: either side of the
+# freezing (0 C) and heat (40 C) steps, every 5 C over 20-40 C where most
+# training rows lie, and the dry / light rain split. Denser grids track the
+# forest more closely but no better against observed delays, at several
+# times the size and build time.
+CONTINUOUS_KNOTS = {
+    'Temperature': [-5.0, -0.1, 0.1, 20.0, 25.0, 30.0, 35.0, 39.9, 40.1, 45.0],
+    'Precipitation': [0.0, 5.0, 50.0],
+    'Event_Attendance': [0.0, 100000.0],
+}
+
+# Largest table DelayLookupTable.build allocates (float32 cells, 128 MB);
+# the build scores every cell, so this also bounds its time
+MAX_TABLE_CELLS = 32_000_000
+
+# Largest table-vs-forest error (minutes) on the held-out split that
+# build_lookup_table accepts, at the 95th percentile and overall. Most of
+# the gap is the forest's own noise between knots, not lost accuracy
+MAX_P95_ABS_DELTA = 6.0
+MAX_ABS_DELTA = 12.0
+
+
+def model_levels(model):
+    """Discrete axis levels: the categories the model was fitted on, all hours and days."""
+    if isinstance(model, DelayModel):
+        model = model.compiled if model.compiled is not None else model.pipeline
+    if hasattr(model, 'category_column'):
+        categories = dict(zip(model.categorical_columns, model.meta['categories']))
+    else:
+        preprocessor = model.named_steps['preprocessor']
+        encoder = preprocessor.named_transformers_['cat']
+        columns = preprocessor.transformers_[0][2]
+        categories = {c: [str(v) for v in values] for c, values in zip(columns, encoder.categories_)}
+    return {
+        'Route_ID': categories['Route_ID'],
+        'Day_OfWeek': list(range(7)),
+        'Weather_Condition': categories['Weather_Condition'],
+        'Event_Type': categories['Event_Type'],
+        'Hour': list(range(24)),
+    }
+
+
+def knot_weights(knots, x):
+    # Lower knot index and interpolation weight, clamped to the knot range
+    i = min(max(bisect.bisect_right(knots, x) - 1, 0), len(knots) - 2)
+    w = (x - knots[i]) / (knots[i + 1] - knots[i])
+    return i, min(max(w, 0.0), 1.0)
+
+
+class DelayLookupTable:
+    """Dense precomputed delays over every discrete feature combination.
+
+    Each (route, day, weather, event, hour) cell holds the forest's
+    predictions on a small grid of temperature, precipitation and attendance
+    knots; lookups interpolate trilinearly between the 8 surrounding knots,
+    clamping values outside the knot range. A lookup is a handful of index
+    computations and one (2, 2, 2) slice, independent of forest size.
+    Unknown levels (a route the model never saw) return None so callers can
+    fall back to the forest.
+    """
+
+    def __init__(self, values, levels, knots, report=None):
+        self.values = values
+        self.levels = levels
+        self.knots = {name: [float(v) for v in k] for name, k in knots.items()}
+        self.report = report or {}
+        self.level_index = {name: {v: i for i, v in enumerate(levels[name])} for name in DISCRETE_AXES}
+
+    @classmethod
+    def build(cls, model, knots=CONTINUOUS_KNOTS, max_cells=MAX_TABLE_CELLS):
+        # One scored grid per (route, day) keeps each predict call under MAX_GRID_CELLS
+        levels = model_levels(model)
+        shape = [len(levels[name]) for name in DISCRETE_AXES] + [len(k) for k in knots.values()]
+        cells = int(np.prod(shape, dtype=np.int64))
+        if cells > max_cells:
+            raise RuntimeError(
+                f"Lookup table would have {cells:,} cells ({cells * 4 / 2**20:,.0f} MB), "
+                f"over the {max_cells:,} cell budget; use fewer knots"
+            )
+        axes = {name: levels[name] for name in DISCRETE_AXES[2:]}
+        axes.update(knots)
+        values = np.empty(shape, dtype=np.float32)
+        base = {name: values_[0] for name, values_ in {**levels, **knots}.items()}
+        for r, route in enumerate(levels['Route_ID']):
+            for d, day in enumerate(levels['Day_OfWeek']):
+                values[r, d] = predict_grid(model, {**base, 'Route_ID': route, 'Day_OfWeek': day}, axes)
+        return cls(values, levels, knots)
+
+    @classmethod
+    def load(cls, path=LOOKUP_TABLE_PATH, mmap_mode='r'):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode=mmap_mode)
+        return cls(values, meta['levels'], meta['knots'], meta.get('report'))
+
+    def save(self, path=LOOKUP_TABLE_PATH):
+        # meta.json is written last, so a half-written directory never loads
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        # Renamed over the old file, so a process mapping the previous table keeps its pages
+        target = os.path.join(path, 'values.npy')
+        with open(target + '.tmp', 'wb') as f:
+            np.save(f, self.values)
+        os.replace(target + '.tmp', target)
+        with open(meta_path, 'w') as f:
+            json.dump({
+                'levels': self.levels,
+                'knots': self.knots,
+                'report': self.report,
+            }, f)
+
+    def _cell(self, row, skip=()):
+        index = []
+        for name in DISCRETE_AXES:
+            if name in skip:
+                index.append(slice(None))
+                continue
+            i = self.level_index[name].get(row[name] if name in ('Day_OfWeek', 'Hour') else str(row[name]))
+            if i is None:
+                return None
+            index.append(i)
+        # Trilinear weights of the 8 surrounding knots, as a (2, 2, 2) block
+        (it, wt), (ip, wp), (ia, wa) = [knot_weights(k, float(row[n])) for n, k in self.knots.items()]
+        index += [slice(it, it + 2), slice(ip, ip + 2), slice(ia, ia + 2)]
+        weights = np.multiply.outer(np.multiply.outer((1.0 - wt, wt), (1.0 - wp, wp)), (1.0 - wa, wa))
+        return tuple(index), weights
+
+    def lookup(self, row):
+        """Interpolated delay for one feature row, or None for unknown levels."""
+        cell = self._cell(row)
+        if cell is None:
+            return None
+        index, weights = cell
+        return float((self.values[index] * weights).sum())
+
+    def lookup_hours(self, row, hours=range(24)):
+        """Delays for `row` at each hour in `hours`, or None for unknown levels."""
+        cell = self._cell(row, skip=('Hour',))
+        if cell is None:
+            return None
+        index, weights = cell
+        by_hour = (self.values[index] * weights).sum(axis=(1, 2, 3))
+        return by_hour[[self.level_index['Hour'][h] for h in hours]]
+
+    def accuracy_report(self, model, frame, labels=None, rng=None, n_random=20000):
+        """Compare table lookups against the live forest.
+
+        Scores `frame` (typically the held-out test split, with its observed
+        `labels` when given) and `n_random` rows drawn uniformly over every
+        level and the knot ranges, which is where interpolation error is
+        largest. Rows whose levels the table does not cover are skipped.
+        """
+        rng = rng or np.random.default_rng(0)
+        random = pd.DataFrame({
+            name: [self.levels[name][i] for i in rng.integers(0, len(self.levels[name]), n_random)]
+            for name in DISCRETE_AXES
+        })
+        for name, knots in self.knots.items():
+            random[name] = rng.uniform(knots[0], knots[-1], n_random)
+
+        report = {}
+        for label, sample in (('test', frame), ('uniform', random)):
+            rows = sample.to_dict('records')
+            table = np.array([self.lookup(row) for row in rows], dtype=object)
+            covered = np.array([v is not None for v in table])
+            forest = predict_delays(model, sample[covered])
+            delta = np.abs(table[covered].astype(np.float64) - forest)
+            report[label] = {
+                'rows': int(covered.sum()),
+                'mean_abs_delta': round(float(delta.mean()), 4),
+                'p95_abs_delta': round(float(np.percentile(delta, 95)), 4),
+                'max_abs_delta': round(float(delta.max()), 4),
+            }
+            if label == 'test' and labels is not None:
+                observed = np.asarray(labels, dtype=np.float64)[covered]
+                report[label]['forest_mae'] = round(float(np.abs(forest - observed).mean()), 4)
+                report[label]['table_mae'] = round(float(np.abs(table[covered].astype(np.float64) - observed).mean()), 4)
+        self.report = report
+        return report
+
+
+def build_lookup_table(model, test_frame, test_labels=None, path=LOOKUP_TABLE_PATH,
+                       max_p95=MAX_P95_ABS_DELTA, max_abs=MAX_ABS_DELTA, knots=CONTINUOUS_KNOTS,
+                       max_cells=MAX_TABLE_CELLS):
+    """Build, check and save the lookup table for `model`.
+
+    Raises RuntimeError, without saving, when the table would exceed
+    `max_cells` (checked before anything is scored), or when its error
+    against the forest on `test_frame` exceeds `max_p95` at the 95th
+    percentile or `max_abs` anywhere.
+    """
+    start = time.perf_counter()
+    table = DelayLookupTable.build(model, knots, max_cells)
+    build_seconds = time.perf_counter() - start
+    report = table.accuracy_report(model, test_frame, test_labels)
+    report['build_seconds'] = round(build_seconds, 1)
+    report['cells'] = int(table.values.size)
+    test = report['test']
+    if test['p95_abs_delta'] > max_p95 or test['max_abs_delta'] > max_abs:
+        raise RuntimeError(
+            f"Lookup table is too far from the forest on the test split: p95 |delta| {test['p95_abs_delta']} "
+            f"(limit {max_p95}), max {test['max_abs_delta']} (limit {max_abs}) minutes"
+        )
+    table.save(path)
+    return table
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from gtfs import FEEDS, read_table
+from schedule import csr
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+DAY_SECONDS = 24 * 3600
+
+
+def parse_date(text):
+    # "YYYY-MM-DD" or GTFS "YYYYMMDD"
+    for fmt in ('%Y-%m-%d', '%Y%m%d'):
+        try:
+            return datetime.strptime(str(text), fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date '{text}', expected YYYY-MM-DD")
+
+
+class ServiceCalendar:
+    """Which service_ids run on a date, from calendar.txt and calendar_dates.txt.
+
+    Dates outside every calendar's validity range (the bundled feeds expired
+    long ago) fall back to the weekday pattern alone, so the timetable still
+    shows; `services_on` reports which rule was used.
+    """
+
+    def __init__(self, calendar, calendar_dates=None):
+        # calendar: service_id, monday..sunday, start_date, end_date
+        # calendar_dates: service_id, date, exception_type (1 added, 2 removed)
+        self.weekly = {}
+        for row in calendar.itertuples(index=False):
+            days = tuple(getattr(row, day) == '1' for day in WEEKDAYS)
+            self.weekly[row.service_id] = (days, parse_date(row.start_date), parse_date(row.end_date))
+        self.exceptions = {}
+        if calendar_dates is not None:
+            for row in calendar_dates.itertuples(index=False):
+                self.exceptions.setdefault(parse_date(row.date), {})[row.service_id] = row.exception_type == '1'
+        ranges = [(start, end) for _, start, end in self.weekly.values()]
+        self.first = min((start for start, _ in ranges), default=None)
+        self.last = max((end for _, end in ranges), default=None)
+
+    @classmethod
+    def from_feeds(cls, feeds=None):
+        calendars, calendar_dates = [], []
+        for feed in feeds or FEEDS:
+            calendars.append(read_table(feed, 'calendar'))
+            try:
+                calendar_dates.append(read_table(feed, 'calendar_dates', ['service_id', 'date', 'exception_type']))
+            except FileNotFoundError:
+                pass
+        return cls(
+            pd.concat(calendars, ignore_index=True),
+            pd.concat(calendar_dates, ignore_index=True) if calendar_dates else None,
+        )
+
+    def services_on(self, day):
+        # (frozenset of running service_ids, "calendar" or "weekday")
+        in_range = self.first is not None and self.first <= day <= self.last
+        services = {
+            service for service, (days, start, end) in self.weekly.items()
+            if days[day.weekday()] and (not in_range or start <= day <= end)
+        }
+        for service, added in self.exceptions.get(day, {}).items():
+            if added:
+                services.add(service)
+            else:
+                services.discard(service)
+        return frozenset(services), "calendar" if in_range else "weekday"
+
+
+class DepartureIndex:
+    """Per-stop departure times of one service day, ready for binary search.
+
+    Built from the ScheduleEngine event arrays for one set of running
+    service_ids: events of running trips, minus each trip's last stop (no
+    departure from there; one-stop trips in truncated feeds are kept),
+    grouped by stop in departure order with the
+    int32 departure seconds alongside. A stop's next departures are one
+    searchsorted on its slice.
+    """
+
+    def __init__(self, schedule, services):
+        running = np.array([service in services for service in schedule.trip_services], dtype=bool)
+        offsets = schedule.trip_offsets
+        last = np.zeros(schedule.n_events, dtype=bool)
+        last[offsets[1:][np.diff(offsets) > 1] - 1] = True
+        events = np.flatnonzero(running[schedule.event_trip] & ~last).astype(np.int32)
+
+        self.offsets, order = csr(schedule.event_stop[events], len(schedule.stop_ids), (schedule.departures[events],))
+        self.events = events[order]
+        self.times = schedule.departures[self.events]
+
+    def next_departures(self, stop, after, limit):
+        lo, hi = self.offsets[stop], self.offsets[stop + 1]
+        i = lo + np.searchsorted(self.times[lo:hi], after)
+        return self.events[i:min(i + limit, hi)]
+
+
+class DepartureBoard:
+    """Next departures from a stop on a date, honouring the service calendar.
+
+    Indexes are built lazily per distinct set of running services (a
+    handful across a week) and cached. Trips of the previous service day
+    that run past midnight (GTFS times of 24:00:00 and later) are merged in.
+    """
+
+    def __init__(self, schedule, calendar, max_cached=16):
+        self.schedule = schedule
+        self.calendar = calendar
+        self.max_cached = max_cached
+        self._indexes = {}
+
+    def index(self, services):
+        index = self._indexes.get(services)
+        if index is None:
+            if len(self._indexes) >= self.max_cached:
+                self._indexes.clear()
+            index = self._indexes[services] = DepartureIndex(self.schedule, services)
+        return index
+
+    def next_departures(self, stop, day, after, limit=10):
+        """Up to `limit` departures from stop index `stop` at or after `after`
+        (seconds past midnight of `day`).
+
+        Returns ([(event, seconds past midnight of `day`)], calendar mode).
+        """
+        services, mode = self.calendar.services_on(day)
+        today = self.index(services).next_departures(stop, after, limit)
+        found = [(int(e), int(self.schedule.departures[e])) for e in today]
+        previous, _ = self.calendar.services_on(day - timedelta(days=1))
+        overnight = self.index(previous).next_departures(stop, after + DAY_SECONDS, limit)
+        found += [(int(e), int(self.schedule.departures[e]) - DAY_SECONDS) for e in overnight]
+        found.sort(key=lambda item: item[1])
+        return found[:limit], mode
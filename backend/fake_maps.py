@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import time
+
+
+class FakeMapsClient:
+    """Offline stand-in for googlemaps.Client.
+
+    Durations are derived from a stable hash of the normalized place names so
+    the same origin/destination always gets the same answer, across processes.
+    `latency` (seconds) is slept on every call to mimic the network round trip.
+    """
+
+    def __init__(self, latency=0.0, min_seconds=600, max_seconds=5400):
+        self.latency = latency
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.calls = 0
+
+    def _duration(self, origin, destination):
+        key = f"{' '.join(str(origin).lower().split())}|{' '.join(str(destination).lower().split())}"
+        digest = int(hashlib.md5(key.encode()).hexdigest()[:8], 16)
+        return self.min_seconds + digest % (self.max_seconds - self.min_seconds)
+
+    def _distance_matrix_response(self, origins, destinations):
+        seconds = self._duration(origins, destinations)
+        return {
+            "status": "OK",
+            "rows": [{"elements": [{
+                "status": "OK",
+                "duration": {"value": seconds, "text": f"{seconds // 60} mins"},
+            }]}],
+        }
+
+    def distance_matrix(self, origins, destinations, mode=None, departure_time=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._distance_matrix_response(origins, destinations)
+
+    def directions(self, origin, destination, mode=None, departure_time=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        seconds = self._duration(origin, destination)
+        return [{
+            "legs": [{"duration": {"value": seconds, "text": f"{seconds // 60} mins"}}],
+            "overview_polyline": {"points": ""},
+        }]
+
+
+class AsyncFakeMapsClient(FakeMapsClient):
+    """Async counterpart of FakeMapsClient, matching maps_client.AsyncMapsClient."""
+
+    async def distance_matrix(self, origins, destinations, mode=None, departure_time=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._distance_matrix_response(origins, destinations)
+
+    async def aclose(self):
+        pass
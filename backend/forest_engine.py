@@ -0,0 +1,200 @@
+import json
+import os
+import numpy as np
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+# Directory of .npy node arrays plus meta.json, see CompiledForest.save
+COMPILED_MODEL_PATH = 'delay_model_compiled'
+ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'roots')
+
+
+def compile_pipeline(pipeline):
+    """Flatten a fitted ColumnTransformer + RandomForestRegressor pipeline.
+
+    Returns (arrays, meta): NumPy node arrays and the JSON-able encoder
+    metadata (see CompiledForest). All trees share one node array; leaves
+    point at themselves with an infinite threshold so a fixed number of
+    steps lands every tree on its leaf.
+    """
+    preprocessor = pipeline.named_steps['preprocessor']
+    forest = pipeline.named_steps['regressor']
+
+    categorical, categories, numerical = [], [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder' and transformer == 'drop':
+            continue
+        if isinstance(transformer, OneHotEncoder):
+            if transformer.drop is not None or transformer.handle_unknown != 'ignore':
+                raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop is supported")
+            categorical.extend(columns)
+            categories.extend([str(c) for c in values] for values in transformer.categories_)
+        elif transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer) and transformer.func is None):
+            numerical.extend(columns)
+        else:
+            raise ValueError(f"Unsupported transformer '{name}': {transformer!r}")
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    base = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        roots.append(base)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        # children[2 * node + went_left] -> next node
+        children.append(np.stack([
+            np.where(leaf, node_ids, tree.children_right),
+            np.where(leaf, node_ids, tree.children_left),
+        ], axis=1).ravel() + base)
+        values.append(tree.value[:, 0, 0])
+        base += tree.node_count
+
+    # Stored in the dtypes the evaluator indexes with, so a memory-mapped
+    # load is used as-is without per-process copies
+    arrays = {
+        'feature': np.concatenate(features).astype(np.int64),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children': np.concatenate(children).astype(np.int64),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int64),
+    }
+    meta = {
+        'categorical_columns': categorical,
+        'categories': categories,
+        'numerical_columns': numerical,
+        'n_features': int(forest.n_features_in_),
+        'max_depth': int(max(e.tree_.max_depth for e in forest.estimators_)),
+        'n_nodes': int(base),
+    }
+    return arrays, meta
+
+
+class CompiledForest:
+    """Pandas-free evaluator for a compiled delay-model pipeline.
+
+    Rows (dicts keyed by feature column, or a DataFrame) are one-hot encoded
+    straight into a dense float32 matrix using a precomputed category ->
+    column map; unknown categories encode as all zeros like
+    OneHotEncoder(handle_unknown='ignore'). Trees are walked in lockstep:
+    every step advances all (row, tree) pairs one level with a handful of
+    vectorized gathers, and pairs that reached a leaf are dropped every few
+    steps. Rows are walked `CHUNK_ROWS` at a time, which bounds the
+    per-(row, tree) work arrays whatever the batch size.
+
+    Node arrays are read-only, so `load` memory-maps them: every worker
+    process on a host shares one page-cache copy of the forest.
+    """
+
+    # Steps between dropping (row, tree) pairs that reached their leaf
+    COMPACT_EVERY = 8
+    # Rows per traversal: about 4 MB of int64 work per array at 100 trees
+    CHUNK_ROWS = 4096
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = meta['max_depth']
+        self.n_features = meta['n_features']
+
+        # One-hot columns come first, in category order, then numerical passthrough
+        self.categorical_columns = meta['categorical_columns']
+        self.numerical_columns = meta['numerical_columns']
+        self.category_column = []
+        offset = 0
+        for categories in meta['categories']:
+            self.category_column.append({c: offset + j for j, c in enumerate(categories)})
+            offset += len(categories)
+        self.numerical_offset = offset
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        return cls(*compile_pipeline(pipeline))
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH, mmap_mode='r'):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(arrays, meta)
+
+    def save(self, path=COMPILED_MODEL_PATH):
+        # meta.json is written last, so a half-written directory never loads
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        # Arrays go to a temp file and are renamed over the old ones: a process
+        # still mapping the previous forest keeps its (unlinked) pages
+        for name in ARRAY_NAMES:
+            target = os.path.join(path, f'{name}.npy')
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(self.arrays[name]))
+            os.replace(target + '.tmp', target)
+        with open(meta_path, 'w') as f:
+            json.dump(self.meta, f)
+
+    def encode(self, rows):
+        if hasattr(rows, 'columns'):
+            return self._encode_frame(rows)
+        X = np.zeros((len(rows), self.n_features), dtype=np.float32)
+        for r, row in enumerate(rows):
+            for mapping, column in zip(self.category_column, self.categorical_columns):
+                j = mapping.get(str(row[column]))
+                if j is not None:
+                    X[r, j] = 1.0
+            for j, column in enumerate(self.numerical_columns):
+                X[r, self.numerical_offset + j] = row[column]
+        return X
+
+    def _encode_frame(self, frame):
+        # Column-at-a-time encoding for DataFrames from the batch endpoints
+        X = np.zeros((len(frame), self.n_features), dtype=np.float32)
+        for mapping, column in zip(self.category_column, self.categorical_columns):
+            cols = np.fromiter((mapping.get(str(v), -1) for v in frame[column]), dtype=np.int64, count=len(frame))
+            known = np.flatnonzero(cols >= 0)
+            X[known, cols[known]] = 1.0
+        for j, column in enumerate(self.numerical_columns):
+            X[:, self.numerical_offset + j] = np.asarray(frame[column], dtype=np.float32)
+        return X
+
+    def predict_encoded(self, X):
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) <= self.CHUNK_ROWS:
+            return self._traverse(X.astype(np.float64))
+        return np.concatenate([
+            self._traverse(X[start:start + self.CHUNK_ROWS].astype(np.float64))
+            for start in range(0, len(X), self.CHUNK_ROWS)
+        ])
+
+    def _traverse(self, X):
+        n_rows, n_trees = len(X), len(self.roots)
+        flat = X.ravel()
+        leaves = np.tile(self.roots, n_rows)
+        pending = np.arange(n_rows * n_trees)
+        nodes = leaves.copy()
+        row_base = np.repeat(np.arange(n_rows, dtype=np.int64) * X.shape[1], n_trees)
+        while len(pending):
+            for _ in range(self.COMPACT_EVERY):
+                went_left = flat[row_base + self.feature[nodes]] <= self.threshold[nodes]
+                nodes = self.children[2 * nodes + went_left]
+            leaves[pending] = nodes
+            moving = self.children[2 * nodes + 1] != nodes
+            pending, nodes, row_base = pending[moving], nodes[moving], row_base[moving]
+        return self.value[leaves].reshape(n_rows, n_trees).mean(axis=1)
+
+    def predict(self, rows):
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not len(rows):
+            return np.empty(0)
+        return self.predict_encoded(self.encode(rows))
+
+    def predict_one(self, row):
+        return float(self.predict_encoded(self.encode([row]))[0])
@@ -0,0 +1,113 @@
+from collections import Counter
+from difflib import SequenceMatcher
+from schedule import normalize_name
+
+MAX_SUGGESTIONS = 10
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StopGeocoder:
+    """Offline place lookup over GTFS stop names and codes.
+
+    Every distinct normalized name (and stop code) is an entry pointing at
+    one or more stops. Autocomplete walks a character trie keyed on the full
+    name and on each word within it, so "ground" finds "Palace Ground".
+    Each trie node caches its first MAX_SUGGESTIONS entries, so a prefix
+    lookup costs one walk down the trie. Typos fall back to a trigram index
+    that shortlists candidates, ranked by difflib similarity.
+    """
+
+    def __init__(self, stop_ids, stop_names, stop_codes, lat, lon):
+        self.stop_ids = list(stop_ids)
+        self.lat = lat
+        self.lon = lon
+
+        # entry -> (display label, [stop indices])
+        self.labels = []
+        self.entry_stops = []
+        self.entry_index = {}
+        for i, (name, code) in enumerate(zip(stop_names, stop_codes)):
+            for label in (name, code):
+                key = normalize_name(label)
+                if not key:
+                    continue
+                if key not in self.entry_index:
+                    self.entry_index[key] = len(self.labels)
+                    self.labels.append(label)
+                    self.entry_stops.append([])
+                stops = self.entry_stops[self.entry_index[key]]
+                if i not in stops:
+                    stops.append(i)
+
+        # Whole names before inner words and shorter names first, so the
+        # cached suggestions favour the closest hits
+        keys = sorted(self.entry_index, key=lambda k: (len(k), k))
+        self.trie = {}
+        self.grams = {}
+        for key in keys:
+            self._insert(key, self.entry_index[key])
+            for gram in trigrams(key):
+                self.grams.setdefault(gram, []).append(self.entry_index[key])
+        for key in keys:
+            words = key.split(' ')
+            for w in range(1, len(words)):
+                self._insert(' '.join(words[w:]), self.entry_index[key])
+
+    @classmethod
+    def from_schedule(cls, schedule):
+        return cls(schedule.stop_ids, schedule.stop_names, schedule.stop_codes, schedule.stop_lat, schedule.stop_lon)
+
+    def _insert(self, text, entry):
+        node = self.trie
+        for ch in text:
+            node = node.setdefault(ch, {})
+            top = node.setdefault('', [])
+            if len(top) < MAX_SUGGESTIONS and entry not in top:
+                top.append(entry)
+
+    def _result(self, entry, score, match):
+        stop = self.entry_stops[entry][0]
+        return {
+            "name": self.labels[entry],
+            "stop_id": self.stop_ids[stop],
+            "stop_ids": [self.stop_ids[s] for s in self.entry_stops[entry]],
+            "lat": float(self.lat[stop]),
+            "lon": float(self.lon[stop]),
+            "score": round(score, 3),
+            "match": match,
+        }
+
+    def autocomplete(self, text, limit=MAX_SUGGESTIONS):
+        node = self.trie
+        for ch in normalize_name(text):
+            node = node.get(ch)
+            if node is None:
+                return []
+        return [self._result(e, 1.0, "prefix") for e in node.get('', [])[:limit]]
+
+    def fuzzy(self, text, limit=5, min_score=0.6, shortlist=25):
+        key = normalize_name(text)
+        if not key:
+            return []
+        shared = Counter()
+        for gram in trigrams(key):
+            shared.update(self.grams.get(gram, ()))
+        scored = []
+        for entry, _ in shared.most_common(shortlist):
+            score = SequenceMatcher(None, key, normalize_name(self.labels[entry])).ratio()
+            if score >= min_score:
+                scored.append((score, entry))
+        scored.sort(key=lambda item: -item[0])
+        return [self._result(e, s, "fuzzy") for s, e in scored[:limit]]
+
+    def resolve(self, text, min_score=0.8):
+        # Best single match: exact name/code, then fuzzy above min_score
+        entry = self.entry_index.get(normalize_name(text))
+        if entry is not None:
+            return self._result(entry, 1.0, "exact")
+        matches = self.fuzzy(text, limit=1, min_score=min_score)
+        return matches[0] if matches else None
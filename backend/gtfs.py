@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from columnar import is_fresh
+
+# Bundled feeds, relative to the repo's data/ directory
+GTFS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+FEEDS = {
+    'hyderabad': 'hyderabad_GTFS',
+    'karnataka': 'karnataka_GTFS',
+}
+
+
+def feed_path(feed, table):
+    return os.path.join(GTFS_DIR, FEEDS[feed], f'{table}.txt')
+
+
+def cache_path(feed, table):
+    return os.path.join(GTFS_DIR, FEEDS[feed], f'{table}.parquet')
+
+
+def read_table(feed, table, columns=None):
+    # All fields come back as strings with blanks kept as ''. The first read
+    # of a table writes a Parquet copy next to it, so later reads (and other
+    # processes) skip CSV parsing and load only the requested columns.
+    path, cache = feed_path(feed, table), cache_path(feed, table)
+    if is_fresh(cache, path):
+        names = pq.read_schema(cache).names
+        return pd.read_parquet(cache, columns=[c for c in names if columns is None or c in columns])
+    frame = read_csv_table(path)
+    try:
+        # Per-process temp name: concurrent workers may build the same cache
+        tmp_path = f'{cache}.{os.getpid()}.tmp'
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache)
+    except OSError:
+        pass  # Read-only data directory: keep serving from the CSV
+    return frame[[c for c in frame.columns if columns is None or c in columns]]
+
+
+def read_csv_table(path):
+    # The Karnataka export has a BOM and a trailing comma on every row, so
+    # columns are taken from the header rather than inferred from the data.
+    with open(path, encoding='utf-8-sig') as f:
+        header = [c for c in f.readline().strip().split(',') if c]
+    return pd.read_csv(
+        path, index_col=False, usecols=header, dtype=str,
+        keep_default_na=False, encoding='utf-8-sig'
+    )
+
+
+def parse_times(values):
+    # GTFS "HH:MM:SS" (hours may exceed 23) -> seconds after service-day midnight
+    parts = pd.Series(values, dtype=str).str.split(':', expand=True).astype(np.int32)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy(np.int32)
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_time(text):
+    # "HH:MM" or "HH:MM:SS" -> seconds after midnight
+    error = ValueError(f"Invalid time '{text}', expected HH:MM or HH:MM:SS")
+    try:
+        parts = [int(p) for p in str(text).split(':')]
+    except ValueError:
+        raise error
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3 or not (0 <= parts[1] < 60 and 0 <= parts[2] < 60) or parts[0] < 0:
+        raise error
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+HOURS = list(range(24))
+
+
+class NetworkHeatmap:
+    """Route x hour delay matrix for the current conditions, kept warm off-request.
+
+    `set_conditions` records the target conditions (and, after a model swap,
+    the new route list) and, if no refresh is running, submits one to
+    `executor`. The refresh scores the whole matrix with one
+    `compute(conditions, routes)` call and swaps in a new snapshot: the
+    JSON body, its gzip encoding and an ETag. Readers only ever see a
+    finished snapshot, so serving never waits on inference. If conditions
+    change mid-refresh, the refresh loops once more for the latest target.
+    """
+
+    def __init__(self, routes, compute, executor):
+        self.routes = list(routes)
+        self.compute = compute
+        self.executor = executor
+        self.conditions = None
+        self.snapshot = None
+        self.error = None
+        self._generation = 0
+        self._running = False
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        snapshot = self.snapshot
+        return snapshot is None or snapshot["generation"] != self._generation
+
+    def set_conditions(self, conditions, routes=None):
+        with self._lock:
+            self.conditions = dict(conditions)
+            if routes is not None:
+                self.routes = list(routes)
+            self._generation += 1
+            if self._running:
+                return
+            self._running = True
+        self.executor.submit(self._refresh)
+
+    def _refresh(self):
+        while True:
+            with self._lock:
+                target, routes, generation = self.conditions, self.routes, self._generation
+            start = time.perf_counter()
+            try:
+                delays = np.asarray(self.compute(target, routes), dtype=np.float64).reshape(len(routes), len(HOURS))
+            except Exception as e:
+                # Retry only for newer conditions; the same ones would fail again
+                with self._lock:
+                    self.error = str(e)
+                    if self._generation == generation:
+                        self._running = False
+                        return
+                continue
+            snapshot = self._snapshot(target, routes, generation, delays, time.perf_counter() - start)
+            with self._lock:
+                self.snapshot, self.error = snapshot, None
+                if self._generation == generation:
+                    self._running = False
+                    return
+
+    def _snapshot(self, conditions, routes, generation, delays, seconds):
+        # Delays in tenths of a minute keep the payload small
+        body = json.dumps({
+            "conditions": conditions,
+            "computed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "compute_seconds": round(seconds, 4),
+            "routes": routes,
+            "hours": HOURS,
+            "delays": np.round(delays, 1).tolist(),
+            "units": "minutes",
+        }, separators=(',', ':')).encode()
+        return {
+            "conditions": conditions,
+            "generation": generation,
+            "body": body,
+            "gzip_body": gzip.compress(body, compresslevel=6, mtime=0),
+            "etag": f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+        }
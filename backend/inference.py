@@ -0,0 +1,124 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+# Column order the delay model was trained on (see train_model.py)
+FEATURE_COLUMNS = [
+    "Route_ID", "Weather_Condition", "Event_Type",
+    "Hour", "Day_OfWeek", "Temperature", "Precipitation", "Event_Attendance"
+]
+
+CATEGORICAL_COLUMNS = FEATURE_COLUMNS[:3]
+NUMERICAL_COLUMNS = FEATURE_COLUMNS[3:]
+
+# Largest scenario grid we score in one request
+MAX_GRID_CELLS = 200_000
+
+# Rows scored per model.predict call in /predict-batch
+BATCH_CHUNK_ROWS = 2000
+
+
+def build_features(records):
+    # records: iterable of dicts keyed by FEATURE_COLUMNS
+    return pd.DataFrame.from_records(list(records), columns=FEATURE_COLUMNS)
+
+
+def coerce_features(frame):
+    # Validate and type a raw frame (JSON records or CSV rows) for the model
+    missing = [col for col in FEATURE_COLUMNS if col not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    frame = frame[FEATURE_COLUMNS].copy()
+    incomplete = [col for col in FEATURE_COLUMNS if frame[col].isna().any()]
+    if incomplete:
+        raise ValueError(f"Missing values in columns: {', '.join(incomplete)}")
+    for col in CATEGORICAL_COLUMNS:
+        frame[col] = frame[col].astype(str)
+    for col in NUMERICAL_COLUMNS:
+        frame[col] = pd.to_numeric(frame[col], errors="raise")
+    return frame
+
+
+def iter_chunks(records, size=BATCH_CHUNK_ROWS):
+    # Raw record lists; each becomes a frame inside predicted_chunks
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+def records_frame(records):
+    # A chunk of JSON records -> raw frame, rejecting anything but objects
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {i} of this chunk is a {type(record).__name__}, expected an object")
+    return pd.DataFrame.from_records(records)
+
+
+def predicted_chunks(model, chunks):
+    """Score an iterable of raw frames or record lists, one predict call each.
+
+    Yields the result dicts of one chunk at a time, one per row. A chunk
+    that fails validation yields a single error line covering its rows and
+    the stream carries on. If reading the next chunk fails (e.g. a malformed
+    CSV line), one error line from the current row to the end
+    (`"rows": [first, null]`) ends the stream, so a client never gets a
+    silently truncated body.
+    """
+    offset = 0
+    chunks = iter(chunks)
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        except Exception as e:
+            yield [{"rows": [offset, None], "error": str(e)}]
+            return
+        rows = len(chunk)
+        try:
+            frame = chunk if isinstance(chunk, pd.DataFrame) else records_frame(chunk)
+            delays = predict_delays(model, coerce_features(frame))
+        except Exception as e:
+            yield [{"rows": [offset, offset + rows - 1], "error": str(e)}]
+        else:
+            yield [{"row": offset + i, "predicted_delay": round(float(delay), 2)} for i, delay in enumerate(delays)]
+        offset += rows
+
+
+def stream_predictions(model, chunks):
+    # predicted_chunks, one result dict per row
+    for lines in predicted_chunks(model, chunks):
+        yield from lines
+
+
+def predict_delays(model, records):
+    # One model.predict call for the whole batch
+    frame = records if isinstance(records, pd.DataFrame) else build_features(records)
+    if len(frame) == 0:
+        return np.empty(0)
+    return model.predict(frame[FEATURE_COLUMNS])
+
+
+def scenario_frame(base, axes):
+    """Cartesian product of `axes` ({column: values}) over a base feature row.
+
+    Rows are in C order over the axes, so predictions reshape directly to
+    `[len(v) for v in axes.values()]`.
+    """
+    names = list(axes.keys())
+    values = [list(v) for v in axes.values()]
+    n_cells = int(np.prod([len(v) for v in values])) if values else 1
+    if n_cells > MAX_GRID_CELLS:
+        raise ValueError(f"Scenario grid has {n_cells} cells, limit is {MAX_GRID_CELLS}")
+
+    frame = pd.DataFrame({col: [base[col]] * n_cells for col in FEATURE_COLUMNS})
+    if names:
+        grid = np.array(list(itertools.product(*[range(len(v)) for v in values])))
+        for i, name in enumerate(names):
+            frame[name] = np.asarray(values[i], dtype=object)[grid[:, i]]
+    return frame.infer_objects()
+
+
+def predict_grid(model, base, axes):
+    shape = [len(v) for v in axes.values()]
+    delays = predict_delays(model, scenario_frame(base, axes))
+    return delays.reshape(shape) if shape else delays
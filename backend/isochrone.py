@@ -0,0 +1,120 @@
+import heapq
+from bisect import bisect_left
+import numpy as np
+from schedule import csr
+from stop_index import EARTH_RADIUS_M
+
+DAY_SECONDS = 24 * 3600
+ORIGIN, WALK = -1, -2
+
+
+class TransitGraph:
+    """Stops, the trips between them and walks between nearby ones, in CSR form.
+
+    A connection is a trip leaving a stop for its next one, identified by
+    the event it departs from; riding on follows the trip's events in the
+    ScheduleEngine arrays. Walk edges join stops within `walk_radius_m` of
+    each other, costed at straight-line distance over `walk_speed` (m/s),
+    grouped by stop in `walk_offsets`.
+
+    Which connections run, and when, depends on the service day and the
+    predicted delays, so each search lays out that day's stop -> departures
+    CSR (sorted by predicted departure) before a time-dependent Dijkstra
+    from the origin. Settling a stop boards every trip leaving it in time
+    and rides each to the end of the window, so trips that overtake one
+    another are handled exactly; a trip already boarded further up its
+    route is not ridden again. Staying on a trip needs no transfer,
+    boarding one after alighting needs `min_transfer` seconds, after a walk
+    none.
+    """
+
+    def __init__(self, schedule, stop_index, walk_radius_m=400, walk_speed=1.25, min_transfer=120):
+        self.schedule = schedule
+        self.min_transfer = min_transfer
+        n_stops = len(schedule.stop_ids)
+
+        offsets = schedule.trip_offsets
+        last = np.zeros(schedule.n_events, dtype=bool)
+        last[offsets[1:][np.diff(offsets) > 0] - 1] = True
+        self.connection_events = np.flatnonzero(~last).astype(np.int32)
+
+        chord = 2 * np.sin(walk_radius_m / EARTH_RADIUS_M / 2)
+        near = stop_index.tree.query_pairs(chord, output_type='ndarray').astype(np.int64).reshape(-1, 2)
+        near = np.concatenate([near, near[:, ::-1]])
+        distance = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(
+            np.linalg.norm(stop_index.tree.data[near[:, 0]] - stop_index.tree.data[near[:, 1]], axis=1) / 2, 1))
+        self.walk_offsets, order = csr(near[:, 0], n_stops, (distance,))
+        self.walk_to = near[order, 1].astype(np.int32)
+        self.walk_seconds = np.ceil(distance[order] / walk_speed).astype(np.int32)
+
+    def connections(self, services, previous_services, start, end):
+        """Connections departing in [start, end] seconds of the service day.
+
+        Trips of `services` run on the day; those of `previous_services`
+        still running after midnight (GTFS times past 24:00:00) come from
+        the day before. Returns (departure events, day shifts in seconds).
+        """
+        s = self.schedule
+        events = self.connection_events
+        found = []
+        for running, shift in ((services, 0), (previous_services, -DAY_SECONDS)):
+            mask = np.array([service in running for service in s.trip_services], dtype=bool)
+            time = s.departures[events] + shift
+            hit = events[mask[s.event_trip[events]] & (time >= start) & (time <= end)]
+            found.append((hit, np.full(len(hit), shift, dtype=np.int64)))
+        return np.concatenate([f[0] for f in found]), np.concatenate([f[1] for f in found])
+
+    def search(self, origin, start, budget, events, shifts, event_delay=None):
+        """Earliest arrival at every stop reachable from stop index `origin`
+        within `budget` seconds of leaving at `start`.
+
+        `events`/`shifts` come from `connections`; `event_delay` (minutes,
+        per event) moves each stop time by the delay predicted there.
+        Returns {stop: (arrival seconds, how)} where `how` is ORIGIN, WALK
+        or the event the last ride alighted at.
+        """
+        s = self.schedule
+        end = start + budget
+        delay = np.zeros(s.n_events, dtype=np.int64) if event_delay is None else np.rint(event_delay * 60).astype(np.int64)
+        dep = s.departures[events] + shifts + delay[events]
+        stops = s.event_stop[events]
+        order = np.lexsort((dep, stops))
+        offsets = np.searchsorted(stops[order], np.arange(len(s.stop_ids) + 1)).tolist()
+        dep, events, shifts = dep[order].tolist(), events[order].tolist(), shifts[order].tolist()
+
+        arrivals = (s.arrivals + delay).tolist()
+        event_stop, event_trip = s.event_stop.tolist(), s.event_trip.tolist()
+        trip_end = s.trip_offsets[1:].tolist()
+        walk_offsets, walk_to, walk_seconds = self.walk_offsets.tolist(), self.walk_to.tolist(), self.walk_seconds.tolist()
+
+        reached = {origin: (start, ORIGIN)}
+        boarded = {}  # (trip, day shift) -> earliest event boarded at
+        heap = [(start, origin)]
+
+        def relax(stop, t, how):
+            if t <= end and t < reached.get(stop, (end + 1,))[0]:
+                reached[stop] = (t, how)
+                heapq.heappush(heap, (t, stop))
+
+        while heap:
+            t, stop = heapq.heappop(heap)
+            if t > reached[stop][0]:
+                continue
+            ready = t + self.min_transfer if reached[stop][1] >= 0 else t
+            for i in range(bisect_left(dep, ready, offsets[stop], offsets[stop + 1]), offsets[stop + 1]):
+                if dep[i] > end:
+                    break
+                event, shift = events[i], shifts[i]
+                key = (event_trip[event], shift)
+                stop_at = boarded.get(key, trip_end[key[0]])
+                if event >= stop_at:
+                    continue
+                boarded[key] = event
+                for e in range(event + 1, stop_at):
+                    arrival = arrivals[e] + shift
+                    if arrival > end:
+                        break
+                    relax(event_stop[e], arrival, e)
+            for w in range(walk_offsets[stop], walk_offsets[stop + 1]):
+                relax(walk_to[w], t + walk_seconds[w], WALK)
+        return reached
@@ -1,11 +1,101 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import joblib
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from datetime import datetime, timedelta
+import json
+import math
+import os
+import httpx
+import numpy as np
 import pandas as pd
 import googlemaps # New dependency
+from fake_maps import FakeMapsClient, AsyncFakeMapsClient
+from maps_client import AsyncMapsClient
+from maps_cache import BaseTimeCache
+from schedule import ScheduleEngine, leg_to_dict
+from raptor import JourneyPlanner, MAX_TRANSFERS
+from stop_index import StopIndex
+from geocoder import StopGeocoder
+from route_catalogue import RouteCatalogue
+from trip_eta import TripEtaIndex
+from departures import DepartureBoard, ServiceCalendar, parse_date
+from isochrone import TransitGraph, ORIGIN, WALK
+from observations import LiveDelayStats, ObservationIngestor, TrainingLog, OBSERVED_LOG_PATH, follow_file
+from gtfs import format_time, parse_time
+from forest_engine import CompiledForest
+from model_store import MODEL_PATH, load_delay_model, describe_load, is_fresh
+from model_registry import ModelManager, ModelRegistry, ServingModel
+from delay_table import DelayLookupTable, LOOKUP_TABLE_PATH, model_levels
+from heatmap import NetworkHeatmap, HOURS
+from batcher import MicroBatcher
+from metrics import LatencyMetrics, RequestMetricsMiddleware
+from inference import FEATURE_COLUMNS, BATCH_CHUNK_ROWS, MAX_GRID_CELLS, build_features, iter_chunks, predict_delays, predict_grid, predicted_chunks
 
-app = FastAPI(title="Industrial Transit Prediction API")
+GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "Your API key is here")
+FAKE_MAPS = bool(os.environ.get("TRANSIT_FAKE_MAPS"))
+FAKE_MAPS_LATENCY = float(os.environ.get("TRANSIT_FAKE_MAPS_LATENCY", "0"))
+
+# Upstream calls are capped and time-boxed; forest inference gets its own
+# threads so it never queues behind requests waiting on the network
+MAPS_MAX_CONCURRENCY = int(os.environ.get("MAPS_MAX_CONCURRENCY", "32"))
+MAPS_TIMEOUT = float(os.environ.get("MAPS_TIMEOUT", "5"))
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+
+# Micro-batching window for single-row predictions: wait up to
+# INFERENCE_MAX_WAIT_MS for up to INFERENCE_MAX_BATCH rows (1 disables batching)
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "64"))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "2"))
+# Largest /predict-batch (JSON or CSV) upload accepted; bigger ones get a 413
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(64 * 2**20)))
+
+# How often to poll the model registry for a newly published version (0 disables)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "10"))
+# Observed trip updates: a newline-delimited GTFS-Realtime JSON file to follow,
+# and where to log them as training rows ("" to keep live stats only)
+OBSERVATIONS_FILE = os.environ.get("OBSERVATIONS_FILE")
+OBSERVED_LOG = os.environ.get("OBSERVED_LOG", OBSERVED_LOG_PATH)
+
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+# Per-stage latency for /metrics
+metrics = LatencyMetrics()
+
+@asynccontextmanager
+async def lifespan(app):
+    if FAKE_MAPS:
+        base_time_cache.async_client = AsyncFakeMapsClient(latency=FAKE_MAPS_LATENCY)
+    else:
+        base_time_cache.async_client = AsyncMapsClient(
+            GOOGLE_MAPS_API_KEY, max_concurrency=MAPS_MAX_CONCURRENCY, timeout=MAPS_TIMEOUT
+        )
+    if models.active is not None:
+        network_heatmap.set_conditions(
+            {**HEATMAP_DEFAULT_CONDITIONS, "Day_OfWeek": datetime.now().weekday()},
+            routes=model_levels(models.active.model)['Route_ID'],
+        )
+    watcher = None
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(models.watch(MODEL_WATCH_INTERVAL, inference_executor))
+    follower = None
+    if OBSERVATIONS_FILE:
+        follower = asyncio.create_task(observation_ingestor.consume(follow_file(OBSERVATIONS_FILE, follow=True)))
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    if follower is not None:
+        follower.cancel()
+    if observation_ingestor.log is not None:
+        # The last flush writes Parquet; keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, observation_ingestor.log.close)
+    await base_time_cache.async_client.aclose()
+    inference_executor.shutdown(wait=False)
+
+app = FastAPI(title="Industrial Transit Prediction API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -15,95 +105,903 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware, metrics=metrics)
 
 # Initialize Google Maps Client
 # Get your API key from Google Cloud Console
-gmaps = googlemaps.Client(key="Your API key is here")
+# Set TRANSIT_FAKE_MAPS=1 to run offline against the local stand-in
+if FAKE_MAPS:
+    gmaps = FakeMapsClient(latency=FAKE_MAPS_LATENCY)
+else:
+    gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+
+# Base-time lookups are dominated by a few hundred repeated origin/destination pairs
+base_time_cache = BaseTimeCache(
+    gmaps,
+    maxsize=int(os.environ.get("BASE_TIME_CACHE_SIZE", "2048")),
+    ttl=float(os.environ.get("BASE_TIME_CACHE_TTL", "900"))
+)
+
+# Route x hour delay matrix for /network-heatmap over the routes the model
+# knows, refreshed on the inference executor whenever conditions change
+HEATMAP_DEFAULT_CONDITIONS = {
+    "Weather_Condition": "Sunny", "Event_Type": "None", "Day_OfWeek": 0,
+    "Temperature": 30.0, "Precipitation": 0.0, "Event_Attendance": 0,
+}
+
+def heatmap_delays(conditions, routes):
+    # Whole matrix in one vectorized pass
+    base = {**conditions, "Route_ID": routes[0], "Hour": 0}
+    return predict_grid(models.active.model, base, {"Route_ID": routes, "Hour": HOURS})
+
+network_heatmap = NetworkHeatmap([], heatmap_delays, inference_executor)
+
+def on_model_swap(serving):
+    # The new version may know different routes
+    conditions = network_heatmap.conditions or {**HEATMAP_DEFAULT_CONDITIONS, "Day_OfWeek": datetime.now().weekday()}
+    network_heatmap.set_conditions(conditions, routes=model_levels(serving.model)['Route_ID'])
+
+# Load Model: the current version from the model registry (hot-swapped when
+# train_model.py publishes a new one), else the top-level artifacts. Either
+# way small batches are scored by the memory-mapped compiled forest and large
+# ones (batch endpoints, scenario grids, the heatmap) by the sklearn pipeline.
+# DELAY_LOOKUP_TABLE=1 enables the O(1) lookup-table serving mode.
+USE_LOOKUP_TABLE = bool(os.environ.get("DELAY_LOOKUP_TABLE"))
+models = ModelManager(ModelRegistry(), HEATMAP_DEFAULT_CONDITIONS, lookup_table=USE_LOOKUP_TABLE, on_swap=on_model_swap)
+
+def load_top_level_model():
+    model, info = load_delay_model() # cite: 2
+    print(describe_load(info))
+    lookup_table = None
+    if USE_LOOKUP_TABLE:
+        if is_fresh(LOOKUP_TABLE_PATH, MODEL_PATH):
+            lookup_table = DelayLookupTable.load(LOOKUP_TABLE_PATH)
+            info["lookup_table"] = lookup_table.report
+            print(f"Serving from {LOOKUP_TABLE_PATH}: {lookup_table.report}")
+        else:
+            print(f"DELAY_LOOKUP_TABLE set but {LOOKUP_TABLE_PATH} is missing or stale; re-run train_model.py --lookup-table")
+    return ServingModel(model, info, lookup_table)
+
+if models.registry.current() is not None:
+    try:
+        models.reload()
+    except Exception as e:
+        # A broken CURRENT version must not stop the API from booting
+        print(f"Failed to load registry version {models.registry.current()}: {e}; falling back to {MODEL_PATH}")
+if models.active is None:
+    try:
+        models.active = load_top_level_model()
+    except FileNotFoundError:
+        # Model artifacts are not checked in; prediction endpoints return 500 until trained
+        print(f"No trained model: run data_generator.py and train_model.py to build {MODEL_PATH}")
+
+def serving_model():
+    # One snapshot per request, so a concurrent swap never mixes versions
+    serving = models.active
+    if serving is None:
+        raise HTTPException(status_code=500, detail="Model not trained")
+    return serving
 
-# Load Model
+# Load bundled GTFS schedules (local base-time source and journey planner)
 try:
-    model = joblib.load('delay_model.pkl') # cite: 2
+    schedule = ScheduleEngine.from_feeds()
+    planner = JourneyPlanner(schedule)
+    stop_index = StopIndex.load_or_build(schedule)
+    geocoder = StopGeocoder.from_schedule(schedule)
+    trip_eta_index = TripEtaIndex(schedule)
+    service_calendar = ServiceCalendar.from_feeds()
+    departure_board = DepartureBoard(schedule, service_calendar)
+    transit_graph = TransitGraph(schedule, stop_index)
 except FileNotFoundError:
-    model = None
+    schedule = None
+    planner = None
+    stop_index = None
+    geocoder = None
+    trip_eta_index = None
+    service_calendar = None
+    departure_board = None
+    transit_graph = None
 
-class TripPredictionRequest(BaseModel):
-    origin: str
-    destination: str
-    Route_ID: str
+# Live per-route delay stats from observed trip updates, served next to the
+# predictions, and the append-only training log train_model.py can read
+live_delays = LiveDelayStats()
+observation_ingestor = ObservationIngestor(live_delays, TrainingLog(OBSERVED_LOG) if OBSERVED_LOG else None, schedule)
+
+# Route list for /routes, rebuilt only when the GTFS routes/agency files change
+try:
+    route_catalogue = RouteCatalogue()
+except FileNotFoundError:
+    route_catalogue = None
+
+# Fuzzy matches at or above this score stand in for the typed place name
+PLACE_MATCH_SCORE = float(os.environ.get("PLACE_MATCH_SCORE", "0.9"))
+
+class TripConditions(BaseModel):
     Weather_Condition: str
     Event_Type: str
-    Hour: int
     Day_OfWeek: int
     Temperature: float
     Precipitation: float
     Event_Attendance: int
 
+class TripFeatures(TripConditions):
+    Route_ID: str
+    Hour: int
+
+class TripPredictionRequest(TripFeatures):
+    origin: str
+    destination: str
+    # "gtfs" takes base time from the bundled schedule (origin/destination are
+    # stop ids, codes or names); "auto" tries it first and falls back to maps
+    base_time_source: Literal["maps", "gtfs", "auto"] = "maps"
+    trip_id: Optional[str] = None
+
+class ValueRange(BaseModel):
+    start: float
+    stop: float
+    step: float = 1.0
+
+    @model_validator(mode="after")
+    def check_size(self):
+        # Rejected (422) before anything is allocated for the range
+        if not all(math.isfinite(v) for v in (self.start, self.stop, self.step)):
+            raise ValueError("start, stop and step must be finite")
+        if self.step <= 0:
+            raise ValueError("step must be positive")
+        if self.count() > MAX_GRID_CELLS:
+            raise ValueError(f"Range has {self.count()} values, limit is {MAX_GRID_CELLS}")
+        return self
+
+    def count(self):
+        # Inclusive of `stop`
+        return max(math.floor((self.stop - self.start) / self.step + 1e-9) + 1, 0)
+
+    def values(self):
+        return np.round(self.start + self.step * np.arange(self.count()), 4).tolist()
+
+class ScenarioGridRequest(TripFeatures):
+    # Any axis left empty stays fixed at the base value above
+    hours: Optional[List[int]] = None
+    days: Optional[List[int]] = None
+    weather_conditions: Optional[List[str]] = None
+    precipitation: Optional[ValueRange] = None
+
+class JourneyRequest(TripConditions):
+    origin: str
+    destination: str
+    departure_time: str  # HH:MM or HH:MM:SS
+    max_transfers: int = Field(3, ge=0, le=MAX_TRANSFERS)
+
+class ModelVersionRequest(BaseModel):
+    # Registry version name; None means the registry's current version
+    version: Optional[str] = None
+
+def feature_row(request: TripFeatures):
+    return {col: getattr(request, col) for col in FEATURE_COLUMNS}
+
+async def run_inference(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, fn, *args)
+
+def predict_rows(rows, model):
+    # A few feature rows, scored by the request's model snapshot: the compiled
+    # forest encodes dicts without pandas. Each step is timed separately for /metrics.
+    if not rows:
+        return np.empty(0)
+    engine = model.engine(len(rows))
+    if isinstance(engine, CompiledForest):
+        with metrics.timer("encode"):
+            X = engine.encode(rows)
+        with metrics.timer("forest"):
+            return engine.predict_encoded(X)
+    with metrics.timer("dataframe"):
+        frame = build_features(rows)
+    with metrics.timer("column_transform"):
+        X = engine.named_steps['preprocessor'].transform(frame)
+    with metrics.timer("forest"):
+        return engine.named_steps['regressor'].predict(X)
+
+def predict_snapshot_rows(items):
+    # (model, row) pairs from the micro-batcher. Rows queued across a model
+    # swap carry different snapshots; each group is scored by its own model.
+    groups = {}
+    for i, (model, _) in enumerate(items):
+        groups.setdefault(id(model), (model, []))[1].append(i)
+    delays = np.empty(len(items))
+    for model, indices in groups.values():
+        delays[indices] = predict_rows([items[i][1] for i in indices], model)
+    return delays
+
+# Concurrent /predict-trip requests share one forest call
+inference_batcher = MicroBatcher(
+    predict_snapshot_rows, inference_executor,
+    max_batch=INFERENCE_MAX_BATCH, max_wait=INFERENCE_MAX_WAIT_MS / 1000, observe=metrics.observe
+)
+
+def resolve_place(text):
+    # Free text -> offline GTFS stop match, or None to pass the text through
+    return geocoder.resolve(text, min_score=PLACE_MATCH_SCORE) if geocoder else None
+
+def place_stop(text, match):
+    return match["stop_id"] if match else text
+
+def place_query(text, match):
+    # Send Google coordinates instead of text so it skips geocoding, and
+    # spelling variants of a stop share one base-time cache entry
+    return f"{match['lat']},{match['lon']}" if match else text
+
+def scheduled_leg(request: TripPredictionRequest, origin, destination):
+    if schedule is None:
+        return None
+    # Restrict to the requested trip, else to Route_ID when it is a GTFS route
+    route_id = request.Route_ID if request.Route_ID in schedule.route_index else None
+    return schedule.travel_time(
+        origin, destination,
+        trip_id=request.trip_id, route_id=route_id, after=request.Hour * 3600
+    )
+
 @app.post("/predict-trip")
-def predict_trip(request: TripPredictionRequest):
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not trained")
+async def predict_trip(request: TripPredictionRequest):
+    serving = serving_model()
 
     try:
-        # 1. Get Base Time from Google Maps
-        directions = gmaps.distance_matrix(request.origin, request.destination, mode="transit")
-        google_time_sec = directions['rows'][0]['elements'][0]['duration']['value']
-        google_time_min = google_time_sec / 60
-
-        # 2. Get ML Predicted Delay
-        features = pd.DataFrame([{
-            "Route_ID": request.Route_ID,
-            "Weather_Condition": request.Weather_Condition,
-            "Event_Type": request.Event_Type,
-            "Hour": request.Hour,
-            "Day_OfWeek": request.Day_OfWeek,
-            "Temperature": request.Temperature,
-            "Precipitation": request.Precipitation,
-            "Event_Attendance": request.Event_Attendance
-        }])
-        
-        delay_prediction = model.predict(features)[0] # cite: 2
+        # 1. Get Base Time from the GTFS schedule or Google Maps (cached, non-blocking)
+        with metrics.timer("resolve_places"):
+            origin, destination = resolve_place(request.origin), resolve_place(request.destination)
+        leg = None
+        if request.base_time_source != "maps":
+            with metrics.timer("base_time_gtfs"):
+                leg = scheduled_leg(request, place_stop(request.origin, origin), place_stop(request.destination, destination))
+            if leg is None and request.base_time_source == "gtfs":
+                raise HTTPException(status_code=404, detail="No scheduled trip serves this origin/destination")
+        if leg is not None:
+            google_time_min = (leg.arrival - leg.departure) / 60
+        else:
+            with metrics.timer("base_time_maps"):
+                google_time_min = await base_time_cache.get_async(
+                    place_query(request.origin, origin), place_query(request.destination, destination)
+                )
+
+        # 2. Get ML Predicted Delay: table lookup, else the forest via the micro-batcher
+        row = feature_row(request)
+        delay_prediction = None
+        if serving.lookup_table:
+            with metrics.timer("lookup_table"):
+                delay_prediction = serving.lookup_table.lookup(row)
+        delay_source = "lookup" if delay_prediction is not None else "forest"
+        if delay_prediction is None:
+            with metrics.timer("delay_prediction"):
+                delay_prediction = await inference_batcher.submit((serving.model, row)) # cite: 2
+        if models.shadow is not None:
+            # Candidate scoring happens later, in batches, off this request
+            models.shadow.record(row, delay_prediction)
         total_time = google_time_min + delay_prediction
 
-        return {
+        result = {
             "google_maps_base_time": round(google_time_min, 2),
             "predicted_extra_delay": round(delay_prediction, 2),
             "total_estimated_arrival": round(total_time, 2),
+            "base_time_source": "gtfs" if leg is not None else "maps",
+            "delay_source": delay_source,
+            "observed": live_delays.features(request.Route_ID, request.Hour),
             "units": "minutes"
         }
+        if leg is not None:
+            result["scheduled_trip"] = leg_to_dict(leg)
+        if origin or destination:
+            result["resolved_places"] = {"origin": origin, "destination": destination}
+        return result
+    except HTTPException:
+        raise
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="Google Maps request timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/plan-journey")
+async def plan_journey(request: JourneyRequest):
+    serving = serving_model()
+    if planner is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+
+    try:
+        departure = parse_time(request.departure_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # 1. Earliest-arrival itinerary from the bundled GTFS feeds
+        origin, destination = resolve_place(request.origin), resolve_place(request.destination)
+        legs = await run_inference(
+            planner.plan, place_stop(request.origin, origin), place_stop(request.destination, destination),
+            departure, request.max_transfers
+        )
+        if legs is None:
+            raise HTTPException(status_code=404, detail="No scheduled journey found for this origin/destination")
+
+        # 2. Predicted delay for every leg in one batched call
+        conditions = request.model_dump(include=set(TripConditions.model_fields))
+        rows = [{**conditions, "Route_ID": leg.route_id, "Hour": (leg.departure // 3600) % 24} for leg in legs]
+        delays = await run_inference(predict_rows, rows, serving.model)
+
+        itinerary = []
+        previous_eta = None
+        for leg, delay in zip(legs, delays):
+            delay = float(delay)
+            eta = leg.arrival + delay * 60
+            item = planner.leg_to_dict(leg)
+            item["predicted_delay"] = round(delay, 2)
+            item["predicted_arrival"] = format_time(eta)
+            # Connection is at risk if the previous leg's predicted arrival misses this boarding
+            item["transfer_at_risk"] = previous_eta is not None and previous_eta + planner.min_transfer > leg.departure
+            itinerary.append(item)
+            previous_eta = eta
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "legs": itinerary,
+        "transfers": max(len(legs) - 1, 0),
+        "scheduled_departure": format_time(legs[0].departure) if legs else None,
+        "scheduled_arrival": format_time(legs[-1].arrival) if legs else None,
+        "predicted_arrival": format_time(previous_eta) if legs else None,
+        "scheduled_minutes": round((legs[-1].arrival - departure) / 60, 2) if legs else 0.0,
+        "units": "minutes"
+    }
+
+def eta_conditions(
+    Weather_Condition: str = "Sunny", Event_Type: str = "None", Day_OfWeek: Optional[int] = None,
+    Temperature: float = 30.0, Precipitation: float = 0.0, Event_Attendance: int = 0,
+):
+    # Query-string trip conditions for the ETA endpoints; the day defaults to today
+    if Day_OfWeek is None:
+        Day_OfWeek = datetime.now().weekday()
+    return TripConditions(
+        Weather_Condition=Weather_Condition, Event_Type=Event_Type, Day_OfWeek=Day_OfWeek,
+        Temperature=Temperature, Precipitation=Precipitation, Event_Attendance=Event_Attendance,
+    ).model_dump()
+
+def hourly_route_delays(serving, route_id, conditions):
+    # Whole-trip delay for each hour of the day: one table slice, else one batched call
+    row = {**conditions, "Route_ID": route_id, "Hour": 0}
+    delays = serving.lookup_table.lookup_hours(row) if serving.lookup_table else None
+    if delays is None:
+        delays = predict_grid(serving.model, row, {"Hour": HOURS})
+    return np.asarray(delays, dtype=np.float64)
+
+def scored_trips(serving, route_id, trips, conditions):
+    with metrics.timer("trip_eta"):
+        return trip_eta_index.trip_etas(trips, hourly_route_delays(serving, route_id, conditions))
+
+@app.get("/trip/{trip_id}/eta")
+async def trip_eta(trip_id: str, conditions: dict = Depends(eta_conditions)):
+    # Predicted arrival at every stop of one GTFS trip
+    serving = serving_model()
+    if trip_eta_index is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    trip = schedule.trip_index.get(trip_id)
+    if trip is None:
+        raise HTTPException(status_code=404, detail=f"Unknown trip_id: {trip_id}")
+    route_id = schedule.route_ids[schedule.trip_route[trip]]
+    try:
+        (result,) = await run_inference(scored_trips, serving, route_id, [trip], conditions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {**result, "conditions": conditions, "units": "minutes"}
+
+@app.get("/route/{route_id}/eta")
+async def route_eta(route_id: str, after: Optional[str] = None, limit: Optional[int] = None,
+                    conditions: dict = Depends(eta_conditions)):
+    # Per-stop ETAs for every trip of a route (a whole line for a station
+    # board) from one prediction. `after` keeps trips still running at or
+    # after that time; `limit` caps the number of trips.
+    serving = serving_model()
+    if trip_eta_index is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    route = schedule.route_index.get(route_id)
+    if route is None:
+        raise HTTPException(status_code=404, detail=f"Unknown route_id: {route_id}")
+    trips = schedule.route_trip_list(route)
+    if after is not None:
+        try:
+            after_seconds = parse_time(after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        offsets = schedule.trip_offsets
+        running = offsets[trips + 1] > offsets[trips]
+        trips = trips[running]
+        trips = trips[schedule.arrivals[offsets[trips + 1] - 1] >= after_seconds]
+    if limit is not None:
+        trips = trips[:max(limit, 0)]
+    try:
+        results = await run_inference(scored_trips, serving, route_id, trips, conditions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"route_id": route_id, "trips": results, "conditions": conditions, "units": "minutes"}
+
+def route_hour_delays(serving, conditions, pairs):
+    # Whole-trip delay per distinct (route_id, hour): table lookups, else one batched call
+    rows = [{**conditions, "Route_ID": route_id, "Hour": hour} for route_id, hour in pairs]
+    delays = [serving.lookup_table.lookup(row) for row in rows] if serving.lookup_table else [None] * len(rows)
+    missing = [i for i, delay in enumerate(delays) if delay is None]
+    if missing:
+        for i, delay in zip(missing, predict_delays(serving.model, [rows[i] for i in missing])):
+            delays[i] = float(delay)
+    return dict(zip(pairs, delays))
+
+@app.get("/stops/{stop}/departures")
+async def stop_departures(stop: str, request: Request, after: Optional[str] = None, date: Optional[str] = None,
+                          limit: int = 10, conditions: dict = Depends(eta_conditions)):
+    # Next departures from a stop (id, code or exact name) on that date's
+    # service, each with the predicted delay for its route and hour.
+    # `after` (HH:MM) and `date` (YYYY-MM-DD) default to now.
+    serving = serving_model()
+    if departure_board is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    stop_idx = schedule.resolve_stop(stop)
+    if stop_idx is None:
+        raise HTTPException(status_code=404, detail=f"Unknown stop: {stop}")
+    now = datetime.now()
+    try:
+        day = parse_date(date) if date is not None else now.date()
+        after_seconds = parse_time(after) if after is not None else now.hour * 3600 + now.minute * 60
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if "Day_OfWeek" not in request.query_params:
+        conditions["Day_OfWeek"] = day.weekday()
+
+    with metrics.timer("departure_search"):
+        found, calendar_mode = departure_board.next_departures(stop_idx, day, after_seconds, max(min(limit, 100), 0))
+    trips = [schedule.event_trip[e] for e, _ in found]
+    pairs = sorted({(schedule.route_ids[schedule.trip_route[t]], (seconds // 3600) % 24) for t, (_, seconds) in zip(trips, found)})
+    try:
+        delays = await run_inference(route_hour_delays, serving, conditions, pairs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    departures = []
+    for trip, (event, seconds) in zip(trips, found):
+        route_id = schedule.route_ids[schedule.trip_route[trip]]
+        trip_delay = delays[(route_id, (seconds // 3600) % 24)]
+        # Delay picked up by the time the trip reaches this stop (see /trip/{trip_id}/eta)
+        delay_here = float(trip_eta_index.progress[event]) * trip_delay
+        final_stop = schedule.event_stop[schedule.trip_offsets[trip + 1] - 1]
+        departures.append({
+            "trip_id": schedule.trip_ids[trip],
+            "route_id": route_id,
+            "destination": schedule.stop_names[final_stop],
+            "scheduled_departure": format_time(seconds),
+            "predicted_departure": format_time(seconds + round(delay_here * 60)),
+            "predicted_delay": round(delay_here, 2),
+            "predicted_trip_delay": round(trip_delay, 2),
+        })
+    return {
+        "stop_id": schedule.stop_ids[stop_idx],
+        "stop_name": schedule.stop_names[stop_idx],
+        "date": day.isoformat(),
+        "after": format_time(after_seconds),
+        "calendar": calendar_mode,
+        "departures": departures,
+        "conditions": conditions,
+        "units": "minutes",
+    }
+
+def reachable_stops(serving, conditions, origin, day, start, budget):
+    # Isochrone search on the day's connections, delayed as /trip/{trip_id}/eta would predict
+    services, calendar_mode = service_calendar.services_on(day)
+    previous, _ = service_calendar.services_on(day - timedelta(days=1))
+    events, shifts = transit_graph.connections(services, previous, start, start + budget)
+    trips = np.unique(schedule.event_trip[events])
+    routes = schedule.trip_route[trips]
+    idx, lengths = trip_eta_index.events(trips)
+    pairs = sorted({(schedule.route_ids[r], int(h)) for r, h in zip(np.repeat(routes, lengths), trip_eta_index.hour[idx])})
+    delays = route_hour_delays(serving, conditions, pairs)
+    hourly = np.zeros((len(schedule.route_ids), 24))
+    for (route_id, hour), delay in delays.items():
+        hourly[schedule.route_index[route_id], hour] = delay
+    with metrics.timer("isochrone_search"):
+        idx, _, accrued = trip_eta_index.propagate(trips, hourly[routes])
+        event_delay = np.zeros(schedule.n_events)
+        event_delay[idx] = accrued
+        reached = transit_graph.search(origin, start, budget, events, shifts, event_delay)
+    return reached, calendar_mode
+
+@app.get("/stops/{stop}/isochrone")
+async def stop_isochrone(stop: str, request: Request, minutes: int = 30, after: Optional[str] = None,
+                         date: Optional[str] = None, conditions: dict = Depends(eta_conditions)):
+    # Every stop reachable from a stop within `minutes` of leaving at `after`
+    # (HH:MM, default now) on `date`, by transit with predicted delays and
+    # short walks between nearby stops, as GeoJSON points
+    serving = serving_model()
+    if transit_graph is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    stop_idx = schedule.resolve_stop(stop)
+    if stop_idx is None:
+        raise HTTPException(status_code=404, detail=f"Unknown stop: {stop}")
+    if not 0 < minutes <= 24 * 60:
+        raise HTTPException(status_code=400, detail="minutes must be between 1 and 1440")
+    now = datetime.now()
+    try:
+        day = parse_date(date) if date is not None else now.date()
+        start = parse_time(after) if after is not None else now.hour * 3600 + now.minute * 60
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if "Day_OfWeek" not in request.query_params:
+        conditions["Day_OfWeek"] = day.weekday()
+
+    try:
+        reached, calendar_mode = await run_inference(reachable_stops, serving, conditions, stop_idx, day, start, minutes * 60)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    features = []
+    for stop_i, (arrival, how) in sorted(reached.items(), key=lambda item: item[1][0]):
+        ride = how not in (ORIGIN, WALK)
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(schedule.stop_lon[stop_i]), float(schedule.stop_lat[stop_i])]},
+            "properties": {
+                "stop_id": schedule.stop_ids[stop_i],
+                "stop_name": schedule.stop_names[stop_i],
+                "arrival": format_time(arrival),
+                "minutes": round((arrival - start) / 60, 1),
+                "mode": "origin" if how == ORIGIN else "walk" if how == WALK else "transit",
+                "route_id": schedule.route_ids[schedule.trip_route[schedule.event_trip[how]]] if ride else None,
+                "trip_id": schedule.trip_ids[schedule.event_trip[how]] if ride else None,
+            },
+        })
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "properties": {
+            "origin": schedule.stop_ids[stop_idx],
+            "date": day.isoformat(),
+            "departure": format_time(start),
+            "minutes": minutes,
+            "calendar": calendar_mode,
+            "conditions": conditions,
+        },
+    }
+
+# Most stops one /stops/nearby response lists
+MAX_NEARBY_STOPS = 100
+
+@app.get("/stops/nearby")
+def stops_nearby(lat: float, lon: float, k: int = Query(5, gt=0, le=MAX_NEARBY_STOPS),
+                 radius_m: Optional[float] = Query(None, gt=0)):
+    # k nearest stops, or every stop within radius_m (nearest first, at most k)
+    if stop_index is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+
+    if radius_m is not None:
+        hits = stop_index.within(lat, lon, radius_m, limit=k)
+    else:
+        hits = stop_index.nearest(lat, lon, k)
+    return {"stops": stop_index.describe(hits)}
+
+@app.get("/geocode")
+def geocode(q: str, min_score: float = 0.8):
+    if geocoder is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    match = geocoder.resolve(q, min_score=min_score)
+    if match is None:
+        raise HTTPException(status_code=404, detail=f"No stop matches '{q}'")
+    return match
+
+@app.get("/geocode/autocomplete")
+def geocode_autocomplete(q: str, limit: int = 10):
+    if geocoder is None:
+        raise HTTPException(status_code=500, detail="GTFS schedules not loaded")
+    # Prefix matches first; typos fall back to fuzzy suggestions
+    suggestions = geocoder.autocomplete(q, limit) or geocoder.fuzzy(q, limit)
+    return {"suggestions": suggestions}
+
+@app.post("/observations")
+def ingest_observations(message: dict):
+    # One GTFS-Realtime FeedMessage (or entity / trip_update) in JSON form
+    try:
+        taken = observation_ingestor.ingest(message)
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid trip update: {e}")
+    return {"observations": taken, **observation_ingestor.counters()}
+
+@app.get("/observed/{route_id}")
+def observed_delays(route_id: str):
+    # Live observed-delay stats for a route: the last hour, and by hour of day
+    return {"route_id": route_id, **live_delays.summary(route_id), "units": "minutes"}
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {"base_time": base_time_cache.stats()}
+
+@app.get("/inference-stats")
+def inference_stats():
+    return {"batcher": inference_batcher.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    cache = base_time_cache.stats()
+    batcher = inference_batcher.stats()
+    info = []
+    serving = models.active
+    if serving is not None:
+        info.append(("model_info", "Loaded delay model", {
+            "format": serving.info["format"], "version": serving.info["version"],
+            "lookup_table": "1" if serving.lookup_table else "0",
+        }))
+    shadow = models.shadow.stats() if models.shadow is not None else {}
+    observed = observation_ingestor.counters()
+    return PlainTextResponse(metrics.render(
+        counters=[
+            ("base_time_cache_hits_total", "Base-time cache hits", cache["hits"]),
+            ("base_time_cache_misses_total", "Base-time cache misses", cache["misses"]),
+            ("base_time_cache_coalesced_total", "Base-time misses served by an in-flight lookup", cache["coalesced"]),
+            ("base_time_cache_evictions_total", "Base-time cache evictions", cache["evictions"]),
+            ("upstream_errors_total", "Failed Google Maps lookups", cache["upstream_errors"]),
+            ("inference_batches_total", "Micro-batched forest calls", batcher["batches"]),
+            ("inference_rows_total", "Rows scored through the micro-batcher", batcher["rows"]),
+            ("inference_errors_total", "Failed micro-batched forest calls", batcher["errors"]),
+            ("model_swaps_total", "Model versions activated since startup, including the first", models.swaps),
+            ("shadow_rows_total", "Live rows scored by the shadow model", shadow.get("rows")),
+            ("shadow_dropped_total", "Live rows the shadow model skipped under load", shadow.get("dropped")),
+            ("observations_total", "Observed stop arrivals ingested", observed["observations"]),
+            ("observation_updates_skipped_total", "Stop time updates without a delay or route", observed["skipped_updates"]),
+            ("observation_bad_messages_total", "Trip update messages that failed to parse", observed["bad_messages"]),
+            ("observed_log_rows_total", "Rows written to the observed training log", observed["logged_rows"]),
+        ],
+        gauges=[
+            ("base_time_cache_hit_ratio", "Base-time cache hit ratio", cache["hit_rate"]),
+            ("base_time_cache_entries", "Cached base times", cache["size"]),
+            ("inference_queue_depth", "Rows waiting for a batch", batcher["queued"]),
+            ("inference_batch_size_mean", "Mean rows per forest call", batcher["mean_batch_size"]),
+            ("shadow_mean_abs_diff_minutes", "Mean |shadow - served| delay over recent rows", shadow.get("mean_abs_diff")),
+        ],
+        info=info,
+    ), media_type="text/plain; version=0.0.4")
+
+@app.get("/model-info")
+def model_info_endpoint():
+    return serving_model().info
+
+@app.get("/models")
+def list_models():
+    serving = models.active
+    return {
+        "active": serving.info["version"] if serving is not None else None,
+        "current": models.registry.current(),
+        "swaps": models.swaps,
+        "last_error": models.last_error,
+        "shadow": models.shadow.stats() if models.shadow is not None else None,
+        "versions": models.registry.versions(),
+    }
+
+@app.post("/models/reload")
+async def reload_model(request: Optional[ModelVersionRequest] = None):
+    # Loads and warms the version on the inference executor, then swaps it in;
+    # requests keep being served by the old model until the swap. A named
+    # version is made current first (and restored on failure), so the
+    # registry watcher agrees with what is served. Also used to roll back.
+    version = request.version if request is not None else None
+    previous = models.registry.current()
+    try:
+        if version is not None:
+            models.registry.activate(version)
+        try:
+            serving = await run_inference(models.reload, version)
+        except Exception:
+            if version is not None and previous is not None:
+                models.registry.activate(previous)
+            raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version or 'none published'}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous model: {e}")
+    return serving.info
+
+@app.put("/models/shadow")
+async def start_shadow(request: ModelVersionRequest):
+    # Live /predict-trip rows are also scored by this version and compared
+    if request.version is None:
+        raise HTTPException(status_code=400, detail="version is required")
+    try:
+        shadow = await run_inference(models.start_shadow, request.version, inference_executor)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {request.version}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load shadow model: {e}")
+    return shadow.stats()
+
+@app.delete("/models/shadow")
+def stop_shadow():
+    stats = models.shadow.stats() if models.shadow is not None else None
+    models.stop_shadow()
+    return {"stopped": stats}
+
+def accepts_gzip(accept_encoding):
+    # Accept-Encoding with q-values: "gzip;q=0", or "*;q=0" without gzip listed, refuses it
+    gzip_q = any_q = None
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        coding = coding.lower()
+        if coding in ("gzip", "x-gzip"):
+            gzip_q = q
+        elif coding == "*":
+            any_q = q
+    q = gzip_q if gzip_q is not None else any_q
+    return q is not None and q > 0
+
+def etag_matches(if_none_match, etag):
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def cached_json(request, body, gzip_body, etag, headers=None):
+    # Clients revalidate with If-None-Match and get a bodyless 304 when unchanged.
+    # Each encoding has its own ETag, so caches keyed on Vary: Accept-Encoding
+    # never serve one encoding's body under the other's tag.
+    gzip = accepts_gzip(request.headers.get("accept-encoding", ""))
+    if gzip:
+        etag = etag[:-1] + '-gz"'
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(gzip_body, media_type="application/json", headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
 @app.get("/routes")
-def get_routes():
+def get_routes(request: Request):
+    if route_catalogue is None:
+        raise HTTPException(status_code=500, detail="GTFS route files not found")
+    # Flag the routes the serving model was trained on
+    serving = models.active
+    trained = model_levels(serving.model)['Route_ID'] if serving is not None else None
     try:
-        df = pd.read_csv('transport_data.csv')
-        unique_routes = sorted(df['Route_ID'].unique().tolist())
-        return {"routes": unique_routes}
+        catalogue = route_catalogue.current(trained)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load routes: {str(e)}")
+    return cached_json(request, catalogue.body, catalogue.gzip_body, catalogue.etag)
+
+@app.get("/network-heatmap")
+def get_network_heatmap(request: Request):
+    # Always the last finished matrix; X-Heatmap-Pending says a refresh for
+    # newer conditions is still running
+    serving_model()
+    snapshot = network_heatmap.snapshot
+    if snapshot is None:
+        if network_heatmap.error:
+            raise HTTPException(status_code=500, detail=network_heatmap.error)
+        raise HTTPException(status_code=503, detail="Heatmap is being computed", headers={"Retry-After": "1"})
+
+    return cached_json(
+        request, snapshot["body"], snapshot["gzip_body"], snapshot["etag"],
+        {"X-Heatmap-Pending": "1" if network_heatmap.pending else "0"},
+    )
+
+@app.put("/network-heatmap/conditions")
+def set_heatmap_conditions(conditions: TripConditions):
+    # Returns at once; the matrix is recomputed in the background
+    serving_model()
+    network_heatmap.set_conditions(conditions.model_dump())
+    return {"conditions": network_heatmap.conditions, "pending": network_heatmap.pending}
 
 @app.post("/predict-trend")
-def predict_trend(request: TripPredictionRequest):
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not trained")
+async def predict_trend(request: TripPredictionRequest):
+    serving = serving_model()
     
     try:
-        trend_data = []
-        # Predict for every hour of the day (0-23)
-        for h in range(24):
-            features = pd.DataFrame([{
-                "Route_ID": request.Route_ID,
-                "Weather_Condition": request.Weather_Condition,
-                "Event_Type": request.Event_Type,
-                "Hour": h,
-                "Day_OfWeek": request.Day_OfWeek,
-                "Temperature": request.Temperature,
-                "Precipitation": request.Precipitation,
-                "Event_Attendance": request.Event_Attendance
-            }])
-            predicted_delay = model.predict(features)[0]
-            trend_data.append({"hour": h, "delay": round(predicted_delay, 2)})
+        # Predict for every hour of the day (0-23): one table slice, else one batched call
+        row = feature_row(request)
+        delays = serving.lookup_table.lookup_hours(row) if serving.lookup_table else None
+        if delays is None:
+            delays = await run_inference(predict_grid, serving.model, row, {"Hour": range(24)})
+        trend_data = [{"hour": h, "delay": round(float(d), 2)} for h, d in enumerate(delays)]
             
         return {"trend": trend_data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict-scenarios")
+async def predict_scenarios(request: ScenarioGridRequest):
+    serving = serving_model()
+
+    try:
+        axes = {}
+        if request.hours:
+            axes["Hour"] = request.hours
+        if request.days:
+            axes["Day_OfWeek"] = request.days
+        if request.weather_conditions:
+            axes["Weather_Condition"] = request.weather_conditions
+        if request.precipitation:
+            axes["Precipitation"] = request.precipitation.values()
+
+        # Whole response surface from one batched inference
+        surface = await run_inference(predict_grid, serving.model, feature_row(request), axes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "axes": {name: list(values) for name, values in axes.items()},
+        "shape": list(surface.shape),
+        "delays": np.round(surface, 2).tolist(),
+        "units": "minutes"
+    }
+
+async def ndjson_lines(batches):
+    # Each chunk is read and scored on the inference executor, not on the
+    # event loop or Starlette's threadpool; the loop only writes lines out
+    loop = asyncio.get_running_loop()
+    while (lines := await loop.run_in_executor(inference_executor, next, batches, None)) is not None:
+        yield "".join(json.dumps(line) + "\n" for line in lines)
+
+def ndjson_response(batches):
+    return StreamingResponse(ndjson_lines(iter(batches)), media_type="application/x-ndjson")
+
+def body_too_large():
+    return HTTPException(status_code=413, detail=f"Batch body is larger than {BATCH_MAX_BYTES} bytes")
+
+async def capped_body(request: Request):
+    # Refuse an oversized body up front when it declares its length, and
+    # stop buffering one that does not as soon as it passes the cap
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > BATCH_MAX_BYTES:
+        raise body_too_large()
+    parts, size = [], 0
+    async for part in request.stream():
+        size += len(part)
+        if size > BATCH_MAX_BYTES:
+            raise body_too_large()
+        parts.append(part)
+    return b"".join(parts)
+
+def parse_batch_records(body, ndjson):
+    if ndjson:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    return json.loads(body)
+
+@app.post("/predict-batch")
+async def predict_batch(request: Request):
+    # Body is a JSON array of TripPredictionRequest-shaped records, or NDJSON
+    # (one record per line). Records skip per-row pydantic validation and are
+    # typed a chunk at a time instead.
+    serving = serving_model()
+
+    body = await capped_body(request)
+    ndjson = request.headers.get("content-type", "").startswith("application/x-ndjson")
+    try:
+        records = await run_inference(parse_batch_records, body, ndjson)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of records")
+
+    return ndjson_response(predicted_chunks(serving.model, iter_chunks(records)))
+
+@app.post("/predict-batch/csv")
+def predict_batch_csv(file: UploadFile = File(...)):
+    # CSV in the transport_data.csv schema; Delay_Minutes is ignored if present
+    serving = serving_model()
+    if file.size is not None and file.size > BATCH_MAX_BYTES:
+        raise body_too_large()
+
+    try:
+        # keep_default_na=False so an Event_Type of "None" stays a string
+        chunks = pd.read_csv(file.file, chunksize=BATCH_CHUNK_ROWS, keep_default_na=False)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+
+    return ndjson_response(predicted_chunks(serving.model, chunks))
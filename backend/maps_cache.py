@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_place(place):
+    return " ".join(str(place).lower().split())
+
+
+def parse_duration_minutes(response):
+    # distance_matrix response -> minutes for the single origin/destination
+    element = response['rows'][0]['elements'][0]
+    if element.get('status', 'OK') != 'OK':
+        raise ValueError(f"No transit route found ({element['status']})")
+    return element['duration']['value'] / 60
+
+
+class FetchAbandoned(Exception):
+    """The caller fetching a key was cancelled; coalesced waiters claim it again."""
+
+
+class BaseTimeCache:
+    """TTL + LRU cache in front of the distance_matrix base-time lookup.
+
+    Keys are (origin, destination, departure bucket) with normalized place
+    names. Concurrent misses on the same key share one upstream call: the first
+    caller fetches, the rest wait on its Future. Failures are not cached.
+    A cancelled waiter leaves the shared Future alone; a cancelled fetcher
+    hands the key back, and one of its waiters fetches instead.
+
+    `get` calls the blocking `client`; `get_async` awaits `async_client`
+    (see maps_client.AsyncMapsClient). Both share entries and in-flight
+    lookups, so a sync and an async caller for the same key also coalesce.
+    """
+
+    def __init__(self, client, async_client=None, maxsize=1024, ttl=900, bucket_seconds=900, clock=time.time):
+        self.client = client
+        self.async_client = async_client
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (expires_at, minutes)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.upstream_errors = 0
+
+    def key(self, origin, destination, departure_time=None):
+        ts = departure_time if departure_time is not None else self.clock()
+        return (normalize_place(origin), normalize_place(destination), int(ts // self.bucket_seconds))
+
+    def _lookup(self, key, now):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key, minutes, now):
+        # Caller holds the lock
+        self._entries[key] = (now + self.ttl, minutes)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _fetch_kwargs(self, departure_time):
+        kwargs = {"mode": "transit"}
+        if departure_time is not None:
+            kwargs["departure_time"] = departure_time
+        return kwargs
+
+    def _claim(self, key):
+        # Returns (cached minutes, None, _) on a hit, otherwise the in-flight
+        # Future for the key and whether this caller owns the upstream fetch
+        with self._lock:
+            minutes = self._lookup(key, self.clock())
+            if minutes is not None:
+                self.hits += 1
+                return minutes, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+            self.misses += 1
+            future = self._inflight[key] = Future()
+            return None, future, True
+
+    def _resolve(self, key, future, minutes=None, error=None):
+        with self._lock:
+            if error is None:
+                self._store(key, minutes, self.clock())
+            else:
+                self.upstream_errors += 1
+            del self._inflight[key]
+        if error is None:
+            future.set_result(minutes)
+        else:
+            future.set_exception(error)
+
+    def _abandon(self, key, future):
+        # The owner was cancelled: release the key and wake its waiters to retry
+        with self._lock:
+            del self._inflight[key]
+        future.set_exception(FetchAbandoned(key))
+
+    def get(self, origin, destination, departure_time=None):
+        key = self.key(origin, destination, departure_time)
+        while True:
+            minutes, future, owner = self._claim(key)
+            if future is None:
+                return minutes
+            if owner:
+                break
+            try:
+                return future.result()
+            except FetchAbandoned:
+                continue
+
+        try:
+            response = self.client.distance_matrix(origin, destination, **self._fetch_kwargs(departure_time))
+            minutes = parse_duration_minutes(response)
+        except Exception as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, minutes)
+        return minutes
+
+    async def get_async(self, origin, destination, departure_time=None):
+        key = self.key(origin, destination, departure_time)
+        while True:
+            minutes, future, owner = self._claim(key)
+            if future is None:
+                return minutes
+            if owner:
+                break
+            try:
+                # Shielded: cancelling this waiter must not cancel the shared Future
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except FetchAbandoned:
+                continue
+
+        try:
+            response = await self.async_client.distance_matrix(origin, destination, **self._fetch_kwargs(departure_time))
+            minutes = parse_duration_minutes(response)
+        except asyncio.CancelledError:
+            self._abandon(key, future)
+            raise
+        except Exception as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, minutes)
+        return minutes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "upstream_errors": self.upstream_errors,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,42 @@
+import asyncio
+import httpx
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+
+class AsyncMapsClient:
+    """Non-blocking Distance Matrix client over a pooled httpx.AsyncClient.
+
+    At most `max_concurrency` requests are in flight at once; callers beyond
+    that queue on a semaphore instead of opening more sockets. `timeout`
+    bounds each request, including time spent waiting for a slot.
+    """
+
+    def __init__(self, key, max_concurrency=32, timeout=5.0, max_keepalive=16):
+        self.key = key
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_keepalive)
+        )
+
+    async def _get(self, params):
+        async with self._semaphore:
+            response = await self._http.get(DISTANCE_MATRIX_URL, params=params)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("status") != "OK":
+            raise ValueError(f"Distance Matrix error: {body.get('status')} {body.get('error_message', '')}".strip())
+        return body
+
+    async def distance_matrix(self, origins, destinations, mode=None, departure_time=None):
+        params = {"origins": origins, "destinations": destinations, "key": self.key}
+        if mode:
+            params["mode"] = mode
+        if departure_time is not None:
+            params["departure_time"] = int(departure_time)
+        return await asyncio.wait_for(self._get(params), self.timeout)
+
+    async def aclose(self):
+        await self._http.aclose()
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class LatencyMetrics:
+    """Per-stage latency samples and counters, rendered in Prometheus text format.
+
+    An observation is a lock, a deque append and two additions, cheap
+    enough to leave on in production. Quantiles are computed at scrape
+    time over the last `window` samples of each stage and exported as a
+    Prometheus summary alongside the all-time _sum and _count.
+    """
+
+    def __init__(self, prefix='transit', window=2048):
+        self.prefix = prefix
+        self.window = window
+        self._samples = {}
+        self._sums = {}
+        self._counts = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage):
+        return StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+                self._sums[stage] = 0.0
+                self._counts[stage] = 0
+            samples.append(seconds)
+            self._sums[stage] += seconds
+            self._counts[stage] += 1
+
+    def count_request(self, method, path, status):
+        key = (method, path, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def render(self, gauges=(), counters=(), info=()):
+        """Prometheus exposition text.
+
+        `gauges` and `counters` are (name, help, value) triples; `info` is
+        (name, help, labels) for constant-1 info metrics.
+        """
+        with self._lock:
+            stages = {stage: list(samples) for stage, samples in self._samples.items()}
+            sums, counts, requests = dict(self._sums), dict(self._counts), dict(self._requests)
+
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_latency_seconds Hot-path stage latency (quantiles over the last {self.window} samples)",
+            f"# TYPE {p}_stage_latency_seconds summary",
+        ]
+        for stage in sorted(stages):
+            values = np.percentile(stages[stage], [q * 100 for q in QUANTILES])
+            for q, v in zip(QUANTILES, values):
+                lines.append(f'{p}_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {v:.6g}')
+            lines.append(f'{p}_stage_latency_seconds_sum{{stage="{stage}"}} {sums[stage]:.6g}')
+            lines.append(f'{p}_stage_latency_seconds_count{{stage="{stage}"}} {counts[stage]}')
+
+        lines += [f"# HELP {p}_http_requests_total HTTP requests by route and status",
+                  f"# TYPE {p}_http_requests_total counter"]
+        for (method, path, status), n in sorted(requests.items()):
+            lines.append(f'{p}_http_requests_total{{method="{method}",path="{path}",status="{status}"}} {n}')
+
+        for kind, metrics in (('counter', counters), ('gauge', gauges)):
+            for name, help_text, value in metrics:
+                if value is None:
+                    continue
+                value = value if isinstance(value, int) else f"{float(value):.6g}"
+                lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"]
+        for name, help_text, labels in info:
+            label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} gauge",
+                      f"{p}_{name}{{{label_text}}} 1"]
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware recording per-route latency and status counts.
+
+    Labels use the matched route template rather than the raw URL so label
+    cardinality stays bounded.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            self.metrics.observe(f"http {path}", time.perf_counter() - start)
+            self.metrics.count_request(scope["method"], path, status)
@@ -0,0 +1,306 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+import numpy as np
+from delay_table import DelayLookupTable, LOOKUP_TABLE_PATH, model_levels
+from forest_engine import COMPILED_MODEL_PATH
+from inference import FEATURE_COLUMNS, build_features, predict_delays
+from model_store import MODEL_PATH, load_delay_model
+
+REGISTRY_PATH = 'model_registry'
+METADATA_FILE = 'metadata.json'
+CURRENT_FILE = 'CURRENT'
+
+# What a request scores with: the model, its load/registry info and the
+# optional lookup table built from it
+ServingModel = namedtuple('ServingModel', ['model', 'info', 'lookup_table'])
+
+
+def schema_hash(model):
+    # Feature columns and fitted categories; equal hashes mean two versions
+    # accept exactly the same rows
+    schema = {"columns": FEATURE_COLUMNS, "levels": model_levels(model)}
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class ModelRegistry:
+    """Versioned model artifacts, one immutable directory per version.
+
+    A version directory holds delay_model.pkl, delay_model_compiled/, an
+    optional delay_lookup/ and metadata.json, which is written last. Versions
+    are staged under a hidden name and renamed into place, and CURRENT
+    (the version to serve) is replaced atomically, so a reader never sees a
+    half-published model. Files are never rewritten once published, which
+    keeps memory-mapped arrays of a serving version valid.
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+
+    def version_path(self, version):
+        return os.path.join(self.path, version)
+
+    def stage(self):
+        # A new version name and an empty directory to write its artifacts into
+        os.makedirs(self.path, exist_ok=True)
+        base = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        version, n = base, 1
+        while os.path.exists(self.version_path(version)):
+            version, n = f"{base}-{n}", n + 1
+        staging = os.path.join(self.path, f".staging-{version}")
+        os.makedirs(staging)
+        return version, staging
+
+    def publish(self, version, staging, metadata, activate=True):
+        metadata = {**metadata, "version": version}
+        with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.rename(staging, self.version_path(version))
+        if activate:
+            self.activate(version)
+        return metadata
+
+    def activate(self, version):
+        self.metadata(version)
+        tmp = os.path.join(self.path, f".{CURRENT_FILE}.{os.getpid()}")
+        with open(tmp, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp, os.path.join(self.path, CURRENT_FILE))
+
+    def current(self):
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, version):
+        # KeyError for unknown or unfinished versions
+        if not version or os.sep in version or version.startswith('.'):
+            raise KeyError(version)
+        try:
+            with open(os.path.join(self.version_path(version), METADATA_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            raise KeyError(version) from None
+
+    def versions(self):
+        if not os.path.isdir(self.path):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.path)):
+            try:
+                found.append(self.metadata(name))
+            except KeyError:
+                continue
+        return found
+
+    def load(self, version, lookup_table=False):
+        metadata = self.metadata(version)
+        path = self.version_path(version)
+        model, info = load_delay_model(os.path.join(path, MODEL_PATH), os.path.join(path, COMPILED_MODEL_PATH))
+        info.update(version=version, metadata=metadata)
+        table = None
+        table_path = os.path.join(path, LOOKUP_TABLE_PATH)
+        if lookup_table and os.path.exists(os.path.join(table_path, 'meta.json')):
+            table = DelayLookupTable.load(table_path)
+            info["lookup_table"] = table.report
+        return ServingModel(model, info, table)
+
+
+class ShadowScorer:
+    """Scores live rows with a candidate model off the request path.
+
+    `record(row, delay)` only appends to a buffer. Once `batch` rows (or
+    `max_wait` seconds' worth) have arrived, they are scored in one call on
+    `executor` and compared with what the active model served. While a
+    batch is in flight the buffer is capped and extra rows are dropped, so a
+    slow candidate never backs up serving.
+    """
+
+    def __init__(self, serving, executor, batch=64, max_wait=1.0, window=4096):
+        self.serving = serving
+        self.executor = executor
+        self.batch = batch
+        self.max_wait = max_wait
+        self._rows = []
+        self._served = []
+        self._first = None
+        self._busy = False
+        self._lock = threading.Lock()
+
+        self.rows = 0
+        self.dropped = 0
+        self.errors = 0
+        self._diffs = deque(maxlen=window)
+
+    @property
+    def version(self):
+        return self.serving.info["version"]
+
+    def record(self, row, delay):
+        with self._lock:
+            if len(self._rows) >= self.batch * 4:
+                self.dropped += 1
+                return
+            if not self._rows:
+                self._first = time.perf_counter()
+            self._rows.append(row)
+            self._served.append(delay)
+            if self._busy or (len(self._rows) < self.batch and time.perf_counter() - self._first < self.max_wait):
+                return
+            self._busy = True
+        self.executor.submit(self._score)
+
+    def _score(self):
+        while True:
+            with self._lock:
+                rows, served = self._rows[:self.batch], self._served[:self.batch]
+                del self._rows[:self.batch], self._served[:self.batch]
+                self._first = time.perf_counter() if self._rows else None
+            try:
+                diffs = np.asarray(predict_delays(self.serving.model, rows), dtype=np.float64) - served
+            except Exception:
+                diffs = None
+            with self._lock:
+                if diffs is None:
+                    self.errors += 1
+                else:
+                    self.rows += len(rows)
+                    self._diffs.extend(diffs.tolist())
+                if len(self._rows) < self.batch:
+                    self._busy = False
+                    return
+
+    def stats(self):
+        with self._lock:
+            diffs = np.asarray(self._diffs)
+            stats = {
+                "version": self.version,
+                "rows": self.rows,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "buffered": len(self._rows),
+            }
+        if len(diffs):
+            # Candidate minus served, in minutes, over the recent window
+            abs_diffs = np.abs(diffs)
+            stats.update({
+                "mean_diff": round(float(diffs.mean()), 4),
+                "mean_abs_diff": round(float(abs_diffs.mean()), 4),
+                "abs_diff_p50": round(float(np.percentile(abs_diffs, 50)), 4),
+                "abs_diff_p95": round(float(np.percentile(abs_diffs, 95)), 4),
+                "max_abs_diff": round(float(abs_diffs.max()), 4),
+                "within_1_min": round(float((abs_diffs <= 1.0).mean()), 4),
+            })
+        return stats
+
+
+class ModelManager:
+    """The serving model, swapped for registry versions without a restart.
+
+    Requests read `active` once and use that snapshot throughout, so a swap
+    is one reference assignment: in-flight requests finish on the old model,
+    new ones get the new model and nothing is dropped. `reload` loads the
+    version and scores a spread of routes and hours with it before the swap, so page faults
+    and lazy initialisation never land on a live request. Both engines of
+    the model are warmed and must agree. `on_swap(serving)`
+    runs after every swap. A second version can be shadow-scored on live
+    traffic with `start_shadow`.
+    """
+
+    def __init__(self, registry, warmup_conditions, lookup_table=False, on_swap=None, warmup_size=64):
+        self.registry = registry
+        self.warmup_conditions = warmup_conditions
+        self.warmup_size = warmup_size
+        self.lookup_table = lookup_table
+        self.on_swap = on_swap
+        self.active = None
+        self.shadow = None
+        self.swaps = 0
+        self.last_error = None
+        # Last version that failed to load; the watcher leaves it alone
+        self.failed_version = None
+        self._lock = threading.Lock()
+
+    def warm(self, serving):
+        routes = model_levels(serving.model)['Route_ID']
+        rows = [
+            {**self.warmup_conditions, "Route_ID": routes[i % len(routes)], "Hour": i % 24, "Day_OfWeek": i % 7}
+            for i in range(self.warmup_size)
+        ]
+        start = time.perf_counter()
+        delays = np.asarray(predict_delays(serving.model, rows))
+        predict_delays(serving.model, rows[:1])
+        if delays.shape != (len(rows),) or not np.isfinite(delays).all():
+            raise ValueError(f"Model {serving.info['version']} failed its warm-up predictions")
+        model = serving.model
+        if model.compiled is not None and model.pipeline is not None:
+            # Small batches use one engine and large ones the other
+            if model.engine(len(rows)) is model.compiled:
+                other = model.pipeline.predict(build_features(rows))
+            else:
+                other = model.compiled.predict(rows)
+            if np.abs(other - delays).max() > 1e-6:
+                raise ValueError(f"Model {serving.info['version']}: compiled forest and sklearn pipeline disagree")
+        return round(time.perf_counter() - start, 4)
+
+    def load(self, version):
+        serving = self.registry.load(version, self.lookup_table)
+        serving.info["warmup_seconds"] = self.warm(serving)
+        return serving
+
+    def reload(self, version=None):
+        # Blocking: call it off the event loop
+        with self._lock:
+            version = version or self.registry.current()
+            if version is None:
+                raise KeyError("no current version in the registry")
+            if self.active is not None and self.active.info.get("version") == version:
+                return self.active
+            try:
+                serving = self.load(version)
+            except Exception as e:
+                self.last_error = f"{version}: {e}"
+                self.failed_version = version
+                raise
+            serving.info["activated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            self.active = serving
+            self.swaps += 1
+            self.last_error = None
+            self.failed_version = None
+            if self.shadow is not None and self.shadow.version == version:
+                self.shadow = None
+        print(f"Serving delay model {version} ({serving.info['format']}), warm-up {serving.info['warmup_seconds'] * 1000:.1f} ms")
+        if self.on_swap is not None:
+            self.on_swap(serving)
+        return serving
+
+    def start_shadow(self, version, executor):
+        # Blocking, like reload
+        self.shadow = ShadowScorer(self.load(version), executor)
+        return self.shadow
+
+    def stop_shadow(self):
+        self.shadow = None
+
+    async def watch(self, interval, executor):
+        # Poll CURRENT and swap in whatever train_model.py (or an operator) publishes
+        # A version that fails to load, here or at startup, is not retried
+        # until CURRENT changes
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            version = self.registry.current()
+            active = self.active.info.get("version") if self.active is not None else None
+            if version is None or version in (active, self.failed_version):
+                continue
+            try:
+                await loop.run_in_executor(executor, self.reload, version)
+            except Exception as e:
+                print(f"Model reload of {version} failed: {e}")
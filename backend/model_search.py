@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+from columnar import read_training_data
+from forest_engine import CompiledForest, COMPILED_MODEL_PATH
+from inference import FEATURE_COLUMNS
+from model_store import MODEL_PATH, load_delay_model
+from train_model import build_pipeline, train_model
+
+# Candidates are fitted in parallel, then their serving cost is measured one
+# at a time so the latencies are not skewed by other fits. Each candidate is
+# served the way the API would serve it: random forests from the
+# memory-mapped compiled arrays, other families from the pickle.
+
+SEARCH_SPACE = [
+    *(("random_forest", {"n_estimators": n, "max_depth": d})
+      for n in (25, 50, 100, 200) for d in (None, 20, 12)),
+    *(("hist_gradient_boosting", {"max_iter": it, "max_leaf_nodes": leaves, "learning_rate": 0.1})
+      for it in (100, 300) for leaves in (15, 31, 63)),
+]
+
+QUICK_SEARCH_SPACE = [
+    ("random_forest", {"n_estimators": 25, "max_depth": 12}),
+    ("random_forest", {"n_estimators": 100, "max_depth": None}),
+    ("hist_gradient_boosting", {"max_iter": 100, "max_leaf_nodes": 31, "learning_rate": 0.1}),
+]
+
+RESULTS_DIR = 'benchmarks'
+
+
+def candidate_name(family, params):
+    return family + ''.join(f"-{k}={v}" for k, v in sorted(params.items()))
+
+
+def split_training_data():
+    # The same split as train_model.py
+    df = read_training_data()
+    X, y = df.drop(columns='Delay_Minutes'), df['Delay_Minutes']
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+def fit_candidate(family, params, threads, out_dir):
+    # Runs in a worker process; `threads` caps this fit's share of the cores
+    X_train, X_test, y_train, y_test = split_training_data()
+    with threadpool_limits(threads):
+        model = build_pipeline(family, n_jobs=threads, **params)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        y_pred = model.predict(X_test)
+    if family == 'random_forest':
+        model.set_params(regressor__n_jobs=None)
+
+    os.makedirs(out_dir)
+    joblib.dump(model, os.path.join(out_dir, MODEL_PATH))
+    if family == 'random_forest':
+        CompiledForest.from_pipeline(model).save(os.path.join(out_dir, COMPILED_MODEL_PATH))
+    return {
+        "name": candidate_name(family, params),
+        "family": family,
+        "params": params,
+        "fit_seconds": round(fit_seconds, 3),
+        "fit_threads": threads,
+        "mae": round(float(mean_absolute_error(y_test, y_pred)), 4),
+        "r2": round(float(r2_score(y_test, y_pred)), 4),
+    }
+
+
+def size_mb(path):
+    # A file, or everything under a directory
+    total = os.path.getsize(path) if os.path.isfile(path) else 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return round(total / 2**20, 3)
+
+
+def serving_cost(out_dir, rows, single_calls=300, batch_repeats=5):
+    # Load time (best of 3) and predict latency on the serving path
+    model_path, compiled_path = os.path.join(out_dir, MODEL_PATH), os.path.join(out_dir, COMPILED_MODEL_PATH)
+    loads = []
+    for _ in range(3):
+        model, info = load_delay_model(model_path, compiled_path)
+        loads.append(info["load_seconds"])
+
+    # Each batch goes to the engine the API would use for its size
+    predict = model.predict
+
+    predict(rows[:1])
+    single = []
+    for row in rows[:single_calls]:
+        start = time.perf_counter()
+        predict([row])
+        single.append(time.perf_counter() - start)
+    batch = []
+    for _ in range(batch_repeats):
+        start = time.perf_counter()
+        predict(rows)
+        batch.append(time.perf_counter() - start)
+
+    p50, p99 = np.percentile(single, [50, 99]) * 1000
+    return {
+        "serving_format": info["format"],
+        "artifact_mb": size_mb(compiled_path if info["format"].startswith('compiled-mmap') else model_path),
+        "pickle_mb": size_mb(model_path),
+        "load_ms": round(min(loads) * 1000, 2),
+        "single_row_p50_ms": round(p50, 3),
+        "single_row_p99_ms": round(p99, 3),
+        f"batch_{len(rows)}_ms": round(float(np.median(batch)) * 1000, 2),
+    }
+
+
+def run_search(space, workers=None, batch_rows=1000):
+    cpus = os.cpu_count() or 1
+    workers = workers or min(cpus, len(space))
+    threads = max(1, cpus // workers)
+    work_dir = tempfile.mkdtemp(prefix='model-search-')
+    try:
+        results = []
+        print(f"Fitting {len(space)} candidates on {workers} processes x {threads} threads")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fit_candidate, family, params, threads, os.path.join(work_dir, str(i))): i
+                for i, (family, params) in enumerate(space)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"name": candidate_name(*space[i]), "family": space[i][0], "params": space[i][1], "error": str(e)}
+                    print(f"  {result['name']}: failed: {e}")
+                else:
+                    print(f"  {result['name']}: MAE {result['mae']} in {result['fit_seconds']}s")
+                results.append((i, result))
+
+        X_test = split_training_data()[1]
+        rows = X_test.head(batch_rows)[FEATURE_COLUMNS].to_dict('records')
+        print("Measuring serving cost")
+        for i, result in results:
+            if "error" not in result:
+                result.update(serving_cost(os.path.join(work_dir, str(i)), rows))
+        return [result for _, result in sorted(results, key=lambda r: r[0])]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def recommend(results, slo_ms, max_artifact_mb=None):
+    # Most accurate candidate whose single-row p99 meets the SLO
+    for result in results:
+        result["meets_slo"] = bool("error" not in result and result["single_row_p99_ms"] <= slo_ms and (
+            max_artifact_mb is None or result["artifact_mb"] <= max_artifact_mb
+        ))
+    eligible = [r for r in results if r["meets_slo"]]
+    return min(eligible, key=lambda r: r["mae"]) if eligible else None
+
+
+def print_report(results, best):
+    print(f"{'candidate':<74}{'MAE':>7}{'R2':>7}{'fit s':>8}{'MB':>8}{'load ms':>9}{'p50 ms':>8}{'p99 ms':>8}{'batch ms':>10}")
+    for r in sorted(results, key=lambda r: r.get("mae", float('inf'))):
+        if "error" in r:
+            print(f"{r['name']:<74} failed: {r['error']}")
+            continue
+        batch = next(v for k, v in r.items() if k.startswith('batch_'))
+        mark = '*' if r is best else ('' if r["meets_slo"] else ' (over SLO)')
+        print(f"{r['name']:<74}{r['mae']:>7}{r['r2']:>7}{r['fit_seconds']:>8}{r['artifact_mb']:>8}"
+              f"{r['load_ms']:>9}{r['single_row_p50_ms']:>8}{r['single_row_p99_ms']:>8}{batch:>10}{mark}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter search with model size and latency report")
+    parser.add_argument('--quick', action='store_true', help="three candidates instead of the full grid")
+    parser.add_argument('--workers', type=int, help="parallel fits (default: one per core)")
+    parser.add_argument('--slo-ms', type=float, default=5.0, help="single-row p99 predict budget")
+    parser.add_argument('--max-artifact-mb', type=float, help="largest acceptable serving artifact")
+    parser.add_argument('--output', help=f"result file (default {RESULTS_DIR}/model-search-<timestamp>.json)")
+    parser.add_argument('--publish', action='store_true', help="train the recommended candidate into the registry")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_search(QUICK_SEARCH_SPACE if args.quick else SEARCH_SPACE, args.workers)
+    best = recommend(results, args.slo_ms, args.max_artifact_mb)
+    print_report(results, best)
+    print(f"Search took {time.perf_counter() - start:.1f}s")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"model-search-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump({"slo_ms": args.slo_ms, "max_artifact_mb": args.max_artifact_mb,
+                   "recommended": best["name"] if best else None, "candidates": results}, f, indent=2)
+    print(f"Results written to {output}")
+
+    if best is None:
+        print(f"No candidate meets a {args.slo_ms} ms single-row p99")
+    else:
+        print(f"Recommended: {best['name']}")
+        print(f"  python train_model.py --family {best['family']} --params '{json.dumps(best['params'])}'")
+        if args.publish:
+            train_model(family=best['family'], params=best['params'])
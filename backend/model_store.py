@@ -0,0 +1,106 @@
+import os
+import time
+import joblib
+from forest_engine import CompiledForest, COMPILED_MODEL_PATH
+from inference import FEATURE_COLUMNS, build_features
+
+MODEL_PATH = 'delay_model.pkl'
+
+# Largest batch scored by the compiled forest when the sklearn pipeline is
+# also loaded. Lockstep traversal in NumPy wins on per-call overhead for a
+# few rows; sklearn's Cython trees win from about 700-1000 rows on one core.
+COMPILED_MAX_ROWS = 512
+
+
+def rss_mb():
+    # Resident set size of this process, or None off Linux
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+
+
+def is_fresh(compiled_path, model_path):
+    # The compiled directory is complete once meta.json exists; it is stale
+    # when the pickle it was compiled from has been retrained since
+    meta = os.path.join(compiled_path, 'meta.json')
+    if not os.path.exists(meta):
+        return False
+    return not os.path.exists(model_path) or os.path.getmtime(meta) >= os.path.getmtime(model_path)
+
+
+class DelayModel:
+    """The delay model, scored by whichever engine suits the batch size.
+
+    `compiled` is the memory-mapped CompiledForest and `pipeline` the sklearn
+    pipeline; either may be None. Batches of up to `compiled_max_rows` go to
+    the compiled forest (single-row /predict-trip, journey legs), larger ones
+    (/predict-batch chunks, scenario grids, heatmap refreshes) to sklearn.
+    """
+
+    def __init__(self, compiled=None, pipeline=None, compiled_max_rows=COMPILED_MAX_ROWS):
+        if compiled is None and pipeline is None:
+            raise ValueError("DelayModel needs at least one engine")
+        self.compiled = compiled
+        self.pipeline = pipeline
+        self.compiled_max_rows = compiled_max_rows
+
+    def engine(self, n_rows):
+        if self.pipeline is None or (self.compiled is not None and n_rows <= self.compiled_max_rows):
+            return self.compiled
+        return self.pipeline
+
+    def predict(self, rows):
+        if isinstance(rows, dict):
+            rows = [rows]
+        engine = self.engine(len(rows))
+        if engine is self.compiled:
+            return engine.predict(rows)
+        frame = rows if hasattr(rows, 'columns') else build_features(rows)
+        return engine.predict(frame[FEATURE_COLUMNS])
+
+
+def load_delay_model(model_path=MODEL_PATH, compiled_path=COMPILED_MODEL_PATH, batch_engine=True):
+    """Load the delay model: the memory-mapped compiled forest plus the sklearn pipeline.
+
+    The compiled node arrays are mapped read-only, so uvicorn workers and
+    Streamlit sessions on one host share a single page-cache copy for
+    small-batch scoring. The pipeline is unpickled as well for large
+    batches, unless `batch_engine` is False (callers that only score a few
+    rows at a time). Without an up-to-date compiled artifact only the
+    pipeline is loaded.
+
+    Returns (DelayModel, info) where info records what was loaded and how
+    long it took. Raises FileNotFoundError when neither artifact exists.
+    """
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    compiled = pipeline = None
+    if is_fresh(compiled_path, model_path):
+        compiled, fmt, path = CompiledForest.load(compiled_path), 'compiled-mmap', compiled_path
+        if batch_engine and os.path.exists(model_path):
+            pipeline, fmt = joblib.load(model_path), 'compiled-mmap+joblib'
+    else:
+        if os.path.exists(os.path.join(compiled_path, 'meta.json')):
+            print(f"Ignoring stale {compiled_path}; re-run train_model.py")
+        pipeline, fmt, path = joblib.load(model_path), 'joblib', model_path
+    model = DelayModel(compiled, pipeline)
+    # Version: when the loaded artifact was written
+    stamp = os.path.getmtime(os.path.join(path, 'meta.json') if compiled is not None else path)
+    info = {
+        "format": fmt,
+        "path": path,
+        "version": time.strftime('%Y%m%dT%H%M%S', time.gmtime(stamp)),
+        "compiled_max_rows": model.compiled_max_rows if compiled is not None and pipeline is not None else None,
+        "load_seconds": round(time.perf_counter() - start, 4),
+        "rss_mb_before": rss_before,
+        "rss_mb_after": rss_mb(),
+    }
+    return model, info
+
+
+def describe_load(info):
+    return (f"Loaded delay model ({info['format']}) from {info['path']} in "
+            f"{info['load_seconds'] * 1000:.1f} ms, RSS {info['rss_mb_before']} -> {info['rss_mb_after']} MB")
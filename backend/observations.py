@@ -0,0 +1,491 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from columnar import TRAINING_SCHEMA
+
+# Observed arrivals from a GTFS-Realtime style feed of trip updates, in the
+# protobuf JSON form (one FeedMessage, entity or trip_update per line;
+# snake_case or camelCase field names). Each stop_time_update with an
+# arrival (else departure) delay is one observation. Updates carry no
+# weather, so rows are logged with the conditions given to the ingestor,
+# or those of a non-standard "conditions" object on the message or entity.
+
+OBSERVED_LOG_PATH = 'observed_log'
+DEFAULT_CONDITIONS = {
+    "Weather_Condition": "Sunny", "Event_Type": "None",
+    "Temperature": 30.0, "Precipitation": 0.0, "Event_Attendance": 0,
+}
+
+Observation = namedtuple('Observation', ['route_id', 'trip_id', 'stop_id', 'timestamp', 'delay_minutes', 'conditions'])
+
+# Live aggregates, reported next to each prediction and logged as extra
+# training log columns; the model itself is not fitted on them
+OBSERVED_FEATURES = ['Observed_Recent_Delay', 'Observed_Recent_Count', 'Observed_Hour_Delay', 'Observed_Hour_Count']
+
+LOG_SCHEMA = pa.schema(list(TRAINING_SCHEMA) + [
+    ('Observed_Recent_Delay', pa.float32()),
+    ('Observed_Recent_Count', pa.int32()),
+    ('Observed_Hour_Delay', pa.float32()),
+    ('Observed_Hour_Count', pa.int32()),
+    ('Trip_ID', pa.string()),
+    ('Stop_ID', pa.string()),
+    ('Observed_At', pa.timestamp('s', tz='UTC')),
+])
+
+
+def part_key(name):
+    # Order of a part file name: part-<ms>-<pid>-<n>.parquet, as numbers, so
+    # names from before the pid was zero-padded still compare
+    stem = os.path.basename(name)[len('part-'):].split('.')[0]
+    return tuple(int(n) for n in stem.split('-'))
+
+
+def part_writer(name):
+    # (writer, sequence number) of a part file; the writer is "<ms>-<pid>"
+    ms, pid, n = part_key(name)
+    return f"{ms}-{pid}", n
+
+
+_writer_lock = threading.Lock()
+_last_writer_ms = 0
+
+
+def writer_stamp():
+    # "<ms>-<pid>" naming one TrainingLog; bumped past the last stamp this
+    # process handed out so two logs opened in the same millisecond differ
+    global _last_writer_ms
+    with _writer_lock:
+        _last_writer_ms = max(time.time_ns() // 1_000_000, _last_writer_ms + 1)
+        return f"{_last_writer_ms:013d}-{os.getpid():07d}"
+
+
+def field(message, name):
+    # protobuf JSON uses lowerCamelCase unless the original names were kept
+    if name in message:
+        return message[name]
+    head, *rest = name.split('_')
+    return message.get(head + ''.join(part.title() for part in rest))
+
+
+def parse_trip_updates(message, schedule=None, now=None):
+    """Observations in a FeedMessage, FeedEntity or bare TripUpdate dict.
+
+    Updates without a delay, or whose route cannot be found (from the trip
+    descriptor, else the trip's route in `schedule`), yield nothing; the
+    second return value counts them.
+    """
+    header = field(message, 'header') or {}
+    if 'entity' in message:
+        entities = message['entity']
+    elif field(message, 'trip_update') is not None:
+        entities = [message]
+    else:
+        entities = [{'trip_update': message}]
+    default_time = float(field(header, 'timestamp') or now or time.time())
+
+    found, skipped = [], 0
+    for entity in entities:
+        update = field(entity, 'trip_update')
+        if not update:
+            continue
+        trip = field(update, 'trip') or {}
+        trip_id = field(trip, 'trip_id')
+        route_id = field(trip, 'route_id')
+        if route_id is None and schedule is not None and trip_id in schedule.trip_index:
+            route_id = schedule.route_ids[schedule.trip_route[schedule.trip_index[trip_id]]]
+        conditions = {**(message.get('conditions') or {}), **(entity.get('conditions') or {})}
+        update_time = float(field(update, 'timestamp') or default_time)
+        for stop_update in field(update, 'stop_time_update') or []:
+            event = field(stop_update, 'arrival') or field(stop_update, 'departure') or {}
+            delay = field(event, 'delay')
+            if route_id is None or delay is None:
+                skipped += 1
+                continue
+            found.append(Observation(
+                str(route_id), trip_id, field(stop_update, 'stop_id'),
+                float(field(event, 'time') or update_time), float(delay) / 60, conditions,
+            ))
+    return found, skipped
+
+
+class SlidingWindow:
+    """Count, mean and spread of values over the last `window` seconds, per key.
+
+    The window is cut into `buckets` time slices and each key keeps a ring
+    of (slice number, count, sum, sum of squares), so adding a value and
+    reading a key's stats are O(buckets) whatever the traffic, and expired
+    slices are reused in place. Values older than the window are dropped.
+    At most `max_keys` keys are kept; the longest idle ones go first.
+    """
+
+    def __init__(self, window, buckets, max_keys=100_000):
+        self.width = window / buckets
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, timestamp, value):
+        n = int(timestamp // self.width)
+        with self._lock:
+            ring = self._rings.pop(key, None)
+            if ring is None:
+                if len(self._rings) >= self.max_keys:
+                    del self._rings[next(iter(self._rings))]
+                ring = [[-1, 0, 0.0, 0.0] for _ in range(self.buckets)]
+            # Re-inserted last, so dict order runs from the longest idle key
+            self._rings[key] = ring
+            latest = max(slot[0] for slot in ring)
+            if n <= latest - self.buckets:
+                return False
+            slot = ring[n % self.buckets]
+            if slot[0] != n:
+                slot[:] = [n, 0, 0.0, 0.0]
+            slot[1] += 1
+            slot[2] += value
+            slot[3] += value * value
+            return True
+
+    def stats(self, key, now=None):
+        # (count, mean, std) over the window ending at `now`
+        n = int((time.time() if now is None else now) // self.width)
+        count, total, squares = 0, 0.0, 0.0
+        with self._lock:
+            for slot, c, s, sq in self._rings.get(key, ()):
+                if n - self.buckets < slot <= n:
+                    count, total, squares = count + c, total + s, squares + sq
+        if not count:
+            return 0, None, None
+        mean = total / count
+        return count, mean, max(squares / count - mean * mean, 0.0) ** 0.5
+
+    def __len__(self):
+        return len(self._rings)
+
+
+class LiveDelayStats:
+    """Observed delays per route over the last `recent_window` seconds, and
+    per route and hour of day over the last `days` days."""
+
+    def __init__(self, recent_window=3600, recent_buckets=12, days=7, max_routes=10_000):
+        self.recent = SlidingWindow(recent_window, recent_buckets, max_keys=max_routes)
+        self.hourly = SlidingWindow(days * 86400, days, max_keys=max_routes * 24)
+        self.observations = 0
+
+    def add(self, route_id, timestamp, delay_minutes):
+        hour = datetime.fromtimestamp(timestamp).hour
+        self.recent.add(route_id, timestamp, delay_minutes)
+        self.hourly.add((route_id, hour), timestamp, delay_minutes)
+        self.observations += 1
+
+    def features(self, route_id, hour, now=None):
+        recent_count, recent_mean, _ = self.recent.stats(route_id, now)
+        hour_count, hour_mean, _ = self.hourly.stats((route_id, hour), now)
+        return {
+            "Observed_Recent_Delay": None if recent_mean is None else round(recent_mean, 3),
+            "Observed_Recent_Count": recent_count,
+            "Observed_Hour_Delay": None if hour_mean is None else round(hour_mean, 3),
+            "Observed_Hour_Count": hour_count,
+        }
+
+    def summary(self, route_id, now=None):
+        # Recent stats and every hour of day with observations, for one route
+        count, mean, std = self.recent.stats(route_id, now)
+        hours = {}
+        for hour in range(24):
+            n, hour_mean, hour_std = self.hourly.stats((route_id, hour), now)
+            if n:
+                hours[hour] = {"count": n, "mean_delay": round(hour_mean, 3), "std_delay": round(hour_std, 3)}
+        return {
+            "recent": {"count": count, "mean_delay": None if mean is None else round(mean, 3),
+                       "std_delay": None if std is None else round(std, 3)},
+            "by_hour": hours,
+        }
+
+
+class TrainingLog:
+    """Append-only training rows from observed delays, as Parquet files.
+
+    Rows are buffered and written every `flush_rows` rows (or on the first
+    append `flush_seconds` after the last write, and on close), one file
+    per observation date and hour:
+    observed_log/date=2026-10-16/hour=08/part-<writer ms>-<pid>-<n>.parquet.
+    Files are written under a temporary name and renamed, and never
+    rewritten. Each log (writer) stamps its parts with the time and pid it
+    was opened with and a sequence number `n`, and publishes them in `n`
+    order. A reader's cursor keeps the last `n` it consumed from each
+    writer, so it picks up every newer file, however late another writer's
+    part lands, late observations for old hours included; the date/hour
+    directories let a full read prune by observation time.
+    """
+
+    def __init__(self, path=OBSERVED_LOG_PATH, flush_rows=5000, flush_seconds=30.0):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.writer = writer_stamp()
+        self.rows_written = 0
+        self.files_written = 0
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        # Serializes flushes, so this writer's parts are published in `n` order
+        self._flush_lock = threading.Lock()
+
+    def append(self, row):
+        with self._lock:
+            self._rows.append(row)
+            due = len(self._rows) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._last_flush = time.monotonic()
+            if not rows:
+                return
+            frame = pd.DataFrame(rows)
+            # Partition by local date and hour, the clock the Hour feature uses
+            partitions = pd.Series([
+                datetime.fromtimestamp(t.timestamp()).strftime(os.path.join('date=%Y-%m-%d', 'hour=%H'))
+                for t in frame['Observed_At']
+            ], index=frame.index)
+            for partition, part in frame.groupby(partitions, sort=True):
+                directory = os.path.join(self.path, partition)
+                os.makedirs(directory, exist_ok=True)
+                self.files_written += 1
+                target = os.path.join(directory, f"part-{self.writer}-{self.files_written:06d}.parquet")
+                table = pa.Table.from_pandas(part, schema=LOG_SCHEMA, preserve_index=False)
+                pq.write_table(table, target + '.tmp')
+                os.replace(target + '.tmp', target)
+            self.rows_written += len(rows)
+
+    def close(self):
+        self.flush()
+
+    def files(self, since=None):
+        # Published part files in name order, only those after cursor `since`
+        found = []
+        if os.path.isdir(self.path):
+            for root, _, names in os.walk(self.path):
+                found += [os.path.join(root, name) for name in names if name.startswith('part-') and name.endswith('.parquet')]
+        found.sort(key=part_key)
+        return after_cursor(found, since)
+
+    def read(self, since=None, columns=None):
+        """Logged rows written after cursor `since` (all when None).
+
+        Returns (DataFrame, cursor to pass next time); the cursor is
+        unchanged when nothing new has arrived.
+        """
+        listed = self.files()
+        files = after_cursor(listed, since)
+        columns = columns or LOG_SCHEMA.names
+        if not files:
+            return pd.DataFrame({name: pd.Series(dtype=object) for name in columns}), since
+        table = pa.concat_tables([pq.read_table(f, columns=columns, schema=LOG_SCHEMA) for f in files])
+        # Every listed file is consumed now; a legacy cursor covered those before it
+        cursor = dict(since) if isinstance(since, dict) else {}
+        for f in listed if isinstance(since, str) else files:
+            writer, n = part_writer(f)
+            cursor[writer] = max(cursor.get(writer, 0), n)
+        return table.to_pandas(), cursor
+
+
+def after_cursor(files, since):
+    """The part files in `files` a reader at cursor `since` has not read.
+
+    `since` is None (nothing read), a cursor from TrainingLog.read
+    ({writer: last n read}), or the part file name older versions
+    recorded, meaning every part ordered up to it was read.
+    """
+    if since is None:
+        return files
+    if isinstance(since, str):
+        last = part_key(since)
+        return [f for f in files if part_key(f) > last]
+    return [f for f in files if part_writer(f)[1] > since.get(part_writer(f)[0], 0)]
+
+
+class ObservationIngestor:
+    """Feeds parsed observations into the live stats and the training log.
+
+    Each logged row carries the live features as they were just before the
+    observation arrived, the same values a prediction at that moment would
+    have seen.
+    """
+
+    def __init__(self, stats, log=None, schedule=None, conditions=None):
+        self.stats = stats
+        self.log = log
+        self.schedule = schedule
+        self.conditions = {**DEFAULT_CONDITIONS, **(conditions or {})}
+        self.messages = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def ingest(self, message):
+        # One decoded message; returns the number of observations taken
+        observations, skipped = parse_trip_updates(message, self.schedule)
+        self.messages += 1
+        self.skipped += skipped
+        for obs in observations:
+            local = datetime.fromtimestamp(obs.timestamp)
+            features = self.stats.features(obs.route_id, local.hour, obs.timestamp)
+            self.stats.add(obs.route_id, obs.timestamp, obs.delay_minutes)
+            if self.log is not None:
+                self.log.append({
+                    **self.conditions, **obs.conditions,
+                    "Route_ID": obs.route_id, "Hour": local.hour, "Day_OfWeek": local.weekday(),
+                    "Delay_Minutes": obs.delay_minutes,
+                    **{name: np.nan if value is None else value for name, value in features.items()},
+                    "Trip_ID": obs.trip_id, "Stop_ID": obs.stop_id,
+                    "Observed_At": pd.Timestamp(int(obs.timestamp), unit='s', tz='UTC'),
+                })
+        return len(observations)
+
+    def ingest_line(self, line):
+        line = line.strip()
+        if not line:
+            return 0
+        try:
+            return self.ingest(json.loads(line))
+        except (ValueError, TypeError, AttributeError, KeyError):
+            self.errors += 1
+            return 0
+
+    async def consume(self, lines, executor=None):
+        # Ingesting may flush the training log to Parquet, so it runs off the event loop
+        loop = asyncio.get_running_loop()
+        async for line in lines:
+            await loop.run_in_executor(executor, self.ingest_line, line)
+
+    def counters(self):
+        return {
+            "messages": self.messages,
+            "observations": self.stats.observations,
+            "skipped_updates": self.skipped,
+            "bad_messages": self.errors,
+            "logged_rows": self.log.rows_written if self.log is not None else 0,
+        }
+
+
+async def follow_file(path, follow=False, poll=0.5):
+    # Lines of a file; with `follow`, keep waiting for appended lines (tail -f)
+    with open(path) as f:
+        partial = ''
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    if partial:
+                        yield partial
+                    return
+                await asyncio.sleep(poll)
+                continue
+            # A line still being written is held back until its newline arrives
+            partial += line
+            if partial.endswith('\n'):
+                yield partial
+                partial = ''
+
+
+async def listen_socket(host, port):
+    # Lines from any number of TCP clients (e.g. `nc host port < updates.jsonl`)
+    queue = asyncio.Queue(maxsize=10_000)
+
+    async def client(reader, writer):
+        try:
+            while line := await reader.readline():
+                await queue.put(line.decode())
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(client, host, port)
+    async with server:
+        while True:
+            yield await queue.get()
+
+
+def sample_feed(schedule, n_trips=100, seed=0, now=None, max_delay=15.0):
+    # Stand-in feed: FeedMessages for random GTFS trips with delays that
+    # build up along each trip, one trip per message
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    for trip in rng.choice(len(schedule.trip_ids), size=min(n_trips, len(schedule.trip_ids)), replace=False):
+        span = schedule.trip_slice(trip)
+        final = rng.uniform(0, max_delay)
+        n = max(span.stop - span.start, 1)
+        updates = []
+        for k, e in enumerate(range(span.start, span.stop)):
+            delay = int(final * 60 * (k + 1) / n)
+            updates.append({
+                "stop_sequence": k + 1,
+                "stop_id": schedule.stop_ids[schedule.event_stop[e]],
+                "arrival": {"delay": delay, "time": int(midnight + schedule.arrivals[e] + delay)},
+            })
+        yield {
+            "header": {"gtfs_realtime_version": "2.0", "timestamp": int(now)},
+            "entity": [{"id": schedule.trip_ids[trip], "trip_update": {
+                "trip": {"trip_id": schedule.trip_ids[trip], "route_id": schedule.route_ids[schedule.trip_route[trip]]},
+                "stop_time_update": updates,
+            }}],
+        }
+
+
+async def run(args):
+    from schedule import ScheduleEngine
+    try:
+        schedule = ScheduleEngine.from_feeds()
+    except FileNotFoundError:
+        schedule = None
+    ingestor = ObservationIngestor(LiveDelayStats(), TrainingLog(args.log), schedule, args.conditions)
+    if args.listen:
+        host, port = args.listen.rsplit(':', 1)
+        print(f"Listening for trip updates on {host}:{port}")
+        lines = listen_socket(host, int(port))
+    else:
+        lines = follow_file(args.file, follow=args.follow)
+    try:
+        await ingestor.consume(lines)
+    finally:
+        ingestor.log.close()
+        print(f"Ingested {ingestor.counters()} into {args.log}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest observed trip updates into live stats and the training log")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--file', help="newline-delimited GTFS-Realtime JSON")
+    source.add_argument('--listen', metavar='HOST:PORT', help="accept newline-delimited messages over TCP")
+    source.add_argument('--write-sample', metavar='PATH', help="write a stand-in feed from the GTFS schedule and exit")
+    parser.add_argument('--follow', action='store_true', help="keep reading lines appended to --file")
+    parser.add_argument('--log', default=OBSERVED_LOG_PATH, help="training log directory")
+    parser.add_argument('--conditions', type=json.loads, default={},
+                        help='conditions to log with each row, e.g. \'{"Weather_Condition": "Rainy"}\'')
+    parser.add_argument('--trips', type=int, default=200, help="trips in the --write-sample feed")
+    args = parser.parse_args()
+
+    if args.write_sample:
+        from schedule import ScheduleEngine
+        with open(args.write_sample, 'w') as f:
+            for message in sample_feed(ScheduleEngine.from_feeds(), args.trips):
+                f.write(json.dumps(message) + '\n')
+        print(f"Wrote {args.trips} trip updates to {args.write_sample}")
+    else:
+        try:
+            asyncio.run(run(args))
+        except KeyboardInterrupt:
+            pass
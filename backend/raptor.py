@@ -0,0 +1,168 @@
+from collections import namedtuple
+import numpy as np
+from gtfs import format_time
+from schedule import csr
+
+INFINITY = np.iinfo(np.int32).max
+# Most transfers plan() searches; each round costs an n_stops arrival row
+MAX_TRANSFERS = 8
+
+JourneyLeg = namedtuple('JourneyLeg', ['trip_id', 'route_id', 'stops', 'departure', 'arrival'])
+
+
+class JourneyPlanner:
+    """Round-based (RAPTOR) earliest-arrival planner over a ScheduleEngine.
+
+    Trips are grouped into route patterns (trips sharing the exact same stop
+    sequence). Each pattern keeps (trips x stops) arrival/departure matrices
+    with trips ordered by first departure, and a stop -> (pattern, position)
+    index lists every pattern serving a stop. Round k finds the best arrival
+    at every stop using at most k trips.
+
+    Trips are assumed not to overtake each other within a pattern (the usual
+    RAPTOR FIFO assumption). Transfers are same-stop only, with
+    `min_transfer` seconds between alighting and boarding.
+    """
+
+    def __init__(self, schedule, min_transfer=120):
+        self.schedule = schedule
+        self.min_transfer = min_transfer
+
+        patterns = {}
+        for trip in range(len(schedule.trip_ids)):
+            span = schedule.trip_slice(trip)
+            if span.stop - span.start < 2:
+                continue
+            key = schedule.event_stop[span].tobytes()
+            patterns.setdefault(key, []).append(trip)
+
+        self.pattern_stops = []
+        self.pattern_trips = []
+        self.pattern_arrivals = []
+        self.pattern_departures = []
+        for trips in patterns.values():
+            trips = sorted(trips, key=lambda t: schedule.trip_start[t])
+            events = np.stack([np.arange(schedule.trip_offsets[t], schedule.trip_offsets[t + 1]) for t in trips])
+            self.pattern_stops.append(schedule.event_stop[events[0]])
+            self.pattern_trips.append(np.asarray(trips, dtype=np.int32))
+            self.pattern_arrivals.append(schedule.arrivals[events])
+            self.pattern_departures.append(schedule.departures[events])
+
+        # stop -> (pattern, position) pairs
+        if self.pattern_stops:
+            stop_of = np.concatenate(self.pattern_stops)
+            pattern_of = np.concatenate([np.full(len(s), p, dtype=np.int32) for p, s in enumerate(self.pattern_stops)])
+            position_of = np.concatenate([np.arange(len(s), dtype=np.int32) for s in self.pattern_stops])
+        else:
+            stop_of = pattern_of = position_of = np.empty(0, dtype=np.int32)
+        offsets, order = csr(stop_of, len(schedule.stop_ids))
+        self.stop_pattern_offsets = offsets
+        self.stop_pattern = pattern_of[order]
+        self.stop_position = position_of[order]
+
+    @property
+    def n_patterns(self):
+        return len(self.pattern_stops)
+
+    def _patterns_at(self, stop):
+        lo, hi = self.stop_pattern_offsets[stop], self.stop_pattern_offsets[stop + 1]
+        return zip(self.stop_pattern[lo:hi].tolist(), self.stop_position[lo:hi].tolist())
+
+    def plan(self, origin, destination, departure, max_transfers=3):
+        """Earliest-arrival journey between stop refs leaving at or after `departure`.
+
+        `departure` is seconds after service-day midnight. Returns a list of
+        JourneyLeg, or None when the destination is unreachable that day.
+        `max_transfers` is clamped to [0, MAX_TRANSFERS].
+        """
+        schedule = self.schedule
+        source, target = schedule.resolve_stop(origin), schedule.resolve_stop(destination)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return []
+
+        n_stops = len(schedule.stop_ids)
+        rounds = min(max(max_transfers, 0), MAX_TRANSFERS) + 1
+        best = np.full(n_stops, INFINITY, dtype=np.int64)
+        arrival = np.full((rounds + 1, n_stops), INFINITY, dtype=np.int64)
+        # parent[k][stop] = (pattern, trip row, board position, alight position)
+        parent = [dict() for _ in range(rounds + 1)]
+
+        arrival[0, source] = best[source] = departure
+        marked = {source}
+
+        for k in range(1, rounds + 1):
+            arrival[k] = arrival[k - 1]
+            # Earliest marked position on every pattern touching a marked stop
+            queue = {}
+            for stop in marked:
+                for pattern, position in self._patterns_at(stop):
+                    if position < queue.get(pattern, INFINITY):
+                        queue[pattern] = position
+            marked = set()
+
+            for pattern, start in queue.items():
+                stops = self.pattern_stops[pattern]
+                arr = self.pattern_arrivals[pattern]
+                dep = self.pattern_departures[pattern]
+                row = board = None
+                for i in range(start, len(stops)):
+                    stop = stops[i]
+                    if row is not None:
+                        t = arr[row, i]
+                        if t < best[stop] and t < best[target]:
+                            arrival[k, stop] = best[stop] = t
+                            parent[k][stop] = (pattern, row, board, i)
+                            marked.add(stop)
+                    # Catch an earlier trip here if we reached this stop sooner
+                    ready = arrival[k - 1, stop]
+                    if ready == INFINITY:
+                        continue
+                    if k > 1:
+                        ready += self.min_transfer
+                    if row is None or ready <= dep[row, i]:
+                        candidate = np.searchsorted(dep[:, i], ready)
+                        if candidate < len(dep) and (row is None or candidate < row):
+                            row, board = candidate, i
+            if not marked:
+                break
+
+        if best[target] == INFINITY:
+            return None
+        k = int(np.argmin(arrival[:, target]))
+        return self._reconstruct(parent, k, target)
+
+    def _reconstruct(self, parent, k, stop):
+        schedule = self.schedule
+        legs = []
+        while k > 0:
+            if stop not in parent[k]:
+                # Reached in an earlier round and carried over
+                k -= 1
+                continue
+            pattern, row, board, alight = parent[k][stop]
+            trip = self.pattern_trips[pattern][row]
+            stops = self.pattern_stops[pattern][board:alight + 1]
+            legs.append(JourneyLeg(
+                schedule.trip_ids[trip], schedule.route_ids[schedule.trip_route[trip]],
+                stops.tolist(),
+                int(self.pattern_departures[pattern][row, board]),
+                int(self.pattern_arrivals[pattern][row, alight]),
+            ))
+            stop = stops[0]
+            k -= 1
+        return legs[::-1]
+
+    def leg_to_dict(self, leg):
+        schedule = self.schedule
+        return {
+            "trip_id": leg.trip_id,
+            "route_id": leg.route_id,
+            "from_stop": schedule.stop_ids[leg.stops[0]],
+            "to_stop": schedule.stop_ids[leg.stops[-1]],
+            "departure": format_time(leg.departure),
+            "arrival": format_time(leg.arrival),
+            "num_stops": len(leg.stops) - 1,
+            "path": [[schedule.stop_lat[s], schedule.stop_lon[s]] for s in leg.stops],
+        }
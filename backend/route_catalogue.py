@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from gtfs import FEEDS, feed_path, read_table
+
+# GTFS route_type -> mode name
+ROUTE_TYPES = {
+    0: 'tram', 1: 'subway', 2: 'rail', 3: 'bus', 4: 'ferry',
+    5: 'cable_tram', 6: 'aerial_lift', 7: 'funicular', 11: 'trolleybus', 12: 'monorail',
+}
+
+CATALOGUE_TABLES = ('routes', 'agency')
+
+# One immutable build: the routes it lists and the bytes /routes serves
+CatalogueSnapshot = namedtuple('CatalogueSnapshot', ['signature', 'trained', 'routes', 'body', 'gzip_body', 'etag'])
+
+
+class RouteCatalogue:
+    """In-memory route list built from the GTFS routes.txt/agency.txt files.
+
+    The JSON body, its gzip encoding and an ETag are computed once per
+    build, so serving /routes is a header check and a bytes write. The
+    source files' modification times are re-checked on each `current()`
+    call and the catalogue is rebuilt only when one of them, or the set of
+    routes the delay model was trained on, changed. Each build is a
+    CatalogueSnapshot swapped in with one assignment, so concurrent readers
+    never see a body from one build with another's ETag; rebuilds take a
+    lock so only one thread does the work.
+
+    Most GTFS routes are not in the training data. When `trained` route ids
+    are given, `routes` lists only those (the dashboard offers them for
+    prediction) and each entry in `details` says whether it is trained.
+    """
+
+    def __init__(self, feeds=None, trained=None):
+        self.feeds = sorted(feeds or FEEDS)
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self.current(trained)
+
+    def source_signature(self):
+        return tuple(os.path.getmtime(feed_path(feed, table)) for feed in self.feeds for table in CATALOGUE_TABLES)
+
+    def current(self, trained=None):
+        """The CatalogueSnapshot for `trained`, rebuilt if it or the source files changed."""
+        signature = self.source_signature()
+        trained = frozenset(trained) if trained is not None else None
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.signature == signature and snapshot.trained == trained:
+            return snapshot
+        with self._lock:
+            # Another thread may have rebuilt it while this one waited
+            snapshot = self.snapshot
+            if snapshot is not None and snapshot.signature == signature:
+                if snapshot.trained == trained:
+                    return snapshot
+                routes = snapshot.routes
+            else:
+                routes = self.load()
+            self.snapshot = snapshot = self.render(signature, routes, trained)
+        return snapshot
+
+    def load(self):
+        routes = []
+        for feed in self.feeds:
+            agencies = read_table(feed, 'agency', ['agency_id', 'agency_name'])
+            names = dict(zip(agencies['agency_id'], agencies['agency_name']))
+            # agency_id is optional in single-agency feeds
+            default_agency = agencies['agency_name'].iloc[0] if len(agencies) == 1 else ''
+            table = read_table(feed, 'routes', [
+                'route_id', 'agency_id', 'route_short_name', 'route_long_name', 'route_type'
+            ])
+            agency_ids = table['agency_id'] if 'agency_id' in table else [''] * len(table)
+            for route_id, agency_id, short_name, long_name, route_type in zip(
+                table['route_id'], agency_ids, table['route_short_name'],
+                table['route_long_name'], table['route_type']
+            ):
+                route_type = int(route_type) if route_type else None
+                routes.append({
+                    "route_id": route_id,
+                    "short_name": short_name,
+                    "long_name": long_name,
+                    "route_type": route_type,
+                    "mode": ROUTE_TYPES.get(route_type),
+                    "agency": names.get(agency_id, default_agency),
+                    "feed": feed,
+                })
+        routes.sort(key=lambda r: r["route_id"])
+        return routes
+
+    @staticmethod
+    def render(signature, routes, trained=None):
+        # "routes" stays a plain id list for existing clients
+        if trained is None:
+            details = routes
+        else:
+            details = [{**r, "trained": r["route_id"] in trained} for r in routes]
+        body = json.dumps({
+            "routes": [r["route_id"] for r in details if trained is None or r["trained"]],
+            "details": details,
+        }, separators=(',', ':')).encode()
+        return CatalogueSnapshot(
+            signature, trained, routes, body, gzip.compress(body, compresslevel=9, mtime=0),
+            f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+        )
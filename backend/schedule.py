@@ -0,0 +1,184 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from gtfs import FEEDS, read_table, parse_times, format_time
+
+ScheduledLeg = namedtuple('ScheduledLeg', ['trip_id', 'route_id', 'origin', 'destination', 'departure', 'arrival'])
+
+
+def leg_to_dict(leg):
+    return {
+        "trip_id": leg.trip_id,
+        "route_id": leg.route_id,
+        "from_stop": leg.origin,
+        "to_stop": leg.destination,
+        "departure": format_time(leg.departure),
+        "arrival": format_time(leg.arrival),
+        "scheduled_minutes": round((leg.arrival - leg.departure) / 60, 2),
+    }
+
+
+def normalize_name(name):
+    return " ".join(str(name).lower().split())
+
+
+def csr(groups, n_groups, order_keys=()):
+    # Group row indices by `groups` (ints in [0, n_groups)); within a group
+    # rows are ordered by `order_keys` (np.lexsort order, last key primary).
+    # Returns (offsets, rows) so group g owns rows[offsets[g]:offsets[g + 1]].
+    rows = np.lexsort(tuple(order_keys) + (groups,)).astype(np.int32)
+    counts = np.bincount(groups, minlength=n_groups)
+    offsets = np.zeros(n_groups + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, rows
+
+
+class ScheduleEngine:
+    """Scheduled stop times for the bundled GTFS feeds in flat NumPy arrays.
+
+    Every stop_times row is an "event" with int32 stop index, arrival and
+    departure seconds. Events are stored sorted by (trip, stop_sequence), so
+    trip t owns events[trip_offsets[t]:trip_offsets[t + 1]]. A second CSR
+    index lists each stop's events ordered by departure time.
+
+    Stop, trip and route ids are used as-is; they do not collide across the
+    bundled feeds.
+    """
+
+    def __init__(self, stops, trips, stop_times):
+        # stops: stop_id, stop_name, stop_code, stop_lat, stop_lon, feed
+        # trips: trip_id, route_id, service_id, feed
+        # stop_times: trip_id, stop_id, stop_sequence, arrival_time, departure_time
+        stops = stops.drop_duplicates('stop_id').reset_index(drop=True)
+        trips = trips.drop_duplicates('trip_id').reset_index(drop=True)
+
+        self.stop_ids = stops['stop_id'].tolist()
+        self.stop_names = stops['stop_name'].tolist()
+        self.stop_codes = stops['stop_code'].tolist()
+        self.stop_feeds = stops['feed'].tolist()
+        self.stop_lat = pd.to_numeric(stops['stop_lat']).to_numpy(np.float64)
+        self.stop_lon = pd.to_numeric(stops['stop_lon']).to_numpy(np.float64)
+        self.stop_index = {sid: i for i, sid in enumerate(self.stop_ids)}
+        self._stop_lookup = {}
+        for i, (name, code) in enumerate(zip(self.stop_names, self.stop_codes)):
+            for ref in (name, code):
+                if ref:
+                    self._stop_lookup.setdefault(normalize_name(ref), i)
+
+        self.trip_ids = trips['trip_id'].tolist()
+        self.trip_index = {tid: i for i, tid in enumerate(self.trip_ids)}
+        self.trip_services = trips['service_id'].tolist()
+        self.route_ids = sorted(trips['route_id'].unique().tolist())
+        self.route_index = {rid: i for i, rid in enumerate(self.route_ids)}
+        self.trip_route = trips['route_id'].map(self.route_index).to_numpy(np.int32)
+
+        # Events sorted by (trip, stop_sequence)
+        trip_idx = stop_times['trip_id'].map(self.trip_index)
+        stop_idx = stop_times['stop_id'].map(self.stop_index)
+        known = trip_idx.notna() & stop_idx.notna()
+        trip_idx = trip_idx[known].to_numpy(np.int32)
+        stop_idx = stop_idx[known].to_numpy(np.int32)
+        sequence = stop_times.loc[known, 'stop_sequence'].astype(np.int32).to_numpy()
+        arrivals = parse_times(stop_times.loc[known, 'arrival_time'])
+        departures = parse_times(stop_times.loc[known, 'departure_time'])
+
+        self.trip_offsets, order = csr(trip_idx, len(self.trip_ids), (sequence,))
+        self.event_trip = trip_idx[order]
+        self.event_stop = stop_idx[order]
+        self.arrivals = arrivals[order]
+        self.departures = departures[order]
+
+        # First departure of each trip (trips without stop times sort last)
+        has_events = np.diff(self.trip_offsets) > 0
+        self.trip_start = np.full(len(self.trip_ids), np.iinfo(np.int32).max, dtype=np.int32)
+        self.trip_start[has_events] = self.departures[self.trip_offsets[:-1][has_events]]
+
+        # Per-stop events ordered by departure, and per-route trips by start
+        self.stop_event_offsets, self.stop_events = csr(self.event_stop, len(self.stop_ids), (self.departures,))
+        self.route_trip_offsets, self.route_trips = csr(self.trip_route, len(self.route_ids), (self.trip_start,))
+
+    @classmethod
+    def from_feeds(cls, feeds=None):
+        stops, trips, stop_times = [], [], []
+        for feed in feeds or FEEDS:
+            s = read_table(feed, 'stops', ['stop_id', 'stop_name', 'stop_code', 'stop_lat', 'stop_lon'])
+            t = read_table(feed, 'trips', ['trip_id', 'route_id', 'service_id'])
+            stops.append(s.assign(feed=feed))
+            trips.append(t.assign(feed=feed))
+            stop_times.append(read_table(
+                feed, 'stop_times', ['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time']
+            ))
+        return cls(
+            pd.concat(stops, ignore_index=True).reindex(columns=['stop_id', 'stop_name', 'stop_code', 'stop_lat', 'stop_lon', 'feed'], fill_value=''),
+            pd.concat(trips, ignore_index=True),
+            pd.concat(stop_times, ignore_index=True),
+        )
+
+    @property
+    def n_events(self):
+        return len(self.event_stop)
+
+    def resolve_stop(self, ref):
+        # Stop id, stop code or (case/space-insensitive) exact stop name
+        if ref in self.stop_index:
+            return self.stop_index[ref]
+        return self._stop_lookup.get(normalize_name(ref))
+
+    def trip_slice(self, trip):
+        return slice(self.trip_offsets[trip], self.trip_offsets[trip + 1])
+
+    def stop_slice(self, stop):
+        return slice(self.stop_event_offsets[stop], self.stop_event_offsets[stop + 1])
+
+    def route_trip_list(self, route):
+        return self.route_trips[self.route_trip_offsets[route]:self.route_trip_offsets[route + 1]]
+
+    def connections(self, origin, destination):
+        """All scheduled rides from stop index `origin` to `destination`.
+
+        Returns (boarding events, alighting events), ordered by departure.
+        Since events are sorted by (trip, stop_sequence), the first visit to
+        `destination` after a boarding event on the same trip is the next
+        destination event with a larger index.
+        """
+        board = self.stop_events[self.stop_slice(origin)]
+        alight = np.sort(self.stop_events[self.stop_slice(destination)])
+        nxt = np.searchsorted(alight, board, side='right')
+        ok = nxt < len(alight)
+        board, alight = board[ok], alight[nxt[ok]]
+        same_trip = self.event_trip[board] == self.event_trip[alight]
+        return board[same_trip], alight[same_trip]
+
+    def travel_time(self, origin, destination, trip_id=None, route_id=None, after=None):
+        """Scheduled leg from `origin` to `destination` stop (ids, codes or names).
+
+        Restricted to `trip_id` or `route_id` when given. With `after`
+        (seconds after midnight) the first leg departing at or after it is
+        returned, wrapping to the first departure of the day; otherwise the
+        earliest departure. Returns a ScheduledLeg, or None if no trip serves
+        both stops in that order.
+        """
+        a, b = self.resolve_stop(origin), self.resolve_stop(destination)
+        if a is None or b is None:
+            return None
+        board, alight = self.connections(a, b)
+        if trip_id is not None:
+            keep = self.event_trip[board] == self.trip_index.get(trip_id, -1)
+            board, alight = board[keep], alight[keep]
+        elif route_id is not None:
+            keep = self.trip_route[self.event_trip[board]] == self.route_index.get(route_id, -1)
+            board, alight = board[keep], alight[keep]
+        if not len(board):
+            return None
+
+        i = 0
+        if after is not None:
+            i = np.searchsorted(self.departures[board], after)
+            if i == len(board):
+                i = 0
+        trip = self.event_trip[board[i]]
+        return ScheduledLeg(
+            self.trip_ids[trip], self.route_ids[self.trip_route[trip]],
+            self.stop_ids[a], self.stop_ids[b],
+            int(self.departures[board[i]]), int(self.arrivals[alight[i]])
+        )
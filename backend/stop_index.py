@@ -0,0 +1,90 @@
+import os
+import joblib
+import numpy as np
+from scipy.spatial import cKDTree
+from gtfs import FEEDS, feed_path
+
+EARTH_RADIUS_M = 6_371_000
+INDEX_PATH = 'stop_index.pkl'
+
+
+def feed_signature(feeds=None):
+    # Modification times of every stops.txt, to spot a stale serialized index
+    return {feed: os.path.getmtime(feed_path(feed, 'stops')) for feed in feeds or FEEDS}
+
+
+def unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class StopIndex:
+    """KD-tree over GTFS stop coordinates.
+
+    Stops are placed on the unit sphere so straight-line (chord) distance in
+    the tree is monotonic in great-circle distance; queries take a tree
+    descent instead of a scan over every stop. Results
+    are (stop index, distance in metres) pairs, where stop index refers to
+    the `stop_ids` passed in (ScheduleEngine order when built from_schedule).
+    """
+
+    def __init__(self, stop_ids, stop_names, lat, lon, signature=None, tree=None):
+        self.stop_ids = list(stop_ids)
+        self.stop_names = list(stop_names)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.signature = signature
+        if tree is None:
+            tree = cKDTree(unit_vectors(self.lat, self.lon))
+        self.tree = tree
+
+    @classmethod
+    def from_schedule(cls, schedule):
+        return cls(schedule.stop_ids, schedule.stop_names, schedule.stop_lat, schedule.stop_lon, feed_signature())
+
+    @classmethod
+    def load_or_build(cls, schedule, path=INDEX_PATH):
+        # Use the serialized index when it matches the current feeds
+        if os.path.exists(path):
+            state = joblib.load(path)
+            if state['signature'] == feed_signature() and state['stop_ids'] == schedule.stop_ids:
+                return cls(**state)
+        return cls.from_schedule(schedule)
+
+    def save(self, path=INDEX_PATH):
+        # Plain dict so the file loads without this module on the pickle path
+        joblib.dump({
+            'stop_ids': self.stop_ids, 'stop_names': self.stop_names,
+            'lat': self.lat, 'lon': self.lon,
+            'signature': self.signature, 'tree': self.tree,
+        }, path)
+
+    def nearest(self, lat, lon, k=5):
+        k = min(k, len(self.stop_ids))
+        chord, idx = self.tree.query(unit_vectors(lat, lon)[0], k=k)
+        chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+        return list(zip(idx.tolist(), (2 * EARTH_RADIUS_M * np.arcsin(chord / 2)).tolist()))
+
+    def within(self, lat, lon, radius_m, limit=None):
+        point = unit_vectors(lat, lon)[0]
+        chord = 2 * np.sin(min(radius_m / EARTH_RADIUS_M, np.pi) / 2)
+        idx = np.asarray(self.tree.query_ball_point(point, chord), dtype=np.int64)
+        dist = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(np.linalg.norm(self.tree.data[idx] - point, axis=1) / 2, 1))
+        order = np.argsort(dist)[:limit]
+        return list(zip(idx[order].tolist(), dist[order].tolist()))
+
+    def describe(self, hits):
+        return [{
+            "stop_id": self.stop_ids[i],
+            "stop_name": self.stop_names[i],
+            "lat": self.lat[i],
+            "lon": self.lon[i],
+            "distance_m": round(d, 1),
+        } for i, d in hits]
+
+
+if __name__ == "__main__":
+    from schedule import ScheduleEngine
+    index = StopIndex.from_schedule(ScheduleEngine.from_feeds())
+    index.save()
+    print(f"Indexed {len(index.stop_ids)} stops to {INDEX_PATH}")
@@ -0,0 +1,73 @@
+import os
+import sys
+import pytest
+
+# The backend is a flat set of modules run from backend/, with artifact
+# paths relative to it; tests run the same way
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ.setdefault("TRANSIT_FAKE_MAPS", "1")
+os.environ.setdefault("MODEL_WATCH_INTERVAL", "0")
+
+
+@pytest.fixture(scope="session")
+def pipeline():
+    # A small forest on the bundled training data, fitted once per run
+    from columnar import read_training_data
+    from train_model import build_pipeline
+    df = read_training_data().sample(4000, random_state=0)
+    model = build_pipeline(n_estimators=12, max_depth=10, n_jobs=1)
+    model.fit(df.drop('Delay_Minutes', axis=1), df['Delay_Minutes'])
+    return model
+
+
+@pytest.fixture(scope="session")
+def feature_rows():
+    from columnar import read_training_data
+    return read_training_data().sample(500, random_state=1).drop('Delay_Minutes', axis=1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # The full app, when a trained model and the GTFS feeds are present
+    if not os.path.exists('delay_model.pkl'):
+        pytest.skip("no trained model; run train_model.py")
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+
+# A five-stop network: R1 runs Palace Ground -> Ameerpet -> Ameerpet Metro
+# twice in the morning, R2 connects Ameerpet to Kukatpally and runs one trip
+# past midnight, R3 runs on Saturdays only. Kukatpally Bus Stand is a short
+# walk from Kukatpally.
+TINY_STOPS = [
+    ("A", "Palace Ground", "PG", 17.40, 78.40),
+    ("B", "Ameerpet", "AM", 17.41, 78.41),
+    ("C", "Ameerpet Metro", "AMM", 17.42, 78.42),
+    ("D", "Kukatpally", "KP", 17.43, 78.40),
+    ("E", "Kukatpally Bus Stand", "KPB", 17.4305, 78.4003),
+]
+TINY_TRIPS = [
+    ("t1", "R1", "WK", [("A", "08:00:00"), ("B", "08:10:00"), ("C", "08:20:00")]),
+    ("t2", "R1", "WK", [("A", "09:00:00"), ("B", "09:10:00"), ("C", "09:20:00")]),
+    ("t3", "R2", "WK", [("B", "08:15:00"), ("D", "08:30:00")]),
+    ("t4", "R3", "SAT", [("A", "10:00:00"), ("D", "10:30:00")]),
+    ("t5", "R2", "WK", [("D", "23:50:00"), ("B", "24:20:00"), ("C", "24:40:00")]),
+]
+
+
+@pytest.fixture(scope="session")
+def tiny_schedule():
+    import pandas as pd
+    from schedule import ScheduleEngine
+    stops = pd.DataFrame(TINY_STOPS, columns=['stop_id', 'stop_name', 'stop_code', 'stop_lat', 'stop_lon']).assign(feed='tiny')
+    trips = pd.DataFrame([t[:3] for t in TINY_TRIPS], columns=['trip_id', 'route_id', 'service_id']).assign(feed='tiny')
+    stop_times = pd.DataFrame(
+        [(trip, stop, seq + 1, time, time) for trip, _, _, calls in TINY_TRIPS for seq, (stop, time) in enumerate(calls)],
+        columns=['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time'],
+    )
+    # Shuffled, as feeds do not list stop times in trip order
+    return ScheduleEngine(stops, trips, stop_times.sample(frac=1, random_state=0))
@@ -0,0 +1,74 @@
+import io
+import json
+import pandas as pd
+from inference import iter_chunks, stream_predictions
+
+
+def records(feature_rows, n):
+    return feature_rows.head(n).astype({"Route_ID": str}).to_dict("records")
+
+
+def test_bad_chunks_become_error_lines(pipeline, feature_rows):
+    rows = records(feature_rows, 7)
+    rows[3] = ["not", "an", "object"]
+    del rows[5]["Hour"]
+    lines = list(stream_predictions(pipeline, iter_chunks(rows, size=2)))
+    assert [line.get("row") for line in lines[:2]] == [0, 1]
+    assert lines[2]["rows"] == [2, 3] and "expected an object" in lines[2]["error"]
+    assert lines[3]["rows"] == [4, 5] and "Hour" in lines[3]["error"]
+    assert lines[4] == {"row": 6, "predicted_delay": lines[4]["predicted_delay"]}
+
+
+def test_unreadable_chunk_ends_stream_with_error(pipeline, feature_rows):
+    # An unterminated quote fails the CSV reader itself, after the first chunk
+    csv = feature_rows.head(4).to_csv(index=False) + '"47123,Sunny\n' + feature_rows.head(4).to_csv(index=False, header=False)
+    chunks = pd.read_csv(io.StringIO(csv), chunksize=4, keep_default_na=False)
+    lines = list(stream_predictions(pipeline, chunks))
+    assert [line["row"] for line in lines[:4]] == [0, 1, 2, 3]
+    assert lines[-1]["rows"] == [4, None] and lines[-1]["error"]
+
+
+def test_predict_batch_endpoint(client, feature_rows):
+    response = client.post("/predict-batch", json=records(feature_rows, 5))
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["row"] for line in lines] == [0, 1, 2, 3, 4]
+
+    response = client.post("/predict-batch", json=records(feature_rows, 5) + [42])
+    assert response.status_code == 200
+    (line,) = [json.loads(line) for line in response.text.splitlines()]
+    assert line["rows"] == [0, 5] and "expected an object" in line["error"]
+
+
+def test_predict_batch_scores_on_inference_threads(client, feature_rows, monkeypatch):
+    import threading
+    import inference
+    threads = []
+    predict = inference.predict_delays
+
+    def recording(model, frame):
+        threads.append(threading.current_thread().name)
+        return predict(model, frame)
+
+    monkeypatch.setattr(inference, "predict_delays", recording)
+    ndjson = "\n".join(json.dumps(r) for r in records(feature_rows, 5))
+    response = client.post("/predict-batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert [json.loads(line)["row"] for line in response.text.splitlines()] == [0, 1, 2, 3, 4]
+    csv = feature_rows.head(3).to_csv(index=False)
+    response = client.post("/predict-batch/csv", files={"file": ("trips.csv", csv, "text/csv")})
+    assert [json.loads(line)["row"] for line in response.text.splitlines()] == [0, 1, 2]
+    assert threads and all(name.startswith("inference") for name in threads)
+
+
+def test_predict_batch_caps_body_size(client, feature_rows, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "BATCH_MAX_BYTES", 100)
+    assert client.post("/predict-batch", json=records(feature_rows, 5)).status_code == 413
+
+    def chunked():
+        yield b"["
+        for record in records(feature_rows, 5):
+            yield json.dumps(record).encode() + b","
+    # No Content-Length, so the cap applies as the body streams in
+    assert client.post("/predict-batch", content=chunked()).status_code == 413
+    csv = feature_rows.head(5).to_csv(index=False)
+    assert client.post("/predict-batch/csv", files={"file": ("trips.csv", csv, "text/csv")}).status_code == 413
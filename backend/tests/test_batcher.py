@@ -0,0 +1,73 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from batcher import MicroBatcher
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ThreadPoolExecutor(1) as executor:
+        yield executor
+
+
+def test_concurrent_rows_share_one_call(executor):
+    calls = []
+
+    def predict(rows):
+        calls.append(list(rows))
+        return np.asarray(rows, dtype=float) * 2
+
+    async def scenario():
+        batcher = MicroBatcher(predict, executor, max_batch=64, max_wait=0.05)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    assert results == [2.0 * i for i in range(10)]
+    assert calls == [list(range(10))]
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["rows"] == 10 and stats["max_batch_size"] == 10
+    assert stats["queued"] == 0 and stats["queue_wait_ms_p50"] is not None
+
+
+def test_full_batch_flushes_without_waiting(executor):
+    sizes = []
+
+    def predict(rows):
+        sizes.append(len(rows))
+        return np.zeros(len(rows))
+
+    async def scenario():
+        batcher = MicroBatcher(predict, executor, max_batch=4, max_wait=60)
+        await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(8))), timeout=5)
+
+    asyncio.run(scenario())
+    assert sizes == [4, 4]
+
+
+def test_predict_error_reaches_every_caller(executor):
+    def predict(rows):
+        raise ValueError("bad row")
+
+    async def scenario():
+        batcher = MicroBatcher(predict, executor, max_wait=0)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert batcher.errors == 1 and batcher.batches == 0
+
+
+def test_cancelled_caller_does_not_break_the_batch(executor):
+    async def scenario():
+        batcher = MicroBatcher(lambda rows: np.ones(len(rows)), executor, max_wait=0.05)
+        cancelled = asyncio.ensure_future(batcher.submit(1))
+        kept = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept, batcher
+
+    result, batcher = asyncio.run(scenario())
+    assert result == 1.0 and batcher.rows == 2
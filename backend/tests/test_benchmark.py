@@ -0,0 +1,41 @@
+import asyncio
+import json
+import httpx
+from benchmark import compare, measure, run_load
+
+
+def test_measure():
+    result = measure(lambda: sum(range(100)), repeat=3, number=10)
+    assert result["repeat"] == 3 and 0 <= result["min_ms"] <= result["median_ms"]
+
+
+def test_run_load_counts_statuses():
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, json.loads(request.content) if request.content else None))
+        return httpx.Response(200 if len(seen) % 4 else 503)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await run_load(client, "/predict-trip", 20, 4)
+
+    result = asyncio.run(scenario())
+    assert result["requests"] == 20 and result["status_counts"] == {"200": 15, "503": 5}
+    assert all(method == "POST" and body["origin"] != body["destination"] for method, body in seen)
+    assert result["p50_ms"] <= result["p99_ms"]
+
+
+def test_compare(tmp_path, capsys):
+    def write(name, median, rps):
+        path = tmp_path / name
+        path.write_text(json.dumps({
+            "environment": {"commit": name},
+            "micro": [{"name": "compiled predict", "rows": 1, "median_ms": median}],
+            "load": [{"endpoint": "/routes", "concurrency": 32, "requests_per_second": rps, "p99_ms": 5}],
+        }))
+        return str(path)
+
+    compare(write("old", 2.0, 100), write("new", 1.0, 150))
+    out = capsys.readouterr().out
+    assert "old -> new" in out and "x0.50" in out and "100 ->       150 req/s" in out
@@ -0,0 +1,42 @@
+import os
+import pandas as pd
+from columnar import parquet_path, read_training_data
+
+CSV = """Route_ID,Weather_Condition,Event_Type,Hour,Day_OfWeek,Temperature,Precipitation,Event_Attendance,Delay_Minutes
+47123,Sunny,None,10,4,34.5,0.0,0,9.31
+0042,Rainy,Protest,20,5,30.2,42.7,13708,36.71
+47123,Rainy,None,7,0,22.0,5.5,0,12.5
+"""
+
+
+def write_csv(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text(CSV)
+    return str(path)
+
+
+def test_typed_read_keeps_strings_and_none(tmp_path):
+    path = write_csv(tmp_path)
+    frame = read_training_data(path)
+    assert os.path.exists(parquet_path(path))
+    assert isinstance(frame["Route_ID"].dtype, pd.CategoricalDtype)
+    assert frame["Route_ID"].astype(str).tolist() == ["47123", "0042", "47123"]
+    assert frame["Event_Type"].astype(str).tolist() == ["None", "Protest", "None"]
+    assert str(frame["Hour"].dtype) == "int8"
+    assert frame["Delay_Minutes"].tolist() == pd.Series([9.31, 36.71, 12.5], dtype="float32").tolist()
+
+
+def test_projection_and_filters(tmp_path):
+    path = write_csv(tmp_path)
+    assert list(read_training_data(path, columns=["Hour", "Delay_Minutes"]).columns) == ["Hour", "Delay_Minutes"]
+    rainy = read_training_data(path, filters=[("Weather_Condition", "==", "Rainy")])
+    assert rainy["Hour"].tolist() == [20, 7]
+
+
+def test_parquet_rebuilt_when_csv_changes(tmp_path):
+    path = write_csv(tmp_path)
+    assert len(read_training_data(path)) == 3
+    with open(path, "a") as f:
+        f.write("9,Sunny,None,1,1,20.0,0.0,0,1.0\n")
+    os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+    assert len(read_training_data(path)) == 4
@@ -0,0 +1,25 @@
+import pandas as pd
+from data_generator import COLUMNS, EVENT_TYPES, generate_chunk, generate_data
+
+ROUTES = ['R-101', 'R-102', 'R-103']
+
+
+def test_chunk_is_seeded_and_consistent():
+    chunk = generate_chunk(ROUTES, 2000, 7)
+    pd.testing.assert_frame_equal(chunk, generate_chunk(ROUTES, 2000, 7))
+    assert list(chunk.columns) == COLUMNS and len(chunk) == 2000
+    assert chunk['Hour'].between(5, 23).all() and (chunk['Delay_Minutes'] >= 0).all()
+    assert (chunk.loc[chunk['Weather_Condition'] != 'Rainy', 'Precipitation'] == 0).all()
+    no_event = chunk['Event_Type'] == EVENT_TYPES[0]
+    assert (chunk.loc[no_event, 'Event_Attendance'] == 0).all()
+    assert (chunk.loc[chunk['Event_Type'] == 'Festival', 'Event_Attendance'].between(50000, 100000)).all()
+
+
+def test_output_does_not_depend_on_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr('data_generator.load_routes', lambda: ROUTES)
+    single, parallel = tmp_path / 'single.csv', tmp_path / 'parallel.csv'
+    generate_data(2500, str(single), seed=3, chunk_rows=1000)
+    generate_data(2500, str(parallel), seed=3, chunk_rows=1000, workers=2)
+    assert single.read_bytes() == parallel.read_bytes()
+    frame = pd.read_csv(single)
+    assert len(frame) == 2500 and set(frame['Route_ID']) == set(ROUTES)
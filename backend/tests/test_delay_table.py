@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from columnar import read_training_data
+from delay_table import DelayLookupTable, build_lookup_table
+from train_model import build_pipeline
+
+KNOTS = {'Temperature': [-5.0, 20.0, 45.0], 'Precipitation': [0.0, 50.0], 'Event_Attendance': [0.0, 100000.0]}
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    # Three routes keep the table build to a few predict calls
+    df = read_training_data()
+    df = df[df['Route_ID'].isin(df['Route_ID'].cat.categories[:3])]
+    df['Route_ID'] = df['Route_ID'].astype(str)
+    model = build_pipeline(n_estimators=8, max_depth=8, n_jobs=1)
+    model.fit(df.drop('Delay_Minutes', axis=1), df['Delay_Minutes'])
+    return model, df
+
+
+@pytest.fixture(scope="module")
+def table(small_model):
+    return DelayLookupTable.build(small_model[0], KNOTS)
+
+
+def row(df, **values):
+    base = df.drop(columns='Delay_Minutes').iloc[0].to_dict()
+    base.update(Temperature=20.0, Precipitation=0.0, Event_Attendance=0.0)
+    return {**base, **values}
+
+
+def test_exact_at_knots(small_model, table):
+    model, df = small_model
+    for temperature in KNOTS['Temperature']:
+        r = row(df, Temperature=temperature, Precipitation=50.0)
+        assert table.lookup(r) == pytest.approx(model.predict(pd.DataFrame([r]))[0], abs=1e-4)
+
+
+def test_linear_between_knots_and_clamped(small_model, table):
+    _, df = small_model
+    low, high = table.lookup(row(df, Temperature=-5.0)), table.lookup(row(df, Temperature=20.0))
+    assert table.lookup(row(df, Temperature=7.5)) == pytest.approx((low + high) / 2, abs=1e-4)
+    assert table.lookup(row(df, Temperature=-30.0)) == pytest.approx(low, abs=1e-6)
+
+
+def test_unknown_levels_and_hours(small_model, table):
+    _, df = small_model
+    assert table.lookup(row(df, Route_ID="no-such-route")) is None
+    assert table.lookup_hours(row(df, Route_ID="no-such-route")) is None
+    r = row(df, Temperature=31.0, Precipitation=12.0)
+    by_hour = table.lookup_hours(r)
+    assert by_hour == pytest.approx([table.lookup({**r, "Hour": h}) for h in range(24)], abs=1e-4)
+
+
+def test_build_is_gated_on_accuracy(small_model, tmp_path):
+    model, df = small_model
+    test = df.drop(columns='Delay_Minutes').head(200)
+    with pytest.raises(RuntimeError, match="too far from the forest"):
+        build_lookup_table(model, test, path=str(tmp_path / "strict"), max_p95=0.0, knots=KNOTS)
+    assert not os.path.exists(tmp_path / "strict")
+
+    table = build_lookup_table(model, test, path=str(tmp_path / "table"), max_p95=np.inf, max_abs=np.inf, knots=KNOTS)
+    loaded = DelayLookupTable.load(str(tmp_path / "table"))
+    assert loaded.report["test"]["rows"] == len(test)
+    r = row(df, Temperature=33.0)
+    assert loaded.lookup(r) == pytest.approx(table.lookup(r))
+
+
+def test_failed_gate_leaves_no_artifacts(small_model, tmp_path, monkeypatch):
+    import train_model
+    model, df = small_model
+    test = df.head(50)
+    X, y = test.drop('Delay_Minutes', axis=1), test['Delay_Minutes']
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(train_model, 'build_lookup_table',
+                        lambda *args, **kwargs: build_lookup_table(*args, knots=KNOTS, max_p95=0.0, max_abs=0.0))
+    with pytest.raises(RuntimeError, match="too far"):
+        train_model.save_version(model, X, y, model.predict(X), {"family": "random_forest"}, lookup_table=True)
+    assert os.listdir(tmp_path / 'model_registry') == []
+    assert not os.path.exists(tmp_path / 'delay_model.pkl')
+
+
+def test_build_checks_cell_budget_first(small_model, monkeypatch):
+    import delay_table
+    model, _ = small_model
+    monkeypatch.setattr(delay_table, 'predict_grid', lambda *args: pytest.fail("scored an over-budget table"))
+    with pytest.raises(RuntimeError, match="cell budget"):
+        DelayLookupTable.build(model, KNOTS, max_cells=100)
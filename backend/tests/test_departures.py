@@ -0,0 +1,60 @@
+from datetime import date
+import pandas as pd
+import pytest
+from departures import DepartureBoard, ServiceCalendar, parse_date
+
+FRIDAY, SATURDAY, THURSDAY = date(2026, 10, 16), date(2026, 10, 17), date(2026, 10, 15)
+
+
+@pytest.fixture(scope="module")
+def calendar():
+    week = {"WK": "1111100", "SAT": "0000010"}
+    rows = [
+        {"service_id": service, **dict(zip(
+            ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'], days)),
+         "start_date": "20260101", "end_date": "20261231"}
+        for service, days in week.items()
+    ]
+    exceptions = pd.DataFrame([{"service_id": "WK", "date": "20261015", "exception_type": "2"}])
+    return ServiceCalendar(pd.DataFrame(rows), exceptions)
+
+
+@pytest.fixture(scope="module")
+def board(tiny_schedule, calendar):
+    return DepartureBoard(tiny_schedule, calendar)
+
+
+def departures(board, stop, day, after, limit=10):
+    s = board.schedule
+    found, mode = board.next_departures(s.resolve_stop(stop), day, after, limit)
+    return [(s.trip_ids[s.event_trip[e]], seconds) for e, seconds in found], mode
+
+
+def test_services_on(calendar):
+    assert calendar.services_on(FRIDAY) == (frozenset({"WK"}), "calendar")
+    assert calendar.services_on(SATURDAY) == (frozenset({"SAT"}), "calendar")
+    assert calendar.services_on(THURSDAY) == (frozenset(), "calendar")
+    # Outside every calendar's range only the weekday pattern applies
+    assert calendar.services_on(date(2030, 1, 4)) == (frozenset({"WK"}), "weekday")
+    assert parse_date("2026-10-16") == parse_date("20261016") == FRIDAY
+    with pytest.raises(ValueError):
+        parse_date("16/10/2026")
+
+
+def test_next_departures_in_order(board):
+    found, mode = departures(board, "B", FRIDAY, 8 * 3600)
+    assert mode == "calendar"
+    assert found == [("t1", 8 * 3600 + 600), ("t3", 8 * 3600 + 900), ("t2", 9 * 3600 + 600), ("t5", 24 * 3600 + 1200)]
+    assert departures(board, "B", FRIDAY, 8 * 3600, limit=2)[0] == found[:2]
+
+
+def test_last_stop_and_other_days(board):
+    # Ameerpet Metro is the end of every trip through it
+    assert departures(board, "C", FRIDAY, 0)[0] == []
+    assert departures(board, "A", SATURDAY, 0)[0] == [("t4", 10 * 3600)]
+    assert departures(board, "A", THURSDAY, 0)[0] == []
+
+
+def test_previous_day_trips_past_midnight(board):
+    # Friday's t5 reaches Ameerpet at 24:20, i.e. 00:20 on Saturday
+    assert departures(board, "B", SATURDAY, 0)[0] == [("t5", 20 * 60)]
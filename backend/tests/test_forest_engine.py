@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from forest_engine import CompiledForest
+from model_store import DelayModel, load_delay_model
+
+
+@pytest.fixture(scope="module")
+def compiled(pipeline):
+    return CompiledForest.from_pipeline(pipeline)
+
+
+def test_parity_with_sklearn(pipeline, compiled, feature_rows):
+    expected = pipeline.predict(feature_rows)
+    assert np.abs(compiled.predict(feature_rows) - expected).max() < 1e-9
+    records = feature_rows.astype({"Route_ID": str}).to_dict("records")
+    assert np.abs(compiled.predict(records) - expected).max() < 1e-9
+    assert compiled.predict_one(records[0]) == pytest.approx(expected[0], abs=1e-9)
+
+
+def test_unknown_category_encodes_as_zeros(pipeline, compiled, feature_rows):
+    row = feature_rows.head(1).assign(Route_ID="no-such-route", Event_Type="Meteor")
+    assert compiled.predict(row)[0] == pytest.approx(pipeline.predict(row)[0], abs=1e-9)
+
+
+def test_chunked_traversal_matches(compiled, feature_rows, monkeypatch):
+    X = compiled.encode(feature_rows)
+    whole = compiled.predict_encoded(X)
+    monkeypatch.setattr(CompiledForest, "CHUNK_ROWS", 64)
+    assert np.array_equal(compiled.predict_encoded(X), whole)
+    assert compiled.predict([]).shape == (0,)
+
+
+def test_save_and_mmap_load(compiled, feature_rows, tmp_path):
+    compiled.save(tmp_path / "compiled")
+    loaded = CompiledForest.load(tmp_path / "compiled")
+    assert isinstance(loaded.children, np.memmap)
+    assert np.array_equal(loaded.predict(feature_rows), compiled.predict(feature_rows))
+
+
+def test_delay_model_picks_engine_by_rows(pipeline, compiled, feature_rows):
+    model = DelayModel(compiled, pipeline, compiled_max_rows=100)
+    assert model.engine(1) is compiled and model.engine(100) is compiled
+    assert model.engine(101) is pipeline
+    assert DelayModel(compiled).engine(10_000) is compiled
+    assert DelayModel(None, pipeline).engine(1) is pipeline
+    assert np.abs(model.predict(feature_rows) - pipeline.predict(feature_rows)).max() < 1e-9
+    assert model.predict(feature_rows.head(1).to_dict("records")[0]).shape == (1,)
+
+
+def test_load_delay_model_engines(pipeline, compiled, tmp_path):
+    import joblib
+    joblib.dump(pipeline, tmp_path / "model.pkl")
+    model, info = load_delay_model(tmp_path / "model.pkl", tmp_path / "compiled")
+    assert info["format"] == "joblib" and model.compiled is None
+    compiled.save(tmp_path / "compiled")
+    model, info = load_delay_model(tmp_path / "model.pkl", tmp_path / "compiled")
+    assert info["format"] == "compiled-mmap+joblib" and model.pipeline is not None
+    model, info = load_delay_model(tmp_path / "model.pkl", tmp_path / "compiled", batch_engine=False)
+    assert info["format"] == "compiled-mmap" and model.pipeline is None
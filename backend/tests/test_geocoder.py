@@ -0,0 +1,31 @@
+import pytest
+from geocoder import StopGeocoder
+
+
+@pytest.fixture(scope="module")
+def geocoder(tiny_schedule):
+    return StopGeocoder.from_schedule(tiny_schedule)
+
+
+def names(results):
+    return [r["name"] for r in results]
+
+
+def test_autocomplete_prefers_shorter_names(geocoder):
+    assert names(geocoder.autocomplete("ameer")) == ["Ameerpet", "Ameerpet Metro"]
+    assert names(geocoder.autocomplete("AMEERPET m")) == ["Ameerpet Metro"]
+    assert geocoder.autocomplete("xyz") == []
+
+
+def test_autocomplete_matches_inner_words(geocoder):
+    assert names(geocoder.autocomplete("ground")) == ["Palace Ground"]
+    assert "Kukatpally Bus Stand" in names(geocoder.autocomplete("bus"))
+
+
+def test_fuzzy_and_resolve(geocoder):
+    assert names(geocoder.fuzzy("kukatpaly"))[0] == "Kukatpally"
+    hit = geocoder.resolve("Palace Grnd")
+    assert hit["stop_id"] == "A" and hit["match"] == "fuzzy"
+    exact = geocoder.resolve("kpb")
+    assert (exact["stop_id"], exact["match"], exact["score"]) == ("E", "exact", 1.0)
+    assert geocoder.resolve("Secunderabad") is None
@@ -0,0 +1,102 @@
+import gzip
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from heatmap import HOURS, NetworkHeatmap
+
+
+def wait_idle(executor):
+    # The refresh runs on the single worker; an empty task queued behind it marks its end
+    executor.submit(lambda: None).result(timeout=10)
+
+
+def test_snapshot_and_swap():
+    calls = []
+
+    def compute(conditions, routes):
+        calls.append((conditions["Temperature"], list(routes)))
+        return np.full((len(routes), len(HOURS)), conditions["Temperature"])
+
+    with ThreadPoolExecutor(1) as executor:
+        heatmap = NetworkHeatmap(["R1", "R2"], compute, executor)
+        assert heatmap.pending and heatmap.snapshot is None
+        heatmap.set_conditions({"Temperature": 30.0})
+        wait_idle(executor)
+        assert not heatmap.pending
+        snapshot = heatmap.snapshot
+        body = json.loads(snapshot["body"])
+        assert body["routes"] == ["R1", "R2"] and body["delays"][1][23] == 30.0
+        assert gzip.decompress(snapshot["gzip_body"]) == snapshot["body"]
+        # A model swap brings a new route list
+        heatmap.set_conditions({"Temperature": 20.0}, routes=["R3"])
+        wait_idle(executor)
+    assert calls == [(30.0, ["R1", "R2"]), (20.0, ["R3"])]
+    assert heatmap.snapshot["etag"] != snapshot["etag"]
+
+
+def test_conditions_changed_mid_refresh():
+    started, release = threading.Event(), threading.Event()
+    seen = []
+
+    def compute(conditions, routes):
+        seen.append(conditions["Temperature"])
+        started.set()
+        release.wait(10)
+        return np.zeros((len(routes), len(HOURS)))
+
+    with ThreadPoolExecutor(1) as executor:
+        heatmap = NetworkHeatmap(["R1"], compute, executor)
+        heatmap.set_conditions({"Temperature": 1.0})
+        started.wait(10)
+        heatmap.set_conditions({"Temperature": 2.0})
+        heatmap.set_conditions({"Temperature": 3.0})
+        release.set()
+        wait_idle(executor)
+    # One refresh, looping once more for the latest target only
+    assert seen == [1.0, 3.0]
+    assert heatmap.snapshot["conditions"] == {"Temperature": 3.0} and not heatmap.pending
+
+
+def test_compute_error_keeps_last_snapshot():
+    def compute(conditions, routes):
+        if conditions.get("fail"):
+            raise ValueError("model unavailable")
+        return np.zeros((len(routes), len(HOURS)))
+
+    with ThreadPoolExecutor(1) as executor:
+        heatmap = NetworkHeatmap(["R1"], compute, executor)
+        heatmap.set_conditions({})
+        wait_idle(executor)
+        good = heatmap.snapshot
+        heatmap.set_conditions({"fail": True})
+        wait_idle(executor)
+        assert heatmap.snapshot is good and heatmap.error == "model unavailable" and heatmap.pending
+        heatmap.set_conditions({})
+        wait_idle(executor)
+    assert heatmap.error is None and not heatmap.pending
+
+
+def test_failed_refresh_reruns_for_newer_conditions():
+    started, release = threading.Event(), threading.Event()
+    seen = []
+
+    def compute(conditions, routes):
+        seen.append(conditions["Temperature"])
+        if conditions["Temperature"] == 1.0:
+            started.set()
+            release.wait(10)
+            raise ValueError("model unavailable")
+        return np.zeros((len(routes), len(HOURS)))
+
+    with ThreadPoolExecutor(1) as executor:
+        heatmap = NetworkHeatmap(["R1"], compute, executor)
+        heatmap.set_conditions({"Temperature": 1.0})
+        started.wait(10)
+        # Arrives while the failing refresh runs, so set_conditions submits nothing
+        heatmap.set_conditions({"Temperature": 2.0})
+        release.set()
+        wait_idle(executor)
+    assert seen == [1.0, 2.0]
+    assert heatmap.snapshot["conditions"] == {"Temperature": 2.0}
+    assert heatmap.error is None and not heatmap.pending
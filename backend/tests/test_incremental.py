@@ -0,0 +1,83 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from forest_engine import COMPILED_MODEL_PATH, CompiledForest
+from model_registry import ModelRegistry
+from model_store import MODEL_PATH
+from observations import TrainingLog
+from train_model import incremental_update, retire_trees
+
+NOW = pd.Timestamp("2026-10-16T12:00:00Z")
+
+
+class Forest:
+    def __init__(self, n):
+        self.estimators_ = list(range(n))
+        self.n_estimators = n
+
+
+def cohorts(*spec):
+    return [{"trees": n, "added_at": (NOW - pd.Timedelta(days=age)).isoformat(), "rows": 1} for n, age in spec]
+
+
+def test_retire_trees_by_budget_and_age():
+    forest, groups = Forest(30), cohorts((10, 20), (10, 5), (10, 0))
+    assert retire_trees(forest, groups, max_trees=25, now=NOW) == 5
+    assert forest.estimators_[0] == 5 and [g["trees"] for g in groups] == [5, 10, 10]
+    assert retire_trees(forest, groups, window_days=7, now=NOW) == 5
+    assert forest.n_estimators == 20 and len(groups) == 2
+    # The newest cohort is never retired
+    assert retire_trees(forest, groups, max_trees=1, now=NOW) == 10
+    assert forest.n_estimators == 10 and len(groups) == 1
+
+
+@pytest.fixture(scope="module")
+def training():
+    from columnar import read_training_data
+    return read_training_data().astype({c: str for c in ['Route_ID', 'Weather_Condition', 'Event_Type']})
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, pipeline, training):
+    # A registry whose current version is the 12-tree test forest
+    monkeypatch.chdir(tmp_path)
+    registry = ModelRegistry()
+    version, staging = registry.stage()
+    joblib.dump(pipeline, os.path.join(staging, MODEL_PATH))
+    CompiledForest.from_pipeline(pipeline).save(os.path.join(staging, COMPILED_MODEL_PATH))
+    registry.publish(version, staging, {
+        "family": "random_forest", "mae": 4.0, "created_at": NOW.isoformat(), "training_rows": 4000,
+    })
+    return registry
+
+
+def log_rows(rows, shift=0.0):
+    log = TrainingLog(flush_rows=len(rows))
+    at = pd.Timestamp.now(tz='UTC').floor('s')
+    for row in rows.to_dict('records'):
+        log.append({**row, "Delay_Minutes": row["Delay_Minutes"] + shift, "Observed_At": at,
+                    "Observed_Recent_Delay": np.nan, "Observed_Recent_Count": 0,
+                    "Observed_Hour_Delay": np.nan, "Observed_Hour_Count": 0, "Trip_ID": None, "Stop_ID": None})
+    log.close()
+
+
+def test_no_update_without_drift_or_rows(workdir, training):
+    assert incremental_update(min_rows=200) is None
+    log_rows(training.sample(300, random_state=3))
+    assert incremental_update(min_rows=200, drift_threshold=0.5) is None
+    assert len(workdir.versions()) == 1
+
+
+def test_drift_grows_the_forest(workdir, training):
+    parent = workdir.current()
+    log_rows(training.sample(400, random_state=4), shift=20.0)
+    metadata = incremental_update(new_trees=5, max_trees=15, min_rows=200)
+    assert metadata["parent_version"] == parent and workdir.current() == metadata["version"]
+    assert metadata["drift"]["triggered"] and metadata["trees_added"] == 5
+    assert metadata["trees_retired"] == 2 and metadata["params"]["n_estimators"] == 15
+    assert metadata["mae"] < metadata["drift"]["holdout_mae_before"]
+    assert [c["trees"] for c in metadata["tree_cohorts"]] == [10, 5]
+    # The cursor moved past the rows used, so a second run has nothing new
+    assert incremental_update(min_rows=1, force=True) is None
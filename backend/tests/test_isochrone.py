@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from isochrone import ORIGIN, WALK, TransitGraph
+from stop_index import StopIndex
+
+WEEKDAY = frozenset({"WK"})
+START = 7 * 3600 + 55 * 60
+
+
+@pytest.fixture(scope="module")
+def graph(tiny_schedule):
+    s = tiny_schedule
+    return TransitGraph(s, StopIndex(s.stop_ids, s.stop_names, s.stop_lat, s.stop_lon))
+
+
+def search(graph, budget, event_delay=None, start=START):
+    events, shifts = graph.connections(WEEKDAY, frozenset(), start, start + budget)
+    reached = graph.search(graph.schedule.resolve_stop("A"), start, budget, events, shifts, event_delay)
+    return {graph.schedule.stop_ids[stop]: (t, how) for stop, (t, how) in reached.items()}
+
+
+def test_walk_edges(graph):
+    s = graph.schedule
+    d, e = s.resolve_stop("D"), s.resolve_stop("E")
+    assert graph.walk_to[graph.walk_offsets[d]:graph.walk_offsets[d + 1]].tolist() == [e]
+    assert 40 <= graph.walk_seconds[graph.walk_offsets[d]] <= 60
+    assert graph.walk_offsets[s.resolve_stop("A") + 1] == graph.walk_offsets[s.resolve_stop("A")]
+
+
+def test_reachable_within_budget(graph):
+    reached = search(graph, 3600)
+    assert reached["A"] == (START, ORIGIN)
+    assert {stop: t for stop, (t, _) in reached.items() if stop in "BCD"} == {
+        "B": 8 * 3600 + 600, "C": 8 * 3600 + 1200, "D": 8 * 3600 + 1800,
+    }
+    assert reached["E"][1] == WALK and reached["E"][0] > reached["D"][0]
+    assert set(search(graph, 30 * 60)) == {"A", "B", "C"}
+
+
+def test_predicted_delay_breaks_a_transfer(graph):
+    s = graph.schedule
+    delay = np.zeros(s.n_events)
+    t1 = s.trip_slice(s.trip_index["t1"])
+    delay[t1] = 10.0
+    reached = search(graph, 3600, delay)
+    assert reached["B"][0] == 8 * 3600 + 1200
+    assert "D" not in reached and "E" not in reached
+
+
+def test_previous_day_trips(graph):
+    # Friday's t5 leaves Kukatpally at 23:50 and reaches Ameerpet at 00:20
+    s = graph.schedule
+    events, shifts = graph.connections(frozenset(), WEEKDAY, 0, 3600)
+    reached = graph.search(s.resolve_stop("B"), 0, 3600, events, shifts)
+    assert {s.stop_ids[stop]: t for stop, (t, _) in reached.items()} == {"B": 0, "C": 40 * 60}
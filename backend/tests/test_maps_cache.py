@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from maps_cache import BaseTimeCache
+
+
+def response(seconds):
+    return {"rows": [{"elements": [{"status": "OK", "duration": {"value": seconds}}]}]}
+
+
+class GatedClient:
+    # Async distance_matrix that blocks until `release` is set
+    def __init__(self, seconds=600):
+        self.seconds = seconds
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def distance_matrix(self, origin, destination, **kwargs):
+        self.calls += 1
+        await self.release.wait()
+        return response(self.seconds)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_and_lru_eviction():
+    calls = []
+
+    class Client:
+        def distance_matrix(self, origin, destination, **kwargs):
+            calls.append((origin, destination))
+            return response(60 * len(calls))
+
+    clock = Clock()
+    cache = BaseTimeCache(Client(), maxsize=2, ttl=100, clock=clock)
+    assert cache.get("A", "B") == 1
+    assert cache.get(" a ", "b") == 1
+    cache.get("A", "C")
+    cache.get("A", "D")
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("A", "B") == 4
+    clock.now += 101
+    assert cache.get("A", "B") == 5
+    assert cache.stats()["hits"] == 1
+
+
+def test_sync_misses_coalesce():
+    gate = threading.Event()
+    calls = []
+
+    class Client:
+        def distance_matrix(self, origin, destination, **kwargs):
+            calls.append(1)
+            gate.wait(5)
+            return response(120)
+
+    cache = BaseTimeCache(Client())
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(cache.get, "A", "B") for _ in range(4)]
+        while cache.stats()["coalesced"] < 3:
+            pass
+        gate.set()
+        assert [f.result() for f in futures] == [2.0] * 4
+    assert len(calls) == 1
+
+
+def test_cancelled_waiter_leaves_others_unaffected():
+    async def scenario():
+        client = GatedClient()
+        cache = BaseTimeCache(None, async_client=client)
+        owner = asyncio.create_task(cache.get_async("A", "B"))
+        waiters = [asyncio.create_task(cache.get_async("A", "B")) for _ in range(2)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        client.release.set()
+        assert await owner == 10.0
+        assert await waiters[1] == 10.0
+        with pytest.raises(asyncio.CancelledError):
+            await waiters[0]
+        assert client.calls == 1
+        assert cache.stats()["upstream_errors"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_owner_hands_the_fetch_to_a_waiter():
+    async def scenario():
+        client = GatedClient()
+        cache = BaseTimeCache(None, async_client=client)
+        owner = asyncio.create_task(cache.get_async("A", "B"))
+        waiters = [asyncio.create_task(cache.get_async("A", "B")) for _ in range(2)]
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        client.release.set()
+        assert await asyncio.gather(*waiters) == [10.0, 10.0]
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        assert client.calls == 2
+        assert cache.stats()["upstream_errors"] == 0
+        # The retried fetch was cached
+        assert await cache.get_async("A", "B") == 10.0
+        assert client.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_shared_and_not_cached():
+    class Failing:
+        calls = 0
+
+        async def distance_matrix(self, origin, destination, **kwargs):
+            Failing.calls += 1
+            await asyncio.sleep(0.01)
+            return {"rows": [{"elements": [{"status": "ZERO_RESULTS"}]}]}
+
+    async def scenario():
+        cache = BaseTimeCache(None, async_client=Failing())
+        results = await asyncio.gather(*[cache.get_async("A", "B") for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert Failing.calls == 1
+        with pytest.raises(ValueError):
+            await cache.get_async("A", "B")
+        assert Failing.calls == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+from metrics import LatencyMetrics
+
+
+def test_render_summary_and_counters():
+    metrics = LatencyMetrics(prefix="t", window=4)
+    for seconds in (0.1, 0.2, 0.3, 0.4, 0.5):
+        metrics.observe("predict", seconds)
+    with metrics.timer("features"):
+        pass
+    metrics.count_request("GET", "/routes", 200)
+    metrics.count_request("GET", "/routes", 200)
+    text = metrics.render(
+        gauges=[("queue_depth", "Rows queued", 3), ("unset", "Not reported", None)],
+        counters=[("cache_hits_total", "Cache hits", 7)],
+        info=[("model", "Serving model", {"version": "v1"})],
+    )
+    lines = text.splitlines()
+    # Quantiles cover the last `window` samples; _sum and _count are all-time
+    assert 't_stage_latency_seconds{stage="predict",quantile="0.5"} 0.35' in lines
+    assert 't_stage_latency_seconds_sum{stage="predict"} 1.5' in lines
+    assert 't_stage_latency_seconds_count{stage="predict"} 5' in lines
+    assert 't_stage_latency_seconds_count{stage="features"} 1' in lines
+    assert 't_http_requests_total{method="GET",path="/routes",status="200"} 2' in lines
+    assert "t_queue_depth 3" in lines and "# TYPE t_cache_hits_total counter" in lines
+    assert 't_model{version="v1"} 1' in lines
+    assert not any("unset" in line for line in lines)
+
+
+def test_metrics_endpoint_uses_route_templates(client):
+    client.get("/observed/some-route")
+    text = client.get("/metrics").text
+    assert 'path="/observed/{route_id}"' in text
+    assert 'stage="http /observed/{route_id}"' in text
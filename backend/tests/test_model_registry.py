@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import pytest
+from forest_engine import COMPILED_MODEL_PATH, CompiledForest
+from model_registry import CURRENT_FILE, ModelManager, ModelRegistry, ShadowScorer
+from model_store import MODEL_PATH
+
+CONDITIONS = {"Weather_Condition": "Sunny", "Temperature": 20.0, "Precipitation": 0.0, "Event_Type": "None", "Event_Attendance": 0}
+
+
+def publish(registry, pipeline, activate=True, corrupt=False):
+    version, staging = registry.stage()
+    joblib.dump(pipeline, os.path.join(staging, MODEL_PATH))
+    CompiledForest.from_pipeline(pipeline).save(os.path.join(staging, COMPILED_MODEL_PATH))
+    if corrupt:
+        with open(os.path.join(staging, MODEL_PATH), 'wb') as f:
+            f.write(b"not a pickle")
+    return registry.publish(version, staging, {"family": "random_forest"}, activate=activate)["version"]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(str(tmp_path / "registry"))
+
+
+def test_publish_and_activate(registry, pipeline):
+    assert registry.current() is None and registry.versions() == []
+    first = publish(registry, pipeline)
+    second = publish(registry, pipeline, activate=False)
+    assert first != second
+    assert registry.current() == first
+    assert [m["version"] for m in registry.versions()] == [first, second]
+    registry.activate(second)
+    assert registry.current() == second
+    # Staging directories and the CURRENT file are not versions
+    registry.stage()
+    assert len(registry.versions()) == 2
+    for bad in ("missing", CURRENT_FILE, "../x", ""):
+        with pytest.raises(KeyError):
+            registry.metadata(bad)
+    with pytest.raises(KeyError):
+        registry.activate("missing")
+    assert registry.current() == second
+
+
+def test_swap_and_rollback(registry, pipeline, feature_rows):
+    swapped = []
+    manager = ModelManager(registry, CONDITIONS, on_swap=swapped.append, warmup_size=16)
+    first = publish(registry, pipeline)
+    serving = manager.reload()
+    assert serving.info["version"] == first and serving.info["warmup_seconds"] >= 0
+    assert manager.reload() is serving
+    second = publish(registry, pipeline)
+    assert manager.reload().info["version"] == second
+    # A request holding the old snapshot still scores with it
+    assert np.allclose(serving.model.predict(feature_rows), pipeline.predict(feature_rows))
+    registry.activate(first)
+    assert manager.reload().info["version"] == first
+    assert manager.swaps == 3
+    assert [s.info["version"] for s in swapped] == [first, second, first]
+
+
+def test_failed_load_keeps_active_model(registry, pipeline):
+    manager = ModelManager(registry, CONDITIONS, warmup_size=8)
+    good = publish(registry, pipeline)
+    manager.reload()
+    bad = publish(registry, pipeline, corrupt=True)
+    with pytest.raises(Exception):
+        manager.reload()
+    assert manager.active.info["version"] == good
+    assert manager.failed_version == bad and manager.last_error.startswith(bad)
+    fixed = publish(registry, pipeline)
+    assert manager.reload().info["version"] == fixed
+    assert manager.failed_version is None and manager.last_error is None
+
+
+def test_warm_rejects_disagreeing_engines(registry, pipeline):
+    manager = ModelManager(registry, CONDITIONS, warmup_size=8)
+    serving = registry.load(publish(registry, pipeline))
+    serving.model.compiled.value = serving.model.compiled.value + 1.0
+    with pytest.raises(ValueError, match="disagree"):
+        manager.warm(serving)
+
+
+def test_shadow_scorer(registry, pipeline, feature_rows):
+    serving = registry.load(publish(registry, pipeline))
+    rows = feature_rows.astype({"Route_ID": str}).head(20).to_dict("records")
+    served = pipeline.predict(feature_rows.head(20))
+    with ThreadPoolExecutor(1) as executor:
+        shadow = ShadowScorer(serving, executor, batch=10, max_wait=60)
+        for row, delay in zip(rows, served):
+            shadow.record(row, delay)
+    stats = shadow.stats()
+    assert stats["rows"] == 20 and stats["buffered"] == 0 and stats["errors"] == 0
+    assert stats["max_abs_diff"] < 1e-6
+
+
+def test_batched_rows_score_with_their_snapshot(client, registry, pipeline, feature_rows):
+    import main
+    old = registry.load(publish(registry, pipeline)).model
+    new = registry.load(publish(registry, pipeline)).model
+    new.compiled.value = new.compiled.value + 1.0
+    rows = feature_rows.astype({"Route_ID": str}).head(4).to_dict("records")
+    delays = main.predict_snapshot_rows([(old, rows[0]), (new, rows[1]), (old, rows[2]), (new, rows[3])])
+    expected = pipeline.predict(feature_rows.head(4)) + [0, 1, 0, 1]
+    assert np.allclose(delays, expected)
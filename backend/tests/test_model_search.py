@@ -0,0 +1,37 @@
+import os
+import joblib
+from forest_engine import COMPILED_MODEL_PATH, CompiledForest
+from model_search import candidate_name, recommend, serving_cost
+from model_store import MODEL_PATH
+
+
+def candidate(name, mae, p99, mb=1.0, **extra):
+    return {"name": name, "mae": mae, "single_row_p99_ms": p99, "artifact_mb": mb, **extra}
+
+
+def test_recommend_most_accurate_within_slo():
+    results = [
+        candidate("big", 4.0, 9.0),
+        candidate("medium", 4.2, 3.0, mb=50.0),
+        candidate("small", 4.6, 1.0),
+        {"name": "broken", "error": "fit failed"},
+    ]
+    assert recommend(results, slo_ms=5.0)["name"] == "medium"
+    assert recommend(results, slo_ms=5.0, max_artifact_mb=10.0)["name"] == "small"
+    assert [r["meets_slo"] for r in results] == [False, False, True, False]
+    assert recommend(results, slo_ms=0.5) is None
+
+
+def test_candidate_name_is_stable():
+    assert candidate_name("random_forest", {"n_estimators": 25, "max_depth": 12}) == \
+        "random_forest-max_depth=12-n_estimators=25"
+
+
+def test_serving_cost_uses_the_compiled_forest(pipeline, feature_rows, tmp_path):
+    joblib.dump(pipeline, os.path.join(tmp_path, MODEL_PATH))
+    CompiledForest.from_pipeline(pipeline).save(os.path.join(tmp_path, COMPILED_MODEL_PATH))
+    rows = feature_rows.astype({"Route_ID": str}).head(50).to_dict("records")
+    cost = serving_cost(str(tmp_path), rows, single_calls=10, batch_repeats=2)
+    assert cost["serving_format"].startswith("compiled-mmap")
+    assert cost["artifact_mb"] > 0 and cost["single_row_p50_ms"] <= cost["single_row_p99_ms"]
+    assert "batch_50_ms" in cost
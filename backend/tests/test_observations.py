@@ -0,0 +1,141 @@
+import json
+import os
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from observations import (
+    LOG_SCHEMA, LiveDelayStats, ObservationIngestor, SlidingWindow, TrainingLog, parse_trip_updates, part_key,
+)
+
+NOW = 1_760_000_000
+
+
+def message(route_id="R1", delays=(60, 120), timestamp=NOW):
+    return {
+        "header": {"timestamp": timestamp},
+        "entity": [{"id": "t1", "tripUpdate": {
+            "trip": {"tripId": "t1", "routeId": route_id},
+            "stopTimeUpdate": [{"stopId": f"s{i}", "arrival": {"delay": d}} for i, d in enumerate(delays)]
+                              + [{"stopId": "no-delay"}],
+        }}],
+    }
+
+
+def test_parse_trip_updates():
+    found, skipped = parse_trip_updates(message())
+    assert [o.delay_minutes for o in found] == [1.0, 2.0]
+    assert found[0].route_id == "R1" and found[0].timestamp == NOW
+    assert skipped == 1
+    # A bare TripUpdate without a route and no schedule to look it up in
+    found, skipped = parse_trip_updates({"trip": {"trip_id": "x"}, "stop_time_update": [{"arrival": {"delay": 30}}]})
+    assert found == [] and skipped == 1
+
+
+def test_sliding_window_expires_old_values():
+    window = SlidingWindow(60, 6)
+    window.add("k", 0, 1.0)
+    window.add("k", 30, 3.0)
+    assert window.stats("k", now=59)[:2] == (2, 2.0)
+    # Reuses the slice that held t=0
+    window.add("k", 65, 5.0)
+    assert window.stats("k", now=70)[:2] == (2, 4.0)
+    assert window.stats("k", now=200) == (0, None, None)
+    # Too old for the window it would land in
+    assert not window.add("k", 0, 9.0)
+
+
+def test_live_stats_features():
+    stats = LiveDelayStats()
+    ingestor = ObservationIngestor(stats)
+    assert ingestor.ingest(message()) == 2
+    hour = datetime.fromtimestamp(NOW).hour
+    features = stats.features("R1", hour, now=NOW)
+    assert features["Observed_Recent_Count"] == 2 and features["Observed_Recent_Delay"] == 1.5
+    assert features["Observed_Hour_Count"] == 2
+    assert stats.features("R2", hour, now=NOW)["Observed_Recent_Delay"] is None
+
+
+def test_part_key_orders_numerically():
+    old = "part-1760000000000-987-000002.parquet"
+    padded = "part-1760000000000-0001234-000001.parquet"
+    assert part_key(old) < part_key(padded)
+    assert part_key(padded) < part_key("part-1760000000001-0000005-000001.parquet")
+    # As strings, the unpadded pid would sort after the padded one
+    assert old > padded
+
+
+def write_part(path, name, rows):
+    directory = os.path.join(path, "date=2026-10-16", "hour=08")
+    os.makedirs(directory, exist_ok=True)
+    frame = pd.DataFrame(rows).reindex(columns=LOG_SCHEMA.names)
+    pq.write_table(pa.Table.from_pandas(frame, schema=LOG_SCHEMA, preserve_index=False), os.path.join(directory, name))
+
+
+def test_training_log_cursor(tmp_path):
+    log = TrainingLog(str(tmp_path), flush_rows=2)
+    ingestor = ObservationIngestor(LiveDelayStats(), log)
+    ingestor.ingest(message(delays=(60, 120)))
+    frame, cursor = log.read()
+    assert len(frame) == 2 and sorted(frame["Delay_Minutes"]) == [1.0, 2.0]
+    frame, same = log.read(cursor)
+    assert len(frame) == 0 and same == cursor
+    ingestor.ingest(message(delays=(180, 240)))
+    frame, next_cursor = log.read(cursor)
+    assert sorted(frame["Delay_Minutes"]) == [3.0, 4.0] and next_cursor != cursor
+
+
+def test_training_log_reads_past_unpadded_cursor(tmp_path):
+    # A cursor recorded before pids were zero-padded
+    log = TrainingLog(str(tmp_path))
+    row = {"Route_ID": "R1", "Weather_Condition": "Sunny", "Event_Type": "None", "Hour": 8, "Day_OfWeek": 3,
+           "Temperature": 20.0, "Precipitation": 0.0, "Event_Attendance": 0, "Delay_Minutes": 1.0,
+           "Observed_At": pd.Timestamp(NOW, unit='s', tz='UTC')}
+    write_part(str(tmp_path), "part-1760000000000-987-000001.parquet", [row])
+    write_part(str(tmp_path), "part-1760000000000-0001234-000001.parquet", [{**row, "Delay_Minutes": 2.0}])
+    write_part(str(tmp_path), "part-1759999999999-0009999-000001.parquet", [{**row, "Delay_Minutes": 0.5}])
+    frame, cursor = log.read("part-1760000000000-987-000001.parquet")
+    assert list(frame["Delay_Minutes"]) == [2.0]
+    # The new cursor also covers the parts the legacy one had consumed
+    assert cursor == {"1759999999999-9999": 1, "1760000000000-987": 1, "1760000000000-1234": 1}
+    assert len(log.read(cursor)[0]) == 0
+
+
+def test_flush_single_row(tmp_path):
+    log = TrainingLog(str(tmp_path), flush_rows=100)
+    ObservationIngestor(LiveDelayStats(), log).ingest(message(delays=(60,)))
+    log.close()
+    (path,) = log.files()
+    hour = datetime.fromtimestamp(NOW).strftime("hour=%H")
+    assert os.path.basename(os.path.dirname(path)) == hour and log.files_written == 1
+    assert list(log.read()[0]["Delay_Minutes"]) == [1.0]
+
+
+def test_late_part_from_another_writer_is_read(tmp_path):
+    # `early` opened first, so its parts sort first, but it publishes last
+    early, late = TrainingLog(str(tmp_path), flush_rows=1), TrainingLog(str(tmp_path), flush_rows=1)
+    stats = LiveDelayStats()
+    ObservationIngestor(stats, late).ingest(message(delays=(60,)))
+    frame, cursor = early.read()
+    assert list(frame["Delay_Minutes"]) == [1.0]
+    ObservationIngestor(stats, early).ingest(message(delays=(120,)))
+    frame, cursor = early.read(cursor)
+    assert list(frame["Delay_Minutes"]) == [2.0] and sorted(cursor.values()) == [1, 1]
+    assert len(early.read(cursor)[0]) == 0
+
+
+def test_consume_ingests_off_the_event_loop(tmp_path):
+    import asyncio
+    import threading
+    threads = []
+    ingestor = ObservationIngestor(LiveDelayStats(), TrainingLog(str(tmp_path), flush_rows=1))
+    ingest = ingestor.ingest_line
+    ingestor.ingest_line = lambda line: threads.append(threading.current_thread()) or ingest(line)
+
+    async def lines():
+        yield json.dumps(message())
+        yield "not json"
+
+    asyncio.run(ingestor.consume(lines()))
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    assert ingestor.counters()["logged_rows"] == 2 and ingestor.errors == 1
@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+TRIP = {
+    "Route_ID": "10H", "Hour": 8, "Day_OfWeek": 2, "Weather_Condition": "Rainy", "Event_Type": "None",
+    "Temperature": 25.0, "Precipitation": 10.0, "Event_Attendance": 0,
+}
+
+
+def lookups(stats):
+    return stats["hits"] + stats["misses"] + stats["coalesced"]
+
+
+def test_concurrent_trips_share_one_upstream_call(client):
+    import main
+    trip = {**TRIP, "origin": "Test Origin 4", "destination": "Test Destination 4"}
+    upstream = main.base_time_cache.async_client
+    calls = upstream.calls
+    cache_before = client.get("/cache-stats").json()["base_time"]
+    rows_before = client.get("/inference-stats").json()["batcher"]["rows"]
+    with ThreadPoolExecutor(16) as pool:
+        responses = list(pool.map(lambda _: client.post("/predict-trip", json=trip), range(16)))
+    assert all(r.status_code == 200 for r in responses)
+    results = [r.json() for r in responses]
+    assert all(r == results[0] for r in results)
+    assert results[0]["base_time_source"] == "maps" and results[0]["delay_source"] == "forest"
+    # Coalesced or cached: one upstream call for the pair
+    assert upstream.calls == calls + 1
+    assert lookups(client.get("/cache-stats").json()["base_time"]) == lookups(cache_before) + 16
+    assert client.get("/inference-stats").json()["batcher"]["rows"] == rows_before + 16
+
+
+def test_trip_validation(client):
+    assert client.post("/predict-trip", json={**TRIP, "origin": "x"}).status_code == 422
@@ -0,0 +1,61 @@
+import pytest
+from raptor import JourneyPlanner, MAX_TRANSFERS
+
+
+@pytest.fixture(scope="module")
+def planner(tiny_schedule):
+    return JourneyPlanner(tiny_schedule)
+
+
+def legs(planner, journey):
+    return [(leg.trip_id, planner.schedule.stop_ids[leg.stops[0]], planner.schedule.stop_ids[leg.stops[-1]])
+            for leg in journey]
+
+
+def test_patterns(planner):
+    # t1 and t2 share a stop sequence; every other trip is its own pattern
+    assert planner.n_patterns == 4
+
+
+def test_transfer_journey(planner):
+    journey = planner.plan("A", "D", 7 * 3600 + 50 * 60)
+    assert legs(planner, journey) == [("t1", "A", "B"), ("t3", "B", "D")]
+    assert journey[-1].arrival == 8 * 3600 + 30 * 60
+    assert planner.leg_to_dict(journey[0])["num_stops"] == 1
+
+
+def test_later_departure_takes_direct_trip(planner):
+    journey = planner.plan("A", "D", 8 * 3600 + 5 * 60)
+    assert legs(planner, journey) == [("t4", "A", "D")]
+
+
+def test_min_transfer_is_enforced(tiny_schedule):
+    # 5 minutes at Ameerpet is too short for a 6 minute minimum
+    planner = JourneyPlanner(tiny_schedule, min_transfer=360)
+    assert legs(planner, planner.plan("A", "D", 7 * 3600 + 50 * 60)) == [("t4", "A", "D")]
+
+
+def test_unreachable_and_trivial(planner):
+    # Without transfers only the direct trip remains
+    assert legs(planner, planner.plan("A", "D", 7 * 3600, max_transfers=0)) == [("t4", "A", "D")]
+    assert planner.plan("C", "A", 7 * 3600) is None
+    assert planner.plan("A", "A", 7 * 3600) == []
+    assert planner.plan("A", "Nowhere", 7 * 3600) is None
+
+
+def test_max_transfers_is_clamped(planner):
+    direct = legs(planner, planner.plan("A", "D", 7 * 3600, max_transfers=0))
+    assert legs(planner, planner.plan("A", "D", 7 * 3600, max_transfers=-5)) == direct
+    # Searched as MAX_TRANSFERS rounds, not a billion-row arrival matrix
+    assert planner.plan("A", "D", 7 * 3600, max_transfers=10 ** 9) == planner.plan("A", "D", 7 * 3600)
+
+
+@pytest.mark.parametrize("max_transfers", [-1, MAX_TRANSFERS + 1])
+def test_plan_journey_rejects_max_transfers(client, max_transfers):
+    response = client.post("/plan-journey", json={
+        "origin": "Ameerpet", "destination": "Kukatpally", "departure_time": "08:00",
+        "max_transfers": max_transfers, "Weather_Condition": "Sunny", "Event_Type": "None", "Day_OfWeek": 1,
+        "Temperature": 30.0, "Precipitation": 0.0, "Event_Attendance": 0,
+    })
+    assert response.status_code == 422
+    assert [e["loc"][-1] for e in response.json()["detail"]] == ["max_transfers"]
@@ -0,0 +1,80 @@
+import gzip
+import json
+import pytest
+from main import accepts_gzip, etag_matches
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("deflate, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, *;q=1", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("identity", False),
+    ("", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"a-gz"', '"a"')
+    assert not etag_matches("", '"a"')
+
+
+def test_routes_encodings_have_their_own_etags(client):
+    plain = client.get("/routes", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/routes", headers={"Accept-Encoding": "gzip"})
+    refused = client.get("/routes", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in plain.headers and "content-encoding" not in refused.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert plain.headers["etag"] != zipped.headers["etag"]
+    assert refused.headers["etag"] == plain.headers["etag"]
+    assert "Accept-Encoding" in plain.headers["vary"]
+
+    revalidate = client.get("/routes", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]})
+    assert revalidate.status_code == 304
+    wrong = client.get("/routes", headers={"Accept-Encoding": "identity", "If-None-Match": zipped.headers["etag"]})
+    assert wrong.status_code == 200
+
+
+def test_routes_lists_only_trained_routes(client):
+    import main
+    from delay_table import model_levels
+    body = client.get("/routes", headers={"Accept-Encoding": "identity"}).json()
+    trained = set(model_levels(main.models.active.model)["Route_ID"])
+    assert set(body["routes"]) == trained & {r["route_id"] for r in body["details"]}
+    assert len(body["details"]) > len(body["routes"])
+    assert all(r["trained"] == (r["route_id"] in trained) for r in body["details"])
+
+
+def test_catalogue_rerenders_for_new_model_routes():
+    from route_catalogue import RouteCatalogue
+    catalogue = RouteCatalogue()
+    everything = json.loads(catalogue.snapshot.body)["routes"]
+    first = everything[0]
+    snapshot = catalogue.current([first])
+    assert json.loads(gzip.decompress(snapshot.gzip_body))["routes"] == [first]
+    assert catalogue.current([first]) is snapshot
+    rebuilt = catalogue.current()
+    assert rebuilt.etag != snapshot.etag and rebuilt.routes is snapshot.routes
+    assert json.loads(rebuilt.body)["routes"] == everything
+    # A reader holding the old snapshot still has a matching body and ETag
+    assert json.loads(snapshot.body)["routes"] == [first]
+
+
+def test_concurrent_rebuilds_agree():
+    from concurrent.futures import ThreadPoolExecutor
+    from route_catalogue import RouteCatalogue
+    catalogue = RouteCatalogue()
+    first = json.loads(catalogue.snapshot.body)["routes"][:1]
+    with ThreadPoolExecutor(8) as executor:
+        snapshots = list(executor.map(lambda i: catalogue.current(first if i % 2 else None), range(200)))
+    for snapshot in snapshots:
+        routes = json.loads(snapshot.body)["routes"]
+        assert (routes == first) == (snapshot.trained is not None)
+        assert json.loads(gzip.decompress(snapshot.gzip_body)) == json.loads(snapshot.body)
@@ -0,0 +1,45 @@
+import pytest
+from pydantic import ValidationError
+from inference import MAX_GRID_CELLS, predict_grid, scenario_frame
+from main import ValueRange
+
+
+def test_value_range_is_inclusive():
+    assert ValueRange(start=0, stop=1, step=0.25).values() == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert ValueRange(start=0, stop=0.3, step=0.1).values() == [0.0, 0.1, 0.2, 0.3]
+    assert ValueRange(start=5, stop=1).values() == []
+
+
+@pytest.mark.parametrize("bounds", [
+    {"start": 0, "stop": 1e12, "step": 1},
+    {"start": 0, "stop": 10, "step": 0},
+    {"start": 0, "stop": float("inf")},
+])
+def test_value_range_rejected_before_allocating(bounds):
+    with pytest.raises(ValidationError):
+        ValueRange(**bounds)
+
+
+def test_oversized_range_is_422(client):
+    payload = {
+        "Route_ID": "47123", "Hour": 8, "Weather_Condition": "Sunny", "Event_Type": "None", "Day_OfWeek": 0,
+        "Temperature": 30.0, "Precipitation": 0.0, "Event_Attendance": 0,
+        "origin": "a", "destination": "b", "precipitation": {"start": 0, "stop": 1e12, "step": 1},
+    }
+    assert client.post("/predict-scenarios", json=payload).status_code == 422
+    payload["precipitation"] = {"start": 0, "stop": 10, "step": 5}
+    response = client.post("/predict-scenarios", json={**payload, "hours": [7, 8]})
+    assert response.status_code == 200
+    assert response.json()["shape"] == [2, 3]
+
+
+def test_grid_matches_row_by_row(pipeline):
+    base = {"Route_ID": "47123", "Weather_Condition": "Sunny", "Event_Type": "None", "Hour": 0,
+            "Day_OfWeek": 2, "Temperature": 25.0, "Precipitation": 0.0, "Event_Attendance": 0}
+    axes = {"Hour": [7, 8, 9], "Weather_Condition": ["Sunny", "Rainy"]}
+    grid = predict_grid(pipeline, base, axes)
+    frame = scenario_frame(base, axes)
+    assert grid.shape == (3, 2)
+    assert grid.ravel() == pytest.approx(pipeline.predict(frame))
+    with pytest.raises(ValueError):
+        scenario_frame(base, {"Hour": range(MAX_GRID_CELLS + 1)})
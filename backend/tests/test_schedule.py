@@ -0,0 +1,30 @@
+from schedule import leg_to_dict
+
+
+def test_resolve_stop(tiny_schedule):
+    s = tiny_schedule
+    assert s.resolve_stop("B") == s.resolve_stop("am") == s.resolve_stop("  AMEERPET ") == 1
+    assert s.resolve_stop("Nowhere") is None
+
+
+def test_events_are_grouped_by_trip_in_stop_order(tiny_schedule):
+    s = tiny_schedule
+    trip = s.trip_index["t5"]
+    span = s.trip_slice(trip)
+    assert [s.stop_ids[i] for i in s.event_stop[span]] == ["D", "B", "C"]
+    assert s.arrivals[span].tolist() == [23 * 3600 + 50 * 60, 24 * 3600 + 20 * 60, 24 * 3600 + 40 * 60]
+
+
+def test_travel_time(tiny_schedule):
+    s = tiny_schedule
+    leg = s.travel_time("Palace Ground", "Ameerpet Metro")
+    assert (leg.trip_id, leg.departure, leg.arrival) == ("t1", 8 * 3600, 8 * 3600 + 20 * 60)
+    assert leg_to_dict(leg)["scheduled_minutes"] == 20.0
+    assert s.travel_time("A", "C", after=8 * 3600 + 1).trip_id == "t2"
+    # After the last departure, the first of the day
+    assert s.travel_time("A", "C", after=22 * 3600).trip_id == "t1"
+    assert s.travel_time("A", "C", trip_id="t2").trip_id == "t2"
+    assert s.travel_time("A", "C", route_id="R2") is None
+    # Only in stop order
+    assert s.travel_time("C", "A") is None
+    assert s.travel_time("B", "C", route_id="R2").trip_id == "t5"
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from stop_index import EARTH_RADIUS_M, StopIndex
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(17.2, 17.6, 2000)
+    lon = rng.uniform(78.2, 78.7, 2000)
+    return StopIndex([f"S{i}" for i in range(2000)], [f"Stop {i}" for i in range(2000)], lat, lon)
+
+
+def test_nearest_matches_brute_force(index):
+    dist = haversine(17.4, 78.45, index.lat, index.lon)
+    hits = index.nearest(17.4, 78.45, k=5)
+    assert [i for i, _ in hits] == np.argsort(dist)[:5].tolist()
+    assert [d for _, d in hits] == pytest.approx(np.sort(dist)[:5], abs=1e-3)
+
+
+def test_within_radius_is_sorted_and_complete(index):
+    dist = haversine(17.4, 78.45, index.lat, index.lon)
+    hits = index.within(17.4, 78.45, 1500)
+    assert sorted(i for i, _ in hits) == np.flatnonzero(dist <= 1500).tolist()
+    assert [d for _, d in hits] == sorted(d for _, d in hits)
+    assert len(index.within(17.4, 78.45, 1500, limit=3)) == min(3, len(hits))
+
+
+def test_k_larger_than_index():
+    index = StopIndex(["A", "B"], ["A", "B"], [17.0, 17.1], [78.0, 78.0])
+    assert [i for i, _ in index.nearest(17.0, 78.0, k=10)] == [0, 1]
+
+
+@pytest.mark.parametrize("params", [{"k": 0}, {"k": -1}, {"k": 101}, {"radius_m": 0}, {"radius_m": -50}])
+def test_stops_nearby_rejects_bad_limits(client, params):
+    response = client.get("/stops/nearby", params={"lat": 17.43, "lon": 78.44, **params})
+    assert response.status_code == 422
+    assert [e["loc"][-1] for e in response.json()["detail"]] == list(params)
+
+
+def test_stops_nearby_within_radius(client):
+    stops = client.get("/stops/nearby", params={"lat": 17.43, "lon": 78.44, "k": 3, "radius_m": 5000}).json()["stops"]
+    assert 0 < len(stops) <= 3
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from trip_eta import TripEtaIndex
+
+
+@pytest.fixture(scope="module")
+def index(tiny_schedule):
+    return TripEtaIndex(tiny_schedule)
+
+
+def trips(schedule, *ids):
+    return [schedule.trip_index[t] for t in ids]
+
+
+def test_constant_delay_accrues_with_running_time(tiny_schedule, index):
+    _, lengths, delays = index.propagate(trips(tiny_schedule, "t1", "t3"), np.full(24, 10.0))
+    assert lengths.tolist() == [3, 2]
+    assert delays == pytest.approx([0, 5, 10, 0, 10])
+
+
+def test_segments_use_their_own_hour(tiny_schedule, index):
+    # t5 runs 30 minutes in hour 23, then 20 minutes after midnight
+    hourly = np.zeros(24)
+    hourly[23], hourly[0] = 10.0, 20.0
+    _, _, delays = index.propagate(trips(tiny_schedule, "t5"), hourly)
+    assert delays == pytest.approx([0, 6, 14])
+
+
+def test_per_trip_hourly_rows(tiny_schedule, index):
+    hourly = np.stack([np.full(24, 10.0), np.full(24, 4.0)])
+    _, _, delays = index.propagate(trips(tiny_schedule, "t1", "t2"), hourly)
+    assert delays == pytest.approx([0, 5, 10, 0, 2, 4])
+
+
+def test_trip_etas(tiny_schedule, index):
+    [eta] = index.trip_etas(trips(tiny_schedule, "t1"), np.full(24, 10.0))
+    assert eta["route_id"] == "R1" and eta["predicted_trip_delay"] == 10.0
+    assert [s["predicted_arrival"] for s in eta["stops"]] == ["08:00:00", "08:15:00", "08:30:00"]
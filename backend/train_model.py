@@ -1,49 +1,155 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import sklearn
 import pandas as pd
 import numpy as np
 import joblib
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, r2_score
+from columnar import read_training_data
+from delay_table import build_lookup_table, model_levels, LOOKUP_TABLE_PATH
+from forest_engine import CompiledForest, COMPILED_MODEL_PATH
+from inference import FEATURE_COLUMNS
+from model_registry import ModelRegistry, schema_hash
+from model_store import MODEL_PATH
+from observations import TrainingLog, OBSERVED_LOG_PATH
 
-def train_model():
-    print("Loading data...")
-    try:
-        df = pd.read_csv('transport_data.csv')
-    except FileNotFoundError:
-        print("Error: transport_data.csv not found. Run data_generator.py first.")
-        return
-
-    # Features and Target
-    X = df.drop('Delay_Minutes', axis=1)
-    y = df['Delay_Minutes']
+MODEL_FAMILIES = ('random_forest', 'hist_gradient_boosting')
 
+def build_pipeline(family='random_forest', n_jobs=-1, **params):
     # Preprocessing
     categorical_features = ['Route_ID', 'Weather_Condition', 'Event_Type']
     numerical_features = ['Hour', 'Day_OfWeek', 'Temperature', 'Precipitation', 'Event_Attendance']
 
+    if family == 'random_forest':
+        encoder = OneHotEncoder(handle_unknown='ignore')
+        regressor = RandomForestRegressor(**{'n_estimators': 100, **params}, random_state=42, n_jobs=n_jobs)
+    elif family == 'hist_gradient_boosting':
+        # Native categorical splits on ordinal codes; unseen levels count as missing
+        encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan)
+        regressor = HistGradientBoostingRegressor(**params, categorical_features=[0, 1, 2], random_state=42)
+    else:
+        raise ValueError(f"Unknown model family: {family}")
+
     # Create a column transformer
     preprocessor = ColumnTransformer(
         transformers=[
-            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features),
+            ('cat', encoder, categorical_features),
             ('num', 'passthrough', numerical_features)
         ]
     )
 
     # Pipeline
-    model = Pipeline([
+    return Pipeline([
         ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
+        ('regressor', regressor)
     ])
 
+def add_observed_rows(df, since=None, path=OBSERVED_LOG_PATH):
+    # Rows from the observed-delay log written after cursor `since`, in the
+    # training columns; returns (combined frame, rows added, new cursor)
+    observed, cursor = TrainingLog(path).read(since, columns=list(df.columns))
+    if not len(observed):
+        return df, 0, cursor
+    combined = pd.concat([df, observed], ignore_index=True)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            combined[column] = combined[column].astype(str).astype('category')
+    return combined, len(observed), cursor
+
+def save_version(model, X_test, y_test, y_pred, metadata, activate=True, lookup_table=False):
+    # Save: a new registry version for the API (picked up without a restart),
+    # plus, unless it is only a candidate, the top-level copies the Streamlit apps load.
+    # Nothing outside the staging directory is written until every check has passed.
+    registry = ModelRegistry()
+    version, staging = registry.stage()
+    try:
+        joblib.dump(model, os.path.join(staging, MODEL_PATH))
+
+        # Export flat node arrays for the pandas-free evaluator and check parity.
+        # Other families are served from the pickle.
+        compiled, max_diff, table = None, None, None
+        if metadata["family"] == 'random_forest':
+            compiled = CompiledForest.from_pipeline(model)
+            compiled.save(os.path.join(staging, COMPILED_MODEL_PATH))
+            compiled_pred = compiled.predict(X_test.to_dict('records'))
+            max_diff = float(np.abs(compiled_pred - y_pred).max())
+            print(f"Compiled forest exported. Max |diff| vs sklearn: {max_diff:.2e}")
+            if max_diff > 1e-6:
+                raise RuntimeError("Compiled forest does not match the sklearn pipeline")
+
+        # Optional dense lookup table for the O(1) serving mode (DELAY_LOOKUP_TABLE=1)
+        if lookup_table:
+            print("Building delay lookup table...")
+            table = build_lookup_table(model, X_test, y_test, os.path.join(staging, LOOKUP_TABLE_PATH))
+            print(f"Lookup table saved with version {version}: {table.report}")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if activate:
+        joblib.dump(model, MODEL_PATH)
+        print(f"Model saved to {MODEL_PATH}")
+        if compiled is not None:
+            compiled.save(COMPILED_MODEL_PATH)
+        if table is not None:
+            # For the API's fallback when no registry version loads
+            table.save(LOOKUP_TABLE_PATH)
+
+    metadata = registry.publish(version, staging, {
+        "created_at": pd.Timestamp.now(tz='UTC').isoformat(timespec='seconds'),
+        **metadata,
+        "feature_schema_hash": schema_hash(model),
+        "sklearn_version": sklearn.__version__,
+        "compiled_max_abs_diff": max_diff,
+        "lookup_table": bool(lookup_table),
+    }, activate=activate)
+    state = "now current" if activate else "not activated"
+    print(f"Published model version {metadata['version']} to {registry.path} ({state})")
+    return metadata
+
+def train_model(lookup_table=False, activate=True, family='random_forest', params=None, observed_log=False):
+    started = time.perf_counter()
+    print("Loading data...")
+    try:
+        # Typed columnar copy of transport_data.csv (converted on first use).
+        # Route IDs and Event_Type "None" stay categories, matching what the
+        # API sends at prediction time
+        df = read_training_data()
+    except FileNotFoundError:
+        print("Error: transport_data.csv not found. Run data_generator.py first.")
+        return
+    observed_rows, observed_cursor = 0, None
+    if observed_log:
+        df, observed_rows, observed_cursor = add_observed_rows(df)
+        print(f"Added {observed_rows} observed rows from {OBSERVED_LOG_PATH}")
+
+    # Features and Target
+    X = df.drop('Delay_Minutes', axis=1)
+    y = df['Delay_Minutes']
+
+    params = params or {}
+    model = build_pipeline(family, **params)
+
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
     # Train
-    print("Training model...")
+    print(f"Training {family} model {params or ''}...")
+    fit_started = time.perf_counter()
     model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - fit_started
+    if family == 'random_forest':
+        # Fit on every core, but predict single-threaded: the API already
+        # spreads requests over its inference threads
+        model.set_params(regressor__n_jobs=None)
 
     # Evaluate
     y_pred = model.predict(X_test)
@@ -52,9 +158,192 @@ def train_model():
     
     print(f"Model Trained. MAE: {mae:.2f} mins, R2 Score: {r2:.2f}")
 
-    # Save
-    joblib.dump(model, 'delay_model.pkl')
-    print("Model saved to delay_model.pkl")
+    created_at = pd.Timestamp.now(tz='UTC').isoformat(timespec='seconds')
+    metadata = {
+        "created_at": created_at,
+        "mode": "full",
+        "training_rows": len(X_train),
+        "test_rows": len(X_test),
+        "mae": round(float(mae), 4),
+        "r2": round(float(r2), 4),
+        "family": family,
+        "params": params,
+        "observed_rows": observed_rows,
+        "observed_log_cursor": observed_cursor,
+        "fit_seconds": round(fit_seconds, 3),
+    }
+    if family == 'random_forest':
+        metadata["tree_cohorts"] = [{"trees": len(model.named_steps['regressor'].estimators_), "added_at": created_at, "rows": len(X_train)}]
+    metadata["retrain_seconds"] = round(time.perf_counter() - started, 3)
+    metadata = save_version(model, X_test, y_test, y_pred, metadata, activate, lookup_table)
+    print(f"Retrain took {time.perf_counter() - started:.1f}s wall clock ({fit_seconds:.1f}s fitting)")
+    return metadata
+
+def retire_trees(regressor, cohorts, max_trees=None, window_days=None, now=None):
+    # Drop the oldest cohorts of trees (estimators_ is oldest first) that are
+    # older than the window or over the tree budget; the newest cohort stays
+    now = now or pd.Timestamp.now(tz='UTC')
+    retired = 0
+    while len(cohorts) > 1:
+        oldest = cohorts[0]
+        stale = window_days is not None and now - pd.Timestamp(oldest["added_at"]) > pd.Timedelta(days=window_days)
+        excess = 0 if max_trees is None else len(regressor.estimators_) - max_trees
+        if not stale and excess <= 0:
+            break
+        drop = oldest["trees"] if stale else min(excess, oldest["trees"])
+        del regressor.estimators_[:drop]
+        retired += drop
+        if drop == oldest["trees"]:
+            cohorts.pop(0)
+        else:
+            cohorts[0] = {**oldest, "trees": oldest["trees"] - drop}
+    regressor.n_estimators = len(regressor.estimators_)
+    return retired
+
+def incremental_update(new_trees=20, max_trees=None, window_days=None, drift_threshold=0.1,
+                       min_rows=200, force=False, activate=True, lookup_table=False):
+    """Grow the current random forest on observed rows logged since it was trained.
+
+    The current version's error on the new rows is the drift check: unless
+    `force`, the forest is only updated when that MAE exceeds the error
+    the version was accepted with by more than `drift_threshold` (relative).
+    Then `new_trees` trees are fitted on 80% of the new rows alone
+    (warm_start, with the version's fitted encoder, so old trees are kept
+    as they are), the oldest trees are retired past `max_trees` or
+    `window_days`, and the result is checked on the other 20% and
+    published as a new version. Nothing older than the log cursor is read.
+    The lookup table is rebuilt when the current version has one (or
+    `lookup_table` is set), which takes far longer than the update itself.
+    """
+    started = time.perf_counter()
+    timings = {}
+
+    def lap(stage, since):
+        timings[stage] = round(time.perf_counter() - since, 3)
+        return time.perf_counter()
+
+    registry = ModelRegistry()
+    parent = registry.current()
+    if parent is None:
+        print("No current model version: run a full train_model.py first")
+        return None
+    parent_meta = registry.metadata(parent)
+    if parent_meta.get("family") != 'random_forest':
+        print(f"Version {parent} is {parent_meta.get('family')}; only random forests can be grown in place")
+        return None
+    t = time.perf_counter()
+    model = joblib.load(os.path.join(registry.version_path(parent), MODEL_PATH))
+    t = lap("load_model", t)
+
+    cursor = parent_meta.get("observed_log_cursor")
+    columns = FEATURE_COLUMNS + ['Delay_Minutes']
+    new, new_cursor = TrainingLog().read(cursor, columns=columns)
+    t = lap("read_new_rows", t)
+    print(f"{len(new)} observed rows since version {parent} (cursor {cursor})")
+    if len(new) < min_rows:
+        print(f"Fewer than {min_rows} new rows; nothing to do")
+        return None
+
+    # Drift check on every new row: the current model has seen none of them
+    X_new, y_new = new[FEATURE_COLUMNS], new['Delay_Minutes']
+    current_mae = float(mean_absolute_error(y_new, model.predict(X_new)))
+    reference_mae = parent_meta.get("drift_reference_mae", parent_meta["mae"])
+    drifted = current_mae > reference_mae * (1 + drift_threshold)
+    levels = model_levels(model)
+    unseen = {c: sorted(set(X_new[c].astype(str)) - set(levels[c])) for c in ['Route_ID', 'Weather_Condition', 'Event_Type']}
+    unseen = {c: values for c, values in unseen.items() if values}
+    t = lap("drift_check", t)
+    print(f"Drift check: MAE {current_mae:.2f} on new rows vs reference {reference_mae:.2f} "
+          f"(threshold +{drift_threshold:.0%}) -> {'retrain' if drifted else 'no drift'}")
+    if unseen:
+        print(f"New rows have categories the encoder has never seen, which only a full retrain can use: "
+              f"{ {c: len(v) for c, v in unseen.items()} }")
+    if not drifted and not force:
+        return None
+
+    X_train, X_test, y_train, y_test = train_test_split(X_new, y_new, test_size=0.2, random_state=42)
+    before_mae = float(mean_absolute_error(y_test, model.predict(X_test)))
+    regressor = model.named_steps['regressor']
+    cohorts = list(parent_meta.get("tree_cohorts") or [
+        {"trees": len(regressor.estimators_), "added_at": parent_meta["created_at"], "rows": parent_meta["training_rows"]}
+    ])
+    encoded = model.named_steps['preprocessor'].transform(X_train)
+    regressor.set_params(warm_start=True, n_estimators=len(regressor.estimators_) + new_trees, n_jobs=-1)
+    regressor.fit(encoded, y_train)
+    regressor.set_params(warm_start=False, n_jobs=None)
+    now = pd.Timestamp.now(tz='UTC')
+    cohorts.append({"trees": new_trees, "added_at": now.isoformat(timespec='seconds'), "rows": len(X_train)})
+    retired = retire_trees(regressor, cohorts, max_trees, window_days, now)
+    t = lap("fit", t)
+
+    y_pred = model.predict(X_test)
+    mae = float(mean_absolute_error(y_test, y_pred))
+    print(f"Added {new_trees} trees on {len(X_train)} rows, retired {retired}: "
+          f"{len(regressor.estimators_)} trees, holdout MAE {before_mae:.2f} -> {mae:.2f}")
+
+    metadata = {
+        "mode": "incremental",
+        "parent_version": parent,
+        "training_rows": len(X_train),
+        "test_rows": len(X_test),
+        "mae": round(mae, 4),
+        "r2": round(float(r2_score(y_test, y_pred)), 4),
+        "drift_reference_mae": round(mae, 4),
+        "family": 'random_forest',
+        "params": {**parent_meta.get("params", {}), "n_estimators": len(regressor.estimators_)},
+        "observed_rows": len(new),
+        "observed_log_cursor": new_cursor,
+        "tree_cohorts": cohorts,
+        "drift": {
+            "new_rows_mae": round(current_mae, 4),
+            "reference_mae": reference_mae,
+            "threshold": drift_threshold,
+            "triggered": drifted,
+            "forced": bool(force and not drifted),
+            "holdout_mae_before": round(before_mae, 4),
+            "unseen_categories": unseen,
+        },
+        "trees_added": new_trees,
+        "trees_retired": retired,
+    }
+    t_save = time.perf_counter()
+    metadata["retrain_seconds"] = round(t_save - started, 3)
+    metadata["retrain_stages"] = timings
+    # A lookup table is built from one model; rebuild it rather than let a
+    # table-serving deployment lose it (or keep the parent's) silently
+    lookup_table = lookup_table or parent_meta.get("lookup_table", False)
+    if lookup_table:
+        print(f"Version {parent} served a lookup table; rebuilding it for the updated forest")
+    metadata = save_version(model, X_test, y_test, y_pred, metadata, activate, lookup_table)
+    print(f"Incremental retrain took {time.perf_counter() - started:.1f}s wall clock "
+          f"({', '.join(f'{k} {v:.2f}s' for k, v in timings.items())}, publish {time.perf_counter() - t_save:.2f}s)")
+    return metadata
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the delay model")
+    parser.add_argument('--lookup-table', action='store_true',
+                        help="also precompute the delay lookup table (always rebuilt by --incremental when the current version has one)")
+    parser.add_argument('--candidate', action='store_true',
+                        help="publish without making it the current version (e.g. to shadow-score it first)")
+    parser.add_argument('--family', choices=MODEL_FAMILIES, default='random_forest')
+    parser.add_argument('--params', type=json.loads, default={},
+                        help='estimator parameters as JSON, e.g. \'{"n_estimators": 50, "max_depth": 12}\'')
+    parser.add_argument('--observed-log', action='store_true',
+                        help=f"also train on the observed delays logged in {OBSERVED_LOG_PATH}/")
+    incremental = parser.add_argument_group("incremental mode")
+    incremental.add_argument('--incremental', action='store_true',
+                             help="grow the current forest on newly logged observations instead of refitting")
+    incremental.add_argument('--new-trees', type=int, default=20, help="trees fitted on the new rows")
+    incremental.add_argument('--max-trees', type=int, help="retire the oldest trees beyond this many")
+    incremental.add_argument('--window-days', type=float, help="retire trees added longer ago than this")
+    incremental.add_argument('--drift-threshold', type=float, default=0.1,
+                             help="relative MAE increase on new rows that triggers an update")
+    incremental.add_argument('--min-rows', type=int, default=200, help="new rows needed before checking drift")
+    incremental.add_argument('--force', action='store_true', help="update even without drift")
+    args = parser.parse_args()
+    if args.incremental:
+        incremental_update(args.new_trees, args.max_trees, args.window_days, args.drift_threshold,
+                           args.min_rows, args.force, activate=not args.candidate, lookup_table=args.lookup_table)
+    else:
+        train_model(args.lookup_table, activate=not args.candidate, family=args.family, params=args.params,
+                    observed_log=args.observed_log)